@@ -1,17 +1,24 @@
 """
 🪪 Генератор пропусков — веб-интерфейс
 Streamlit + логотип по умолчанию + отступы для резки
+
+Документ собирается на диск, но st.download_button отдаёт только данные
+из памяти: на время скачивания готовый файл целиком лежит в памяти
+сервера (бюджет памяти ограничивает лишь сборку). Большие тиражи —
+частями («Разбить на части») или через HTTP-сервис server.py, который
+отдаёт документ с диска потоком.
 """
 
 import streamlit as st
 from PIL import Image
 import io
 import os
+import threading
 
 from config import PassConfig
-from card_renderer import CardRenderer
-from document_builder import DocumentBuilder
-from photo_utils import PhotoUtils
+
+# CardRenderer, DocumentBuilder и PhotoUtils (а с ними cv2, numpy, docx)
+# импортируются внутри функций — первая страница не ждёт их загрузки.
 
 
 # ═══════════════════════════════════════════════════
@@ -57,6 +64,51 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# ═══════════════════════════════════════════════════
+#  ПРОГРЕВ СЕРВЕРА
+# ═══════════════════════════════════════════════════
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up() -> threading.Thread | None:
+    """Один раз на процесс прогревает шрифты, каскад и шаблоны в фоне.
+
+    Отключается переменной окружения PASS_WARMUP=0.
+    """
+    if os.environ.get("PASS_WARMUP", "1") == "0":
+        return None
+    from warmup import warm_up
+    t = threading.Thread(target=warm_up, name="pass-warmup", daemon=True)
+    t.start()
+    return t
+
+
+@st.cache_resource(show_spinner=False)
+def get_build_cache():
+    """Кэш готовых документов — один на сервер, общий для всех сессий"""
+    from build_cache import BuildCache
+    return BuildCache(
+        max_mb=float(os.environ.get("PASS_CACHE_MB", "1024")),
+        max_age_h=float(os.environ.get("PASS_CACHE_HOURS", "24")),
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_scheduler():
+    """
+    Пул рендера — один на сервер. Очередь у каждой сессии своя, задачи
+    берутся по кругу: чужая большая сборка не задерживает превью.
+    Размер — PASS_RENDER_WORKERS (по умолчанию по числу ядер).
+    """
+    from render_pool import FairScheduler
+    return FairScheduler(int(os.environ.get("PASS_RENDER_WORKERS", "0")) or None)
+
+
+def session_id() -> str:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+
 # ═══════════════════════════════════════════════════
 #  УТИЛИТА: загрузка логотипа
 # ═══════════════════════════════════════════════════
@@ -119,6 +171,21 @@ def render_sidebar() -> PassConfig:
     else:
         st.sidebar.caption("⚠️ Без зазора — карточки будут впритык")
 
+    # ══ ЛИСТ: раскладка считается под размер карточки и зазор ══
+    st.sidebar.subheader("🖨️ Лист")
+    col1, col2 = st.sidebar.columns(2)
+    cfg.paper = col1.selectbox("Формат", ("A4", "A3", "SRA3"))
+    cfg.page_margin = col2.number_input(
+        "Поле (мм)", 0.0, 30.0, cfg.page_margin * 10, 1.0,
+        help="Непечатаемый край листа у принтера",
+    ) / 10
+    try:
+        from sheet_layout import pack
+        st.sidebar.caption(f"🧩 {pack(cfg).describe()}")
+    except ValueError as e:
+        st.sidebar.error(f"❌ {e}")
+        st.stop()
+
     # Цвета
     st.sidebar.subheader("🎨 Цвета")
     col1, col2 = st.sidebar.columns(2)
@@ -137,7 +204,7 @@ def render_sidebar() -> PassConfig:
 # ═══════════════════════════════════════════════════
 
 def render_upload(cfg: PassConfig) -> tuple:
-    """Рендерит зону загрузки, возвращает (photos_dict, logo_bytes)"""
+    """Рендерит зону загрузки, возвращает (rows, logo_bytes)"""
 
     st.markdown(
         '<p class="main-header">🪪 Генератор пропусков</p>',
@@ -154,14 +221,26 @@ def render_upload(cfg: PassConfig) -> tuple:
 
     with col1:
         st.subheader("📸 Фотографии сотрудников")
-        st.caption("Имя файла = ФИО (например: `Иванов Иван Иванович.jpg`)")
+        st.caption(
+            "Имя файла = ФИО (например: `Иванов Иван Иванович.jpg`). "
+            "Большие пакеты удобнее загружать одним ZIP-архивом."
+        )
         uploaded_photos = st.file_uploader(
-            "Выберите фото",
-            type=["jpg", "jpeg", "png"],
+            "Выберите фото или ZIP-архив",
+            type=["jpg", "jpeg", "png", "zip"],
             accept_multiple_files=True,
             key="photos",
         )
 
+        with st.expander("📋 Реестр сотрудников (CSV/XLSX, необязательно)"):
+            st.caption(
+                "Колонки: ФИО, Серия, Номер, Дата оформления, Дата окончания, Фото. "
+                "Фото сопоставляются с загруженными файлами по имени."
+            )
+            uploaded_roster = st.file_uploader(
+                "Реестр", type=["csv", "xlsx"], key="roster",
+            )
+
     with col2:
         st.subheader("🏛️ Логотип")
 
@@ -184,13 +263,8 @@ def render_upload(cfg: PassConfig) -> tuple:
             key="logo",
         )
 
-    # Собираем фото
-    photos = {}
-    if uploaded_photos:
-        for f in uploaded_photos:
-            fio = f.name.rsplit(".", 1)[0]
-            photos[fio] = f.read()
-            f.seek(0)
+    # ══ Строки пропусков: байты фото не копируются, читаются при рендере ══
+    rows = collect_rows(cfg, uploaded_photos or [], uploaded_roster)
 
     # ══ Определяем логотип: свой или по умолчанию ══
     logo_bytes = None
@@ -204,21 +278,67 @@ def render_upload(cfg: PassConfig) -> tuple:
         logo_bytes = default_logo_bytes
         st.sidebar.info(f"🖼️ Используется {cfg.default_logo}")
 
-    return photos, logo_bytes
+    return rows, logo_bytes
+
+
+def collect_rows(cfg: PassConfig, uploaded_photos, uploaded_roster) -> list:
+    """Строки из реестра (если есть) или из имён загруженных фото.
+
+    ZIP-архивы разворачиваются в список файлов без распаковки:
+    каждое фото читается из архива только при рендере своей карточки.
+    Логотип, лежащий в архиве рядом с фото, пропускается.
+    """
+    from photo_archive import iter_zip_photos, open_photo_zip
+    from roster import RosterRow, iter_roster, match_photos
+
+    sources = []
+    for f in uploaded_photos:
+        if f.name.lower().endswith(".zip"):
+            try:
+                sources.extend(iter_zip_photos(
+                    open_photo_zip(f), exclude=[cfg.default_logo]
+                ))
+            except Exception as e:
+                st.error(f"Не удалось открыть архив {f.name}: {e}")
+        else:
+            sources.append((f.name, f.getvalue))
+
+    if not uploaded_roster:
+        return [
+            RosterRow(os.path.splitext(name)[0], loader=loader)
+            for name, loader in sources
+        ]
+
+    try:
+        rows = list(match_photos(iter_roster(uploaded_roster), sources))
+    except Exception as e:
+        st.error(f"Не удалось прочитать реестр: {e}")
+        return []
+
+    missing = [row.fio for row in rows if row.loader is None]
+    if missing:
+        st.warning(
+            f"Нет фото для {len(missing)} из {len(rows)} строк реестра — "
+            f"они будут пропущены: {', '.join(missing[:5])}"
+            + ("…" if len(missing) > 5 else "")
+        )
+    return [row for row in rows if row.loader is not None]
 
 
 # ═══════════════════════════════════════════════════
 #  ПРЕВЬЮ КАРТОЧЕК
 # ═══════════════════════════════════════════════════
 
-def render_preview(cfg: PassConfig, photos: dict, logo_bytes: bytes | None):
+def render_preview(cfg: PassConfig, rows: list, logo_bytes: bytes | None):
     """Показывает превью карточек"""
-    if not photos:
+    if not rows:
         st.info("👆 Загрузите фотографии сотрудников для начала работы")
         return
 
+    from render_pool import renderer_for
+
     st.divider()
-    st.subheader(f"👁️ Превью ({len(photos)} сотрудников)")
+    st.subheader(f"👁️ Превью ({len(rows)} сотрудников)")
 
     # Показываем инфо о размерах
     col1, col2, col3 = st.columns(3)
@@ -226,41 +346,72 @@ def render_preview(cfg: PassConfig, photos: dict, logo_bytes: bytes | None):
     col2.metric("✂️ Зазор для резки", f"{cfg.cut_margin * 10:.1f} мм")
     col3.metric("🖼️ Логотип", "Есть ✅" if logo_bytes else "Нет ❌")
 
-    renderer = CardRenderer(cfg)
+    # Вектор: без растра на 300 dpi, фото и логотип встраиваются как есть.
+    # SVG вставляются прямо в страницу, шрифты DejaVu — одним @font-face
+    vector = st.toggle("Векторное превью (SVG)", value=False,
+                       help="Быстрее и легче; текст набран шрифтами DejaVu из fonts/")
+    # Рендерер — из реестра по отпечатку настроек, а не новый на каждый rerun
+    renderer = renderer_for(cfg, "svg" if vector else "png")
+    if vector:
+        st.html(
+            f"<style>{renderer.font_css()}"
+            ".pass-svg svg{width:100%;height:auto;display:block}</style>"
+        )
     logo_pil = None
     if logo_bytes:
         logo_pil = Image.open(io.BytesIO(logo_bytes)).convert("RGBA")
 
-    preview_names = list(photos.keys())[:4]
+    # Карточки рендерятся в общем пуле параллельно, показываются по порядку
+    submit = get_scheduler().for_session(session_id())
+    jobs = [(row, submit(preview_cards, renderer, row, logo_pil)) for row in rows[:4]]
 
-    for fio in preview_names:
-        photo_pil = PhotoUtils.process_upload(photos[fio], fio)
+    for row, job in jobs:
+        fio = row.fio
+        try:
+            front, back_img = job.result()
+        except Exception as e:
+            st.warning(f"⚠️ «{fio}»: фото не читается ({e})")
+            continue
 
         col1, col2 = st.columns(2)
 
         with col1:
             st.caption(f"**{fio}** — лицевая сторона")
-            front = renderer.front(photo_pil, logo_pil)
-            st.image(front, use_container_width=True)
+            show_card(front)
 
         with col2:
             st.caption(f"**{fio}** — оборотная сторона")
-            back_img = renderer.back(fio)
-            st.image(back_img, use_container_width=True)
+            show_card(back_img)
 
         st.divider()
 
-    if len(photos) > 4:
-        st.info(f"Показаны первые 4 из {len(photos)}. Все будут в итоговом документе.")
+    if len(rows) > 4:
+        st.info(f"Показаны первые 4 из {len(rows)}. Все будут в итоговом документе.")
 
 
 # ═══════════════════════════════════════════════════
 #  ГЕНЕРАЦИЯ И СКАЧИВАНИЕ
 # ═══════════════════════════════════════════════════
 
-def render_generate(cfg: PassConfig, photos: dict, logo_bytes: bytes | None):
+def preview_cards(renderer, row, logo_pil):
+    """Обе стороны одной карточки — задача для пула рендера"""
+    from photo_utils import PhotoUtils
+    photo_pil = PhotoUtils.process_upload(row.read_photo(), row.fio)
+    front = renderer.front(photo_pil, logo_pil, row.series, row.number, row.date_end)
+    return front, renderer.back(row.fio, row.date_start)
+
+
+def show_card(card):
+    """Растровая карточка — картинкой, SVG — разметкой в странице"""
+    if isinstance(card, str):
+        st.html(f'<div class="pass-svg">{card}</div>')
+    else:
+        st.image(card, use_container_width=True)
+
+
+def render_generate(cfg: PassConfig, rows: list, logo_bytes: bytes | None):
     """Кнопка генерации"""
-    if not photos:
+    if not rows:
         return
 
     st.divider()
@@ -269,58 +420,337 @@ def render_generate(cfg: PassConfig, photos: dict, logo_bytes: bytes | None):
 
     with col2:
         st.subheader("📄 Генерация документа")
-        st.write(f"Будет создано **{len(photos)}** пропусков")
+        from sheet_layout import pack
+        layout = pack(cfg)
+        st.write(f"Будет создано **{len(rows)}** пропусков на "
+                 f"**{layout.sheets(len(rows))}** листах {layout.paper} "
+                 f"({layout.capacity} на листе)")
         st.write(f"Размер: **{cfg.card_w}×{cfg.card_h}** см, "
                  f"зазор: **{cfg.cut_margin * 10:.1f}** мм")
 
-        if st.button("🚀 Сгенерировать .docx", type="primary", use_container_width=True):
+        checked = render_preflight(cfg, rows)
+        if checked is None:
+            return
+        rows, photo_groups = checked
+
+        with st.expander("💾 Память"):
+            budget = st.number_input(
+                "Бюджет на картинки документа, МБ (0 — без ограничения)",
+                min_value=0, max_value=8192, step=16,
+                value=int(os.environ.get("PASS_MEMORY_BUDGET_MB", "0")),
+                help="Сверх бюджета картинки выгружаются во временную папку "
+                     "до сохранения документа. Ограничивает только сборку: "
+                     "для скачивания готовый файл загружается в память сервера",
+            )
+            show_report = st.checkbox("Отчёт о памяти по этапам (медленнее)")
+
+        with st.expander("🗂️ Разбить на части"):
+            shard = st.checkbox(
+                "Несколько документов в ZIP",
+                help="Большой тираж делится на части по N страниц, "
+                     "части собираются параллельно",
+            )
+            c1, c2 = st.columns(2)
+            shard_pages = c1.number_input("Страниц в части", 2, 1000, 50, 2)
+            shard_workers = c2.number_input(
+                "Процессов", 1, 32, max(1, (os.cpu_count() or 2) - 1)
+            )
+
+        with st.expander("🖨️ Картинки для карточного принтера"):
+            export = st.checkbox(
+                "ZIP с картинками сторон вместо документа",
+                help="Каждая сторона — отдельный файл «ФИО_front/back», "
+                     "плюс index.csv. Без вёрстки листов — быстрее документа",
+            )
+            c1, c2 = st.columns(2)
+            export_dpi = c1.number_input("DPI картинок", 72, 600, cfg.dpi, 1)
+            export_fmt = c2.selectbox("Формат", ("png", "jpg"))
+
+        if export and st.button("🚀 Экспортировать картинки (.zip)", type="primary",
+                                use_container_width=True):
+            render_export(cfg, rows, logo_bytes, int(export_dpi), export_fmt)
+            return
+
+        if not export and shard and st.button("🚀 Сгенерировать части (.zip)", type="primary",
+                               use_container_width=True):
+            render_shards(cfg, rows, logo_bytes, int(shard_pages), int(shard_workers))
+            return
+
+        if not export and not shard and st.button("🚀 Сгенерировать .docx", type="primary",
+                                   use_container_width=True):
             progress = st.progress(0, text="Генерация пропусков...")
 
             def update_progress(value):
                 progress.progress(value, text=f"Обработка... {int(value * 100)}%")
 
-            builder = DocumentBuilder(cfg)
-            docx_bytes = builder.build(photos, logo_bytes, progress_cb=update_progress)
-
-            progress.progress(1.0, text="✅ Готово!")
-            st.balloons()
-
-            st.download_button(
-                label="📥 Скачать готовый документ",
-                data=docx_bytes,
-                file_name="propuska.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                type="primary",
-                use_container_width=True,
-            )
+            cache = get_build_cache()
+            key = cache.key(rows, cfg, logo_bytes)
+            path = cache.get(key)
+            count = cache.meta(key).get("count") if path else None
+            builder = None
+
+            if count is not None:
+                progress.progress(1.0, text="♻️ Готовый документ взят из кэша")
+            else:
+                from document_builder import DocumentBuilder
+                from render_pool import renderer_for
+
+                builder = DocumentBuilder(
+                    cfg, memory_budget_mb=budget or None, report=show_report,
+                    submit=get_scheduler().for_session(session_id()),
+                    renderer=renderer_for(cfg), photo_groups=photo_groups,
+                )
+                out = new_output_path()
+                count = builder.build_rows(
+                    rows, logo_bytes, out,
+                    progress_cb=update_progress, total=len(rows),
+                )
+                # Пустой документ и фото, обрезанные по центру из-за
+                # бюджета детекции, в кэш не идут — в другой раз выйдет лучше
+                if count and not builder.last_report.timed_out:
+                    path = cache.put(key, out, {"count": count})
+                else:
+                    path = out
+
+                progress.progress(1.0, text="✅ Готово!")
+                st.balloons()
+
+            # ══ Скачивание — из памяти сервера, см. render_download ══
+            with open(path, "rb") as f:
+                render_download(f)
+
+            if builder and (budget or show_report):
+                st.code("\n".join(builder.last_report.lines()), language=None)
+            elif builder and builder.last_report.slow_photos:
+                st.warning("🐢 Медленные фото:\n\n" + "\n".join(
+                    f"- {line.strip()}" for line in builder.last_report.photo_lines()
+                ))
 
             st.markdown(
                 '<div class="success-box">'
-                f"✅ Создано <b>{len(photos)}</b> пропусков! "
+                f"✅ Создано <b>{count}</b> пропусков! "
                 f"Размер: {cfg.card_w}×{cfg.card_h} см"
                 "</div>",
                 unsafe_allow_html=True,
             )
 
 
+def render_preflight(cfg: PassConfig, rows: list) -> tuple[list, dict] | None:
+    """
+    Отчёт проверки фото и ФИО до сборки. Возвращает строки для сборки и
+    группы похожих фото (для DocumentBuilder) или None, если выбрано
+    «остановить» и есть ошибки.
+    """
+    from preflight import PreflightError, scan
+
+    # Проверка повторяется только при смене набора файлов, не на каждый клик
+    key = rows_key(rows)
+    cached = st.session_state.get("preflight")
+    if cached and cached[0] == key and cached[1] == cfg.fingerprint():
+        report = cached[2]
+    else:
+        report = scan(rows, cfg)
+        st.session_state["preflight"] = (key, cfg.fingerprint(), report)
+
+    title = "🔎 Проверка пакета"
+    if report.errors:
+        title += f" — ошибок: {len(report.errors)}"
+    elif report.warnings:
+        title += f" — предупреждений: {len(report.warnings)}"
+    else:
+        title += " — ✅"
+
+    with st.expander(title, expanded=bool(report.errors)):
+        st.code("\n".join(report.lines()), language=None)
+        st.download_button(
+            "📥 Полный отчёт (.csv)", report.to_csv(),
+            file_name="proverka.csv", mime="text/csv",
+        )
+        policy = st.radio(
+            "Строки с ошибками",
+            ["skip", "fail"],
+            format_func={"skip": "Пропустить при сборке",
+                         "fail": "Не собирать, пока не исправлены"}.get,
+            horizontal=True,
+            key="preflight_policy",
+        )
+
+    if report.duplicates:
+        st.warning("👯 Похожие фото — проверьте, не перепутаны ли файлы:\n\n" + "\n".join(
+            f"- {it.fio or it.source}: похоже на «{report.items[it.same_photo].fio}» "
+            f"(строка {it.same_photo + 1})"
+            for it in report.duplicates[:10]
+        ) + (f"\n- … и ещё {len(report.duplicates) - 10}"
+             if len(report.duplicates) > 10 else ""))
+
+    groups = report.photo_groups(rows, policy)
+    try:
+        rows = report.apply(rows, policy)
+    except PreflightError as e:
+        st.error(f"❌ Сборка остановлена: {e}")
+        return None
+
+    if report.errors:
+        st.write(f"После проверки будет создано **{len(rows)}** пропусков")
+    return rows, groups
+
+
+def rows_key(rows: list) -> tuple:
+    """Отпечаток набора строк без чтения фото: поля + идентификатор файла"""
+    def source(row):
+        owner = getattr(row.loader, "__self__", None)   # UploadedFile.getvalue
+        entry = getattr(row.loader, "info", None)       # ZipEntry
+        return (row.photo_path, getattr(owner, "file_id", None),
+                getattr(entry, "filename", None), getattr(entry, "CRC", None))
+
+    return tuple(
+        (r.fio, r.series, r.number, r.date_start, r.date_end) + source(r)
+        for r in rows
+    )
+
+
+def render_shards(cfg, rows, logo_bytes, pages, workers):
+    """Сборка частями: ZIP с документами и index.csv (собирается на диске)"""
+    from sharding import build_shards, cards_per_shard
+    from sheet_layout import pack
+
+    per_shard = cards_per_shard(pages, pack(cfg).capacity)
+    total = -(-len(rows) // per_shard)
+    progress = st.progress(0, text=f"Сборка {total} частей...")
+
+    cache = get_build_cache()
+    key = cache.key(rows, cfg, logo_bytes, kind=f"shards:{per_shard}")
+    path = cache.get(key)
+    parts = cache.meta(key).get("parts") if path else None
+    failed = []
+
+    if parts is not None:
+        progress.progress(1.0, text="♻️ Готовый архив взят из кэша")
+    else:
+        out = new_output_path(".zip")
+        results = build_shards(
+            rows, cfg, logo_bytes, out, pages, workers,
+            progress_cb=lambda n: progress.progress(
+                min(n / total, 1.0), text=f"Готово частей: {n} из {total}"
+            ),
+        )
+        progress.progress(1.0, text="✅ Готово!")
+        failed = [r for r in results if r.error]
+        parts = len(results) - len(failed)
+        # Архив с несобранными частями не кэшируем
+        path = out if failed else cache.put(key, out, {"parts": parts})
+
+    if failed:
+        st.error("Не собраны части: " + ", ".join(str(r.index) for r in failed))
+    with open(path, "rb") as f:
+        st.download_button(
+            label=f"📥 Скачать {parts} частей (.zip)",
+            data=f,
+            file_name="propuska.zip",
+            mime="application/zip",
+            type="primary",
+            use_container_width=True,
+        )
+
+
+def render_export(cfg, rows, logo_bytes, dpi, fmt):
+    """Картинки сторон в ZIP — пишутся в файл по одной, по мере рендера"""
+    from card_export import export_zip
+
+    progress = st.progress(0, text="Экспорт картинок...")
+    cache = get_build_cache()
+    key = cache.key(rows, cfg, logo_bytes, kind=f"cards:{dpi}:{fmt}")
+    path = cache.get(key)
+    count = cache.meta(key).get("count") if path else None
+
+    if count is not None:
+        progress.progress(1.0, text="♻️ Готовый архив взят из кэша")
+    else:
+        out = new_output_path(".zip")
+        count = export_zip(
+            rows, cfg, logo_bytes, out, dpi=dpi, fmt=fmt,
+            progress_cb=lambda v: progress.progress(v, text=f"Экспорт... {int(v * 100)}%"),
+            total=len(rows), submit=get_scheduler().for_session(session_id()),
+        )
+        progress.progress(1.0, text="✅ Готово!")
+        path = cache.put(key, out, {"count": count}) if count else out
+
+    with open(path, "rb") as f:
+        st.download_button(
+            label=f"📥 Скачать картинки {count} пропусков (.zip)",
+            data=f,
+            file_name="propuska_cards.zip",
+            mime="application/zip",
+            type="primary",
+            use_container_width=True,
+        )
+
+
+# Документ больше — подсказка, что скачивание держит его в памяти сервера
+LARGE_DOWNLOAD_MB = 100
+
+
+def render_download(data):
+    """
+    st.download_button читает файл целиком в хранилище медиа Streamlit —
+    отдать его с диска потоком Streamlit не умеет. О большом файле
+    пользователь узнаёт сразу, с подсказкой, как обойтись без этого.
+    """
+    st.download_button(
+        label="📥 Скачать готовый документ",
+        data=data,
+        file_name="propuska.docx",
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        type="primary",
+        use_container_width=True,
+    )
+    size_mb = os.fstat(data.fileno()).st_size / (1024 * 1024) if hasattr(data, "fileno") else 0
+    if size_mb >= LARGE_DOWNLOAD_MB:
+        st.caption(
+            f"ℹ️ Документ {size_mb:.0f} МБ: на время скачивания он целиком в памяти "
+            "сервера. Для больших тиражей — «Разбить на части» или HTTP-сервис "
+            "(server.py), он отдаёт документ с диска потоком."
+        )
+
+
+def new_output_path(suffix: str = ".docx") -> str:
+    """Временный файл для документа; предыдущий файл сессии удаляется"""
+    import tempfile
+
+    old = st.session_state.pop("docx_path", None)
+    if old and os.path.exists(old):
+        os.remove(old)
+    fd, path = tempfile.mkstemp(prefix="propuska_", suffix=suffix)
+    os.close(fd)
+    st.session_state["docx_path"] = path
+    return path
+
+
 # ═══════════════════════════════════════════════════
 #  MAIN
 # ═══════════════════════════════════════════════════
 
 def main():
+    start_warm_up()
+    get_scheduler()
     cfg = render_sidebar()
-    photos, logo_bytes = render_upload(cfg)
-    render_preview(cfg, photos, logo_bytes)
-    render_generate(cfg, photos, logo_bytes)
+    rows, logo_bytes = render_upload(cfg)
+    render_preview(cfg, rows, logo_bytes)
+    render_generate(cfg, rows, logo_bytes)
 
     # Футер
     st.divider()
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     col1.caption("🪪 Генератор пропусков v2.1")
     col2.caption(
         f"📏 Карточка: {cfg.card_w}×{cfg.card_h} см | "
         f"✂️ Зазор: {cfg.cut_margin * 10:.1f} мм"
     )
+    cs = get_build_cache().stats()
+    col3.caption(
+        f"♻️ Кэш: {cs['entries']} док., {cs['mb']:.1f} МБ | "
+        f"попаданий {cs['hits']} из {cs['hits'] + cs['misses']}"
+    )
 
 
 if __name__ == "__main__":
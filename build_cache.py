@@ -0,0 +1,168 @@
+"""
+Кэш готовых документов, общий для всех сессий сервера.
+
+Ключ — отпечаток PassConfig, логотип и для каждой строки ФИО, поля
+реестра и SHA-256 фото. Файлы лежат на диске; вытеснение по суммарному
+размеру (давно не запрошенные первыми) и по возрасту. Рядом с файлом —
+его метаданные (<ключ>.json, например сколько пропусков собрано).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Iterable
+
+from config import PassConfig
+from roster import RosterRow
+
+MB = 1024 * 1024
+
+
+class BuildCache:
+
+    def __init__(
+        self,
+        root: str | None = None,
+        max_mb: float = 1024,
+        max_age_h: float = 24,
+    ):
+        self.root = root or os.environ.get("PASS_CACHE_DIR") or os.path.join(
+            tempfile.gettempdir(), "pass_build_cache"
+        )
+        self.max_bytes = int(max_mb * MB)
+        self.max_age = max_age_h * 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    # ── Ключ ───────────────────────────────────────
+
+    @staticmethod
+    def key(
+        rows: Iterable[RosterRow],
+        cfg: PassConfig,
+        logo_bytes: bytes | None,
+        kind: str = "docx",
+    ) -> str:
+        """Отпечаток запроса; фото читаются и хэшируются, но не сохраняются"""
+        h = hashlib.sha256()
+        h.update(f"{kind}\0{cfg.fingerprint()}\0".encode())
+        h.update(hashlib.sha256(logo_bytes or b"").digest())
+        for row in rows:
+            fields = (row.fio, row.series, row.number, row.date_start, row.date_end)
+            h.update("\0".join(fields).encode("utf-8"))
+            try:
+                h.update(hashlib.sha256(row.read_photo()).digest())
+            except Exception:
+                h.update(b"\0no-photo")
+        return h.hexdigest()
+
+    # ── Доступ ─────────────────────────────────────
+
+    def get(self, key: str) -> str | None:
+        """Путь к готовому документу или None"""
+        path = self._path(key)
+        with self._lock:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            if time.time() - st.st_mtime > self.max_age:
+                self._remove(path)
+                self.misses += 1
+                return None
+            # atime = последний запрос (для вытеснения), mtime = создание
+            os.utime(path, (time.time(), st.st_mtime))
+            self.hits += 1
+            return path
+
+    def meta(self, key: str) -> dict:
+        """Метаданные, сохранённые в put(); {} — если их нет"""
+        try:
+            with open(self._meta_path(self._path(key)), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def put(self, key: str, src_path: str, meta: dict | None = None) -> str:
+        """
+        Переносит собранный файл в кэш, возвращает его новый путь.
+        meta — что отдать вместе с файлом при попадании (meta(key)).
+        Файл больше всего кэша не кэшируется — возвращается src_path.
+        Только что добавленный файл вытеснением не удаляется.
+        """
+        if os.path.getsize(src_path) > self.max_bytes:
+            return src_path
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        shutil.move(src_path, tmp)
+        with self._lock:
+            # Метаданные раньше файла: найденный файл всегда с ними
+            with open(tmp + ".json", "w", encoding="utf-8") as f:
+                json.dump(meta or {}, f, ensure_ascii=False)
+            os.replace(tmp + ".json", self._meta_path(path))
+            os.replace(tmp, path)
+            self._evict(keep=path)
+        return path
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "mb": sum(size for _, size, _, _ in entries) / MB,
+        }
+
+    # ── Приватные ──────────────────────────────────
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key + ".bin")
+
+    @staticmethod
+    def _meta_path(path: str) -> str:
+        return os.path.splitext(path)[0] + ".json"
+
+    def _remove(self, path: str):
+        for p in (path, self._meta_path(path)):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+    def _entries(self) -> list[tuple[str, int, float, float]]:
+        out = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            out.append((path, st.st_size, st.st_atime, st.st_mtime))
+        return out
+
+    def _evict(self, keep: str = ""):
+        now = time.time()
+        entries = []
+        for path, size, atime, mtime in self._entries():
+            if path != keep and now - mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((atime, size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total -= size
@@ -0,0 +1,116 @@
+"""
+Экспорт карточек отдельными картинками в ZIP — для программ карточных
+принтеров (Evolis, Zebra и т.п.), которые печатают из файлов, а не из Word.
+
+    Иванов Иван Иванович_front.png
+    Иванов Иван Иванович_back.png
+    ...
+    index.csv                        # ФИО, серия, номер, файлы сторон
+
+Рендер тот же, что у DocumentBuilder (DocumentBuilder.cards), но без
+вёрстки листов. Каждая карточка пишется в архив сразу после рендера
+(ZIP_STORED — PNG уже сжат), архив в памяти не собирается: out может
+быть файлом или непрерывным потоком (ответ HTTP, stdout).
+"""
+
+import csv
+import io
+import re
+import zipfile
+from dataclasses import replace
+from typing import BinaryIO, Iterable
+
+from PIL import Image
+
+from config import PassConfig
+from roster import RosterRow
+
+FORMATS = {"png": "PNG", "jpg": "JPEG"}
+
+# Запрещённые в именах файлов Windows символы и управляющие коды
+_BAD_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def export_zip(
+    rows: Iterable[RosterRow],
+    cfg: PassConfig,
+    logo_bytes: bytes | None,
+    out: str | BinaryIO,
+    dpi: int | None = None,
+    fmt: str = "png",
+    progress_cb=None,
+    total: int | None = None,
+    submit=None,
+    photo_store=None,
+    photo_groups: dict[int, int] | None = None,
+) -> int:
+    """
+    Пишет лицевую и оборотную сторону каждого пропуска в ZIP.
+    dpi — разрешение картинок (по умолчанию cfg.dpi); карточка
+    масштабируется, физический размер в метаданных остаётся прежним.
+    submit, photo_store, photo_groups — как у DocumentBuilder. Возвращает число карточек.
+    """
+    from document_builder import DocumentBuilder
+
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt: ожидается одно из {tuple(FORMATS)}")
+    dpi = dpi or cfg.dpi
+    size = card_size_px(cfg, dpi)
+    builder = DocumentBuilder(cfg, submit=submit, photo_store=photo_store,
+                              photo_groups=photo_groups)
+
+    index = io.StringIO()
+    table = csv.writer(index, delimiter=";")
+    table.writerow(["№", "ФИО", "Серия", "Номер", "Лицевая", "Оборотная"])
+    taken: set[str] = set()
+    done = 0
+
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+        for row, front, back in builder.cards(rows, logo_bytes):
+            base = unique_name(card_file_base(row.fio), taken)
+            names = []
+            for side, card in (("front", front), ("back", back)):
+                name = f"{base}_{side}.{fmt}"
+                with zf.open(name, "w") as f:
+                    write_card(card, f, size, dpi, FORMATS[fmt])
+                names.append(name)
+            done += 1
+            table.writerow([done, row.fio, row.series, row.number, *names])
+            if progress_cb and total:
+                progress_cb(min(done / total, 1.0))
+
+        zf.writestr("index.csv", index.getvalue().encode("utf-8-sig"),
+                    zipfile.ZIP_DEFLATED)
+    return done
+
+
+def write_card(card: Image.Image, f: BinaryIO, size: tuple[int, int],
+               dpi: int, fmt: str = "PNG"):
+    """Карточка в поток; масштаб — только если dpi отличается от рендера"""
+    if card.size != size:
+        card = card.resize(size, Image.Resampling.LANCZOS)
+    if fmt == "JPEG":
+        card.convert("RGB").save(f, "JPEG", quality=95, dpi=(dpi, dpi))
+    else:
+        # Уровень 3 в ~1.5 раза быстрее уровня по умолчанию, файл больше на ~10%
+        card.save(f, "PNG", compress_level=3, dpi=(dpi, dpi))
+
+
+def card_size_px(cfg: PassConfig, dpi: int) -> tuple[int, int]:
+    """Размер карточки в пикселях при заданном dpi — как в CardRenderer"""
+    return replace(cfg, dpi=dpi).get_px()
+
+
+def card_file_base(fio: str) -> str:
+    name = _BAD_CHARS.sub("_", " ".join(fio.split())).strip(" .")
+    return name or "без имени"
+
+
+def unique_name(base: str, taken: set[str]) -> str:
+    """Однофамильцы с одинаковым ФИО получают « (2)», « (3)»…"""
+    name, n = base, 1
+    while name.lower() in taken:
+        n += 1
+        name = f"{base} ({n})"
+    taken.add(name.lower())
+    return name
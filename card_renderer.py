@@ -4,10 +4,18 @@ import os
 from PIL import Image, ImageDraw
 from config import PassConfig
 from drawing_utils import DrawingUtils as DU
+from glyph_atlas import atlas_for
 
 
 class CardRenderer:
 
+    # Переменный текст оборота (ФИО, дата) меряется и рисуется из атласа
+    # глифов (glyph_atlas) — без FreeType на каждой карточке
+    use_atlas = True
+
+    # Фото вставляется сразу в холст карточки (DrawingUtils.add_photo)
+    fused_photo = True
+
     def __init__(self, cfg: PassConfig):
         self.cfg = cfg
         self.w, self.h = cfg.get_px()
@@ -17,9 +25,12 @@ class CardRenderer:
     #  ЛИЦЕВАЯ СТОРОНА
     # ═══════════════════════════════════════════════
 
-    def front(self, photo_pil: Image.Image, logo_pil=None) -> Image.Image:
-        img = Image.new("RGB", (self.w, self.h), "white")
-        draw = ImageDraw.Draw(img)
+    def front(
+        self, photo_pil: Image.Image, logo_pil=None,
+        series: str = "", number: str = "", date_end: str = "",
+    ) -> Image.Image:
+        """Пустые series/number → плейсхолдер, пустая date_end → из конфига"""
+        img, draw = self._new_canvas()
 
         hh = self._front_header(img, draw)
         pr = self._front_photo(img, photo_pil, hh)
@@ -28,17 +39,16 @@ class CardRenderer:
         if logo_pil is not None:
             self._front_logo(img, logo_pil, pr, hh)
 
-        self._front_info(draw, pr, hh)
+        self._front_info(draw, pr, hh, series, number, date_end)
         DU.card_border(draw, self.w, self.h, self.cfg.primary_color)
-        return img
+        return self._finish(img)
 
     # ═══════════════════════════════════════════════
     #  ОБОРОТНАЯ СТОРОНА
     # ═══════════════════════════════════════════════
 
-    def back(self, fio: str) -> Image.Image:
-        img = Image.new("RGB", (self.w, self.h), "white")
-        draw = ImageDraw.Draw(img)
+    def back(self, fio: str, date_start: str = "") -> Image.Image:
+        img, draw = self._new_canvas()
 
         parts = fio.split()
         sur = parts[0] if parts else ""
@@ -47,10 +57,21 @@ class CardRenderer:
 
         y = self._back_header(draw)
         y = self._back_fio(draw, sur, name, pat, y)
-        y = self._back_date(draw, y)
+        y = self._back_date(draw, y, date_start or self.cfg.date_start)
         y = self._back_perm(draw, y)
         self._back_sign(draw, y)
         DU.card_border(draw, self.w, self.h, self.cfg.primary_color)
+        return self._finish(img)
+
+    # ──────────────────────────────────────────────
+    #  ХОЛСТ (переопределяется в SvgCardRenderer)
+    # ──────────────────────────────────────────────
+
+    def _new_canvas(self):
+        img = Image.new("RGB", (self.w, self.h), "white")
+        return img, ImageDraw.Draw(img)
+
+    def _finish(self, img):
         return img
 
     # ──────────────────────────────────────────────
@@ -60,10 +81,7 @@ class CardRenderer:
     def _front_header(self, img, draw) -> int:
         """Градиентная шапка, возвращает высоту"""
         hh = int(self.h * 0.18)
-        grad = DU.create_gradient(
-            self.w, hh, self.cfg.gradient_start, self.cfg.gradient_end
-        )
-        img.paste(grad, (0, 0))
+        self._paint_gradient(img, hh)
 
         bb = draw.textbbox((0, 0), self.cfg.header_text, font=self.fonts["header"])
         tw, th = bb[2] - bb[0], bb[3] - bb[1]
@@ -74,11 +92,23 @@ class CardRenderer:
         )
         return hh
 
+    def _paint_gradient(self, img, hh):
+        grad = DU.create_gradient(
+            self.w, hh, self.cfg.gradient_start, self.cfg.gradient_end
+        )
+        img.paste(grad, (0, 0))
+
     def _front_photo(self, img, photo_pil, hh) -> int:
         """Фото с рамкой, возвращает правую границу"""
+        x, y, size = self._photo_box(hh)
+        return DU.add_photo(img, photo_pil, x, y, size, "#FFFFFF", 10,
+                            fused=self.fused_photo)
+
+    def _photo_box(self, hh):
+        """Позиция и размер фото без рамки: (x, y, (w, h))"""
         pw = int(self.w * 0.32)
         ph = int(pw * 1.33)
-        return DU.add_photo(img, photo_pil, 50, hh + 50, (pw, ph), "#FFFFFF", 10)
+        return 50, hh + 50, (pw, ph)
 
     def _front_logo(self, img, logo_pil, photo_right, header_h):
         """Полупрозрачный логотип-водяной знак справа от фото"""
@@ -90,23 +120,10 @@ class CardRenderer:
             a = a.point(lambda p: int(p * 0.30))
             logo.putalpha(a)
 
-            # Масштабируем
-            lh = int(self.h * 0.45)
-            lw = int(logo.width * (lh / logo.height))
+            # Масштабируем и центрируем в правой части карточки
+            logo_x, logo_y, lw, lh = self._logo_box(logo, photo_right, header_h)
             logo = logo.resize((lw, lh), Image.Resampling.LANCZOS)
 
-            # Центрируем в правой части карточки
-            right_start = photo_right + 30
-            right_end = self.w - 40
-            center_x = right_start + (right_end - right_start) // 2
-
-            logo_x = int(center_x - lw / 2)
-            logo_y = header_h + (self.h - header_h - lh) // 2 + 20
-
-            # Убеждаемся что координаты в пределах карточки
-            logo_x = max(0, min(logo_x, self.w - lw))
-            logo_y = max(0, min(logo_y, self.h - lh))
-
             img.paste(logo, (logo_x, logo_y), logo)
             print(f"  ✓ Логотип добавлен: ({logo_x}, {logo_y}), размер {lw}x{lh}")
 
@@ -114,7 +131,25 @@ class CardRenderer:
             # ══ ФИКС: НЕ глушим ошибку ══
             print(f"  ⚠️ Ошибка логотипа: {e}")
 
-    def _front_info(self, draw, photo_right, header_h):
+    def _logo_box(self, logo, photo_right, header_h):
+        """Позиция и размер логотипа: (x, y, w, h)"""
+        lh = int(self.h * 0.45)
+        lw = int(logo.width * (lh / logo.height))
+
+        right_start = photo_right + 30
+        right_end = self.w - 40
+        center_x = right_start + (right_end - right_start) // 2
+
+        logo_x = int(center_x - lw / 2)
+        logo_y = header_h + (self.h - header_h - lh) // 2 + 20
+
+        # Убеждаемся что координаты в пределах карточки
+        logo_x = max(0, min(logo_x, self.w - lw))
+        logo_y = max(0, min(logo_y, self.h - lh))
+        return logo_x, logo_y, lw, lh
+
+    def _front_info(self, draw, photo_right, header_h,
+                    series="", number="", date_end=""):
         """Информационный блок справа от фото"""
         right_start = photo_right + 40
         right_end = self.w - 50
@@ -146,7 +181,7 @@ class CardRenderer:
         y += 20
 
         # Серия / номер
-        series = "Серия _____ № ______"
+        series = f"Серия {series or '_____'} № {number or '______'}"
         sb = draw.textbbox((0, 0), series, font=self.fonts["value"])
         sw, sh = sb[2] - sb[0], sb[3] - sb[1]
 
@@ -180,7 +215,7 @@ class CardRenderer:
         DU.text_centered(draw, date_label, label_font, cx, by, self.cfg.text_dark)
         by += 30
 
-        dt = f"{self.cfg.date_end} г."
+        dt = f"{date_end or self.cfg.date_end} г."
         db = draw.textbbox((0, 0), dt, font=val_font)
         dw = db[2] - db[0]
         dx = cx - dw / 2
@@ -227,7 +262,7 @@ class CardRenderer:
 
         max_label_w = 0
         for label, _ in fields:
-            bb = draw.textbbox((0, 0), label, font=label_font)
+            bb = self._text_bbox(draw, label, label_font)
             lw = bb[2] - bb[0]
             max_label_w = max(max_label_w, lw)
 
@@ -236,7 +271,7 @@ class CardRenderer:
 
         for label, value in fields:
             # Метка слева
-            draw.text((xm, y), label, font=label_font, fill=self.cfg.text_dark)
+            self._text(draw, (xm, y), label, label_font, self.cfg.text_dark)
 
             # Линия для значения — начинается после самой длинной метки
             line_y = y + 38
@@ -249,16 +284,15 @@ class CardRenderer:
             if value:
                 # ══ ФИКС: проверяем что значение влезает ══
                 avail = self.w - xm - label_end - 10
-                vf = self._fit_font_for_text(draw, value, avail, value_font, 24)
-                draw.text(
-                    (label_end + 10, y + 2), value,
-                    font=vf, fill=self.cfg.accent_color,
+                vf = self._fit_font_for_text(
+                    draw, value, avail, value_font, 24, self._text_bbox
                 )
+                self._text(draw, (label_end + 10, y + 2), value, vf, self.cfg.accent_color)
             y += 60
 
         return y + 10
 
-    def _back_date(self, draw, y) -> int:
+    def _back_date(self, draw, y, date_start) -> int:
         """Дата оформления"""
         xm = 50
         label_font = self.fonts["label"]
@@ -271,11 +305,11 @@ class CardRenderer:
 
         draw.text((xm, y), label, font=label_font, fill=self.cfg.text_dark)
 
-        dt = f"{self.cfg.date_start} г."
-        draw.text((label_end + 10, y + 2), dt, font=value_font, fill=self.cfg.accent_color)
+        dt = f"{date_start} г."
+        self._text(draw, (label_end + 10, y + 2), dt, value_font, self.cfg.accent_color)
 
         # Линия под датой
-        db = draw.textbbox((0, 0), dt, font=value_font)
+        db = self._text_bbox(draw, dt, value_font)
         dw = db[2] - db[0]
         draw.line(
             [(label_end, y + 38), (label_end + dw + 20, y + 38)],
@@ -322,20 +356,42 @@ class CardRenderer:
             fill=self.cfg.primary_color, width=2,
         )
 
+    # ──────────────────────────────────────────────
+    #  УТИЛИТА: текст через атлас глифов
+    # ──────────────────────────────────────────────
+
+    def _text_bbox(self, draw, text, font):
+        atlas = atlas_for(font) if self.use_atlas else None
+        if atlas is None:
+            return draw.textbbox((0, 0), text, font=font)
+        return atlas.bbox(text)
+
+    def _text(self, draw, xy, text, font, fill):
+        """draw.text; из атласа — только на целых координатах, как в PIL"""
+        atlas = atlas_for(font) if self.use_atlas else None
+        if atlas is None or any(v != int(v) for v in xy):
+            draw.text(xy, text, font=font, fill=fill)
+        else:
+            atlas.draw(draw, (int(xy[0]), int(xy[1])), text, fill)
+
     # ──────────────────────────────────────────────
     #  УТИЛИТА: подбор размера шрифта
     # ──────────────────────────────────────────────
 
     @staticmethod
-    def _fit_font_for_text(draw, text, max_width, base_font, min_size=16):
+    def _fit_font_for_text(draw, text, max_width, base_font, min_size=16, bbox=None):
         """
         Уменьшает шрифт пока текст не влезет в max_width.
-        Возвращает подходящий шрифт.
+        Возвращает подходящий шрифт. bbox(draw, text, font) — чем мерить
+        (по умолчанию draw.textbbox).
         """
         font = base_font
+        if bbox is None:
+            def bbox(draw, text, font):
+                return draw.textbbox((0, 0), text, font=font)
 
         # Проверяем влезает ли текст
-        bb = draw.textbbox((0, 0), text, font=font)
+        bb = bbox(draw, text, font)
         if bb[2] - bb[0] <= max_width:
             return font
 
@@ -350,7 +406,7 @@ class CardRenderer:
             current_size -= 2
             try:
                 test_font = DU._load_font(font_path, current_size)
-                bb = draw.textbbox((0, 0), text, font=test_font)
+                bb = bbox(draw, text, test_font)
                 if bb[2] - bb[0] <= max_width:
                     return test_font
             except Exception:
@@ -1,8 +1,11 @@
 """Конфигурация генератора пропусков"""
 
+import hashlib
+import json
 import os
+import re
 from typing import Tuple
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, fields
 
 
 @dataclass
@@ -18,6 +21,10 @@ class PassConfig:
     # Расстояние между карточками в документе
     cut_margin: float = 0.2  # 2мм с каждой стороны
 
+    # Лист: A4 / A3 / SRA3 и поле до края (см) — раскладка в sheet_layout
+    paper: str = "A4"
+    page_margin: float = 0.5
+
     # Тексты
     date_start: str = "05.01.2026"
     date_end: str = "05.01.2031"
@@ -52,4 +59,46 @@ class PassConfig:
 
     def has_default_logo(self) -> bool:
         """Есть ли логотип по умолчанию"""
-        return os.path.exists(self.default_logo_path())
\ No newline at end of file
+        return os.path.exists(self.default_logo_path())
+
+    def fingerprint(self) -> str:
+        """Отпечаток всех настроек — ключ для кэшей рендера"""
+        raw = json.dumps(asdict(self), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PassConfig":
+        """Конфиг из JSON: неизвестные ключи игнорируются, типы приводятся.
+
+        Размеры и dpi проверяются по LIMITS, цвета — по формату #RRGGBB:
+        иначе один запрос заставит рендер выделить холст любого размера.
+        """
+        cfg = cls()
+        for f in fields(cls):
+            if f.name in data and data[f.name] is not None:
+                setattr(cfg, f.name, type(getattr(cfg, f.name))(data[f.name]))
+
+        for name, (lo, hi) in LIMITS.items():
+            value = getattr(cfg, name)
+            if not lo <= value <= hi:
+                raise ValueError(f"{name} должен быть от {lo} до {hi}, получено {value}")
+        for f in fields(cls):
+            value = getattr(cfg, f.name)
+            if f.name.endswith(_COLOR_FIELDS) and not _HEX_COLOR.fullmatch(value):
+                raise ValueError(f"{f.name}: ожидается цвет #RRGGBB, получено {value!r}")
+
+        from sheet_layout import pack
+        pack(cfg)   # неизвестный лист или карточка не помещается — ValueError
+        return cfg
+
+
+# Допустимые значения для конфигов извне (HTTP-сервис)
+LIMITS = {
+    "card_w": (2.0, 30.0),
+    "card_h": (2.0, 30.0),
+    "dpi": (72, 600),
+    "cut_margin": (0.0, 2.0),
+    "page_margin": (0.0, 3.0),
+}
+_COLOR_FIELDS = ("_color", "gradient_start", "gradient_end", "text_dark", "text_light")
+_HEX_COLOR = re.compile(r"#[0-9A-Fa-f]{6}")
@@ -0,0 +1,410 @@
+"""
+Сборка тиража на нескольких машинах через общую папку (NFS, SMB).
+
+Координатор (plan) делит реестр на части по целым листам
+(layout.capacity карточек на лист) и выкладывает в папку задания всё,
+что нужно для сборки: настройки, логотип, строки и копии фото. Любое
+число рабочих (work) на любых машинах забирает части, собирает .docx и
+кладёт обратно; merge складывает готовые части в ZIP с index.csv, как
+sharding.build_shards.
+
+    python main.py --roster staff.xlsx --job /mnt/share/job     # план
+    python distributed.py work /mnt/share/job                    # на каждой машине
+    python distributed.py status /mnt/share/job
+    python distributed.py merge /mnt/share/job propuska.zip
+
+    python main.py --roster staff.xlsx --job job --workers 4     # всё локально
+
+Часть захватывается созданием claims/unit_NNNN с O_CREAT|O_EXCL —
+атомарно и на NFSv3+. Пока часть собирается, рабочий раз в lease/4
+обновляет mtime захвата. Захват старше lease — рабочий погиб: его
+переименовывают (удаётся ровно одному) и часть собирает другой.
+Документ пишется под временным именем и переименовывается, поэтому
+недособранная часть не видна, а двойная сборка ничего не ломает.
+Ошибка сборки записывается в errors/; после max_attempts часть больше
+не берётся и в index.csv отмечается как ошибка.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+
+from config import PassConfig
+from roster import RosterRow
+from sharding import ShardResult, _write_zip, cards_per_shard
+from sheet_layout import pack
+
+JOB = "job.json"
+LOGO = "logo.bin"
+LEASE = 60.0
+
+
+@dataclass
+class JobStatus:
+    units: int
+    done: int = 0
+    claimed: int = 0
+    stale: int = 0
+    failed: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.done + self.failed >= self.units
+
+    def line(self) -> str:
+        return (f"частей {self.units}: готово {self.done}, в работе {self.claimed} "
+                f"(из них брошено {self.stale}), ошибок {self.failed}")
+
+
+# ═══════════════════════════════════════════════════
+#  КООРДИНАТОР
+# ═══════════════════════════════════════════════════
+
+def plan(
+    rows,
+    cfg: PassConfig,
+    logo_bytes: bytes | None,
+    job_dir: str,
+    pages_per_unit: int = 10,
+    max_attempts: int = 3,
+) -> int:
+    """
+    Выкладывает задание в job_dir; возвращает число частей. Фото строк
+    копируются в photos/ — рабочим на других машинах нужна только папка.
+    Строки без фото пропускаются с предупреждением.
+    """
+    if os.path.exists(os.path.join(job_dir, JOB)):
+        raise FileExistsError(f"в {job_dir} уже есть задание")
+    per_unit = cards_per_shard(pages_per_unit, pack(cfg).capacity)
+    for sub in ("units", "photos", "claims", "done", "errors"):
+        os.makedirs(os.path.join(job_dir, sub), exist_ok=True)
+    if logo_bytes:
+        _write(os.path.join(job_dir, LOGO), logo_bytes)
+
+    units, chunk = 0, []
+    for row in rows:
+        try:
+            data = row.read_photo()
+        except Exception as e:
+            print(f"  ⚠️ Пропуск «{row.fio}»: нет фото ({e})")
+            continue
+        photo = f"photos/{len(chunk) + units * per_unit:06d}"
+        _write(os.path.join(job_dir, photo), data)
+        chunk.append({"fio": row.fio, "series": row.series, "number": row.number,
+                      "date_start": row.date_start, "date_end": row.date_end,
+                      "photo": photo})
+        if len(chunk) == per_unit:
+            units += 1
+            _write_json(os.path.join(job_dir, "units", _unit(units) + ".json"), chunk)
+            chunk = []
+    if chunk:
+        units += 1
+        _write_json(os.path.join(job_dir, "units", _unit(units) + ".json"), chunk)
+
+    # job.json — последним: без него рабочие папку не трогают
+    _write_json(os.path.join(job_dir, JOB), {
+        "cfg": asdict(cfg), "units": units, "per_unit": per_unit,
+        "logo": bool(logo_bytes), "max_attempts": max_attempts,
+        "created": time.time(),
+    })
+    return units
+
+
+def status(job_dir: str, lease: float = LEASE) -> JobStatus:
+    job = _job(job_dir)
+    st = JobStatus(job["units"])
+    now = time.time()
+    for i in range(1, job["units"] + 1):
+        name = _unit(i)
+        if os.path.exists(os.path.join(job_dir, "done", name + ".docx")):
+            st.done += 1
+        elif _attempts(job_dir, name) >= job["max_attempts"]:
+            st.failed += 1
+        else:
+            try:
+                age = now - os.stat(os.path.join(job_dir, "claims", name)).st_mtime
+            except FileNotFoundError:
+                continue
+            st.claimed += 1
+            st.stale += age > lease
+    return st
+
+
+def merge(job_dir: str, out) -> list[ShardResult]:
+    """ZIP из готовых частей и index.csv; несобранные — строкой с ошибкой"""
+    job = _job(job_dir)
+    results = []
+    for i in range(1, job["units"] + 1):
+        name = _unit(i)
+        path = os.path.join(job_dir, "done", name + ".docx")
+        try:
+            with open(path + ".json", encoding="utf-8") as f:
+                meta = json.load(f)
+            res = ShardResult(i, path, int(meta["cards"]), meta["first"], meta["last"])
+        except (OSError, ValueError, KeyError):
+            rows = _read_json(os.path.join(job_dir, "units", name + ".json"))
+            res = ShardResult(i, path, 0, rows[0]["fio"], rows[-1]["fio"],
+                              error=_last_error(job_dir, name) or "не собрана")
+        res.attempts = _attempts(job_dir, name)
+        results.append(res)
+    _write_zip(out, results, pack(PassConfig(**job["cfg"])))
+    return results
+
+
+def run_local(job_dir: str, workers: int, lease: float = LEASE) -> list[int]:
+    """Рабочие в отдельных процессах на этой машине; коды возврата"""
+    cmd = [sys.executable, os.path.abspath(__file__), "work", job_dir,
+           "--lease", str(lease)]
+    procs = [subprocess.Popen(cmd + ["--id", f"{socket.gethostname()}-{i}"])
+             for i in range(workers)]
+    return [p.wait() for p in procs]
+
+
+# ═══════════════════════════════════════════════════
+#  РАБОЧИЙ
+# ═══════════════════════════════════════════════════
+
+def work(
+    job_dir: str,
+    worker_id: str | None = None,
+    lease: float = LEASE,
+    poll: float | None = None,
+) -> int:
+    """
+    Собирает части, пока задание не закончено (все части готовы или
+    исчерпали попытки). Пока чужие части в работе — ждёт: их владелец
+    может погибнуть, и часть надо будет подобрать. Возвращает число
+    собранных этим рабочим частей.
+    """
+    from document_builder import DocumentBuilder
+
+    job = _job(job_dir)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    poll = poll if poll is not None else min(5.0, lease / 4)
+    cfg = PassConfig(**job["cfg"])
+    logo = _read(os.path.join(job_dir, LOGO)) if job["logo"] else None
+    built = 0
+
+    while True:
+        name = _claim_next(job_dir, job, worker_id, lease)
+        if name is None:
+            if status(job_dir, lease).finished:
+                return built
+            time.sleep(poll)
+            continue
+
+        beat = _Heartbeat(os.path.join(job_dir, "claims", name), lease / 4)
+        try:
+            rows = [
+                RosterRow(r["fio"], photo_path=os.path.join(job_dir, r["photo"]),
+                          series=r["series"], number=r["number"],
+                          date_start=r["date_start"], date_end=r["date_end"])
+                for r in _read_json(os.path.join(job_dir, "units", name + ".json"))
+            ]
+            path = os.path.join(job_dir, "done", name + ".docx")
+            tmp = f"{path}.{uuid.uuid4().hex[:8]}.part"
+            count = DocumentBuilder(cfg).build_rows(rows, logo, tmp)
+            _write_json(path + ".json", {"cards": count, "first": rows[0].fio,
+                                         "last": rows[-1].fio, "worker": worker_id})
+            os.replace(tmp, path)
+            built += 1
+            print(f"  ✅ {worker_id}: {name} — {count} пропусков")
+        except Exception as e:
+            attempt = _attempts(job_dir, name) + 1
+            _write(os.path.join(job_dir, "errors", f"{name}.{attempt}.txt"),
+                   f"{worker_id}: {e}".encode("utf-8"))
+            print(f"  ❌ {worker_id}: {name}, попытка {attempt}: {e}")
+        finally:
+            beat.stop()
+            _release(os.path.join(job_dir, "claims", name), beat.token)
+
+
+def _claim_next(job_dir, job, worker_id, lease) -> str | None:
+    """Первая свободная или брошенная часть, уже захваченная; None — нет таких"""
+    for i in range(1, job["units"] + 1):
+        name = _unit(i)
+        if os.path.exists(os.path.join(job_dir, "done", name + ".docx")):
+            continue
+        if _attempts(job_dir, name) >= job["max_attempts"]:
+            continue
+        claim = os.path.join(job_dir, "claims", name)
+        if _try_claim(claim, worker_id):
+            # Пока захватывали, часть могли доделать
+            if os.path.exists(os.path.join(job_dir, "done", name + ".docx")):
+                os.remove(claim)
+                continue
+            return name
+        stale = _steal_stale(claim, lease)
+        if stale is None:
+            continue
+        # Пропавший рабочий — тоже попытка: часть, роняющая процесс, не крутится вечно
+        attempt = _attempts(job_dir, name) + 1
+        _write(os.path.join(job_dir, "errors", f"{name}.{attempt}.txt"),
+               f"рабочий {stale} пропал, не доделав часть".encode("utf-8"))
+        if attempt < job["max_attempts"] and _try_claim(claim, worker_id):
+            print(f"  ♻️ {worker_id}: {name} брошена рабочим {stale} — подобрана")
+            return name
+    return None
+
+
+def _try_claim(claim: str, worker_id: str) -> bool:
+    try:
+        fd = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"worker": worker_id, "pid": os.getpid(), "since": time.time()}, f)
+    return True
+
+
+def _steal_stale(claim: str, lease: float) -> str | None:
+    """
+    Убирает захват старше lease. Переименование удаётся ровно одному
+    рабочему — он и получает имя прежнего владельца; остальные — None.
+    """
+    stale = f"{claim}.stale-{uuid.uuid4().hex[:8]}"
+    try:
+        if time.time() - os.stat(claim).st_mtime <= lease:
+            return None
+        os.rename(claim, stale)
+    except FileNotFoundError:
+        return None
+    try:
+        owner = _read_json(stale).get("worker", "?")
+    except (OSError, ValueError):
+        owner = "?"
+    os.remove(stale)
+    return owner
+
+
+def _release(claim: str, token):
+    """Снимает свой захват; чужой (часть подобрали после паузы) не трогает"""
+    try:
+        if os.stat(claim).st_ino == token:
+            os.remove(claim)
+    except FileNotFoundError:
+        pass
+
+
+class _Heartbeat:
+    """Обновляет mtime захвата, пока часть собирается"""
+
+    def __init__(self, claim: str, every: float):
+        self.claim = claim
+        self.token = os.stat(claim).st_ino
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(every,), daemon=True)
+        self._thread.start()
+
+    def _run(self, every):
+        while not self._stop.wait(every):
+            try:
+                if os.stat(self.claim).st_ino != self.token:
+                    return   # захват забрали — дособираем, но не продлеваем
+                os.utime(self.claim)
+            except FileNotFoundError:
+                return
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+# ── Приватные ──────────────────────────────────────
+
+def _unit(index: int) -> str:
+    return f"unit_{index:04d}"
+
+
+def _job(job_dir: str) -> dict:
+    try:
+        return _read_json(os.path.join(job_dir, JOB))
+    except FileNotFoundError:
+        raise FileNotFoundError(f"в {job_dir} нет задания ({JOB})") from None
+
+
+def _attempts(job_dir: str, name: str) -> int:
+    prefix = name + "."
+    return sum(1 for f in os.listdir(os.path.join(job_dir, "errors")) if f.startswith(prefix))
+
+
+def _last_error(job_dir: str, name: str) -> str:
+    attempts = _attempts(job_dir, name)
+    if not attempts:
+        return ""
+    return _read(os.path.join(job_dir, "errors", f"{name}.{attempts}.txt")).decode("utf-8")
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _read_json(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write(path: str, data: bytes):
+    """Атомарно: временный файл рядом и rename"""
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write_json(path: str, obj):
+    _write(path, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+
+# ═══════════════════════════════════════════════════
+#  CLI
+# ═══════════════════════════════════════════════════
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Распределённая сборка через общую папку")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("work", help="собирать части, пока задание не закончено")
+    w.add_argument("job_dir")
+    w.add_argument("--id", help="имя рабочего (по умолчанию хост-pid)")
+    w.add_argument("--lease", type=float, default=LEASE, metavar="С",
+                   help="через сколько секунд без отметки часть считается брошенной")
+    s = sub.add_parser("status", help="сколько частей готово")
+    s.add_argument("job_dir")
+    m = sub.add_parser("merge", help="ZIP из готовых частей")
+    m.add_argument("job_dir")
+    m.add_argument("out")
+    args = p.parse_args(argv)
+    try:
+        return _command(args)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return 2
+
+
+def _command(args) -> int:
+    if args.cmd == "work":
+        built = work(args.job_dir, args.id, args.lease)
+        print(f"🏁 Собрано частей: {built}")
+        return 0
+    if args.cmd == "status":
+        st = status(args.job_dir)
+        print(st.line())
+        return 0 if st.finished else 1
+    results = merge(args.job_dir, args.out)
+    failed = [r for r in results if r.error]
+    print(f"📦 {args.out}: частей {len(results) - len(failed)} из {len(results)}")
+    for r in failed:
+        print(f"   ❌ Часть {r.index} ({r.first} … {r.last}): {r.error}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,16 @@
 """Сборка Word-документа — точные размеры + отступы для резки"""
 
 import io
+import threading
+from collections import Counter, deque
+from itertools import islice
+from typing import BinaryIO, Iterable
+
 from PIL import Image
 from docx import Document
-from docx.shared import Cm, Mm
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Cm, Pt
+from docx.enum.section import WD_ORIENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_BREAK, WD_LINE_SPACING
 from docx.enum.table import WD_ROW_HEIGHT_RULE
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
@@ -12,15 +18,64 @@ from docx.oxml import OxmlElement
 from config import PassConfig
 from card_renderer import CardRenderer
 from photo_utils import PhotoUtils
+from memory_budget import BuildMeter, BuildReport, MediaSpill
+from roster import RosterRow, rows_from_photos
+from sheet_layout import Slot, pack
 
 
 class DocumentBuilder:
 
-    CHUNK = 8
+    WINDOW = 16   # карточек в работе в пуле при submit
 
-    def __init__(self, cfg: PassConfig):
+    def __init__(
+        self,
+        cfg: PassConfig,
+        memory_budget_mb: float | None = None,
+        report: bool = False,
+        submit=None,
+        renderer: CardRenderer | None = None,
+        detect_budget: float | None = None,
+        photo_store=None,
+        photo_groups: dict[int, RosterRow] | None = None,
+        shared_photos=None,
+    ):
+        """
+        memory_budget_mb — сколько МБ картинок держать в памяти документа,
+        остальное выгружается во временную папку до сохранения.
+        report — замерять память по этапам (tracemalloc, медленнее).
+        submit(fn, *args) → Future — рендер карточек в общем пуле
+        (FairScheduler.for_session); без него всё идёт в текущем потоке.
+        renderer — готовый рендерер из реестра (render_pool.renderer_for).
+        detect_budget — секунд на поиск лица в одном фото (по умолчанию
+        PhotoUtils.detect_budget); не уложилось — обрезка по центру.
+        photo_store — готовые фото (photo_store.PhotoStore): строки, которые
+        в нём есть, не декодируются и не обрезаются заново.
+        photo_groups — похожие фото из preflight (report.photo_groups):
+        фото группы обрабатывается один раз — всегда фото первой её строки.
+        shared_photos — обработанные фото, общие с другими сборками тех же
+        строк (variants.SharedPhotos).
+        Отчёт последней сборки — в last_report (с медленными фото).
+        """
         self.cfg = cfg
-        self.renderer = CardRenderer(cfg)
+        self.layout = pack(cfg)
+        self.renderer = renderer or CardRenderer(cfg)
+        self.submit = submit
+        self.detect_budget = detect_budget
+        self.photo_store = photo_store
+        self.photo_groups = photo_groups or {}
+        self.shared_photos = shared_photos
+        self._group_sizes = Counter(id(lead) for lead in self.photo_groups.values())
+        if shared_photos is not None:
+            # Строку обрабатывает одна из сборок вариантов — группы общие
+            self._shared, self._shared_lock = shared_photos.groups, shared_photos.groups_lock
+        else:
+            self._shared: dict[int, list] = {}   # id(первой) → [lock, фото, осталось строк]
+            self._shared_lock = threading.Lock()
+        self.memory_budget_mb = memory_budget_mb
+        self.report = report
+        self.last_report: BuildReport | None = None
+        self._meter = BuildMeter()
+        self._spill = MediaSpill()
 
     def build(
         self,
@@ -28,79 +83,299 @@ class DocumentBuilder:
         logo_bytes: bytes | None = None,
         progress_cb=None,
     ) -> bytes:
+        buf = io.BytesIO()
+        self.build_rows(
+            rows_from_photos(photos), logo_bytes, buf, progress_cb, total=len(photos)
+        )
+        return buf.getvalue()
+
+    def build_rows(
+        self,
+        rows: Iterable[RosterRow],
+        logo_bytes: bytes | None = None,
+        out: str | BinaryIO | None = None,
+        progress_cb=None,
+        total: int | None = None,
+    ) -> int:
+        """
+        Потоковая сборка: строки берутся по одному листу (layout.capacity),
+        фото читается и обрабатывается только перед рендером своей карточки,
+        готовые изображения сразу уходят в документ.
+        out — путь или поток для .docx; возвращает число пропусков.
+        progress_cb вызывается, только если известен total.
+        """
         logo_pil = None
         if logo_bytes:
             logo_pil = Image.open(io.BytesIO(logo_bytes)).convert("RGBA")
 
+        self._meter = meter = BuildMeter(self.report)
+        self._spill = MediaSpill(self.memory_budget_mb)
+        try:
+            done = self._build_doc(rows, logo_pil, out, progress_cb, total)
+        finally:
+            self.last_report = meter.finish(self._spill)
+            self._spill.cleanup()
+        return done
+
+    def _build_doc(self, rows, logo_pil, out, progress_cb, total) -> int:
         doc = self._new_doc()
-        names = list(photos.keys())
-        chunks = [names[i:i + self.CHUNK] for i in range(0, len(names), self.CHUNK)]
-        total = len(names)
+        cards = self._cards(rows, logo_pil)
         done = 0
 
-        for ci, chunk in enumerate(chunks):
-            if ci > 0:
-                doc.add_page_break()
-            tf = self._table(doc)
-
-            for i, fio in enumerate(chunk):
-                photo_pil = PhotoUtils.process_upload(photos[fio], fio)
-                card = self.renderer.front(photo_pil, logo_pil)
-                self._insert(tf, i // 2, i % 2, card)
-                done += 1
-                if progress_cb:
-                    progress_cb(done / (total * 2))
-
-            doc.add_page_break()
-            tb = self._table(doc)
-
-            for i, fio in enumerate(chunk):
-                card = self.renderer.back(fio)
-                self._insert(tb, i // 2, 1 - (i % 2), card)
-                done += 1
-                if progress_cb:
-                    progress_cb(done / (total * 2))
-
-        buf = io.BytesIO()
-        doc.save(buf)
-        return buf.getvalue()
+        def step():
+            nonlocal done
+            done += 1
+            if progress_cb and total:
+                progress_cb(min(done / (total * 2), 1.0))
+
+        front_slots = self.layout.slots()
+        back_slots = self.layout.slots(back=True)
+        sheets = 0
+        while chunk := list(islice(cards, self.chunk)):
+            if sheets > 0:
+                self._page_break(doc)
+            tables = self._tables(doc)
+
+            for slot, (row, card, _) in zip(front_slots, chunk):
+                with self._meter.stage("insert"):
+                    self._insert(tables[slot.band], slot, card)
+                step()
+
+            self._page_break(doc)
+            tables = self._tables(doc)
+
+            for slot, (row, _, back) in zip(back_slots, chunk):
+                card = self._back(row) if back is None else back
+                with self._meter.stage("insert"):
+                    self._insert(tables[slot.band], slot, card, back=True)
+                step()
+
+            sheets += 1
+
+        self._meter.report.sheets = sheets
+        self._meter.report.layout = self.layout.describe()
+        if out is not None:
+            with self._meter.stage("save"):
+                doc.save(out)
+        return done // 2
+
+    def cards(self, rows: Iterable[RosterRow], logo_bytes: bytes | None = None):
+        """
+        (строка, лицевая, оборотная) по мере рендера — тот же путь, что у
+        документа, но без вёрстки листов. Строки без фото пропускаются.
+        """
+        logo_pil = None
+        if logo_bytes:
+            logo_pil = Image.open(io.BytesIO(logo_bytes)).convert("RGBA")
+        for row, front, back in self._cards(rows, logo_pil):
+            yield row, front, self._back(row) if back is None else back
 
     # ── Приватные ──────────────────────────────────
 
+    def _back(self, row):
+        with self._meter.stage("render"):
+            return self.renderer.back(row.fio, row.date_start)
+
+    def _cards(self, rows, logo_pil):
+        """
+        (строка, лицевая, оборотная) по мере чтения строк; строки без фото
+        пропускаются. Оборотная None — рендерится, когда до неё дойдёт
+        лист (_back), в памяти не копятся.
+        """
+        if self.submit is not None:
+            yield from self._cards_pooled(rows, logo_pil)
+            return
+        for row in rows:
+            try:
+                with self._meter.stage("photos"):
+                    photo_pil = self._photo(row)
+            except Exception as e:
+                print(f"  ⚠️ Пропуск «{row.fio}»: нет фото ({e})")
+                continue
+            with self._meter.stage("render"):
+                card = self.renderer.front(
+                    photo_pil, logo_pil, row.series, row.number, row.date_end
+                )
+            yield row, card, None
+
+    def _cards_pooled(self, rows, logo_pil):
+        """
+        То же через submit: до WINDOW карточек рендерятся в пуле, порядок
+        строк сохраняется. Оборотная сторона готовится той же задачей.
+        Сборка прервана (генератор закрыт) — невыполненные задачи окна
+        снимаются, чтобы не занимать общий пул.
+        """
+        it = iter(rows)
+        window = deque()
+
+        def fill():
+            while len(window) < self.WINDOW:
+                row = next(it, None)
+                if row is None:
+                    return
+                window.append((row, self.submit(self._render_row, row, logo_pil)))
+
+        try:
+            fill()
+            while window:
+                row, fut = window.popleft()
+                try:
+                    with self._meter.stage("render"):
+                        front, back = fut.result()
+                except Exception as e:
+                    print(f"  ⚠️ Пропуск «{row.fio}»: нет фото ({e})")
+                    fill()
+                    continue
+                fill()
+                yield row, front, back
+        finally:
+            for _, fut in window:
+                fut.cancel()
+
+    def _render_row(self, row, logo_pil):
+        photo_pil = self._photo(row)
+        front = self.renderer.front(
+            photo_pil, logo_pil, row.series, row.number, row.date_end
+        )
+        return front, self.renderer.back(row.fio, row.date_start)
+
+    def _photo(self, row):
+        if self.shared_photos is not None:
+            return self.shared_photos.get(row, self._stored_or_own)
+        return self._stored_or_own(row)
+
+    def _stored_or_own(self, row):
+        if self.photo_store is not None:
+            photo_pil = self.photo_store.photo_for(row)
+            if photo_pil is not None:
+                self._leave_group(row)
+                return photo_pil
+        return self._own_photo(row)
+
+    def _own_photo(self, row):
+        leader = self.photo_groups.get(id(row))
+        if leader is None:
+            return self._process(row)
+        try:
+            return self._shared_photo(leader)
+        except Exception:
+            # Фото первой строки не читается — у этой строки своё
+            return self._process(row)
+        finally:
+            self._leave_group(row)
+
+    def _shared_photo(self, leader):
+        """
+        Фото группы похожих — всегда из фото первой строки группы: какая
+        строка дошла первой (в пуле это дело случая), на карточку не влияет
+        """
+        with self._shared_lock:
+            slot = self._shared.setdefault(
+                id(leader), [threading.Lock(), None, self._group_sizes[id(leader)]])
+        with slot[0]:
+            if slot[1] is None:
+                slot[1] = self._process(leader)
+            return slot[1]
+
+    def _leave_group(self, row):
+        """Строка группы своё фото получила; последняя отпускает общее"""
+        leader = self.photo_groups.get(id(row))
+        if leader is None:
+            return
+        with self._shared_lock:
+            slot = self._shared.setdefault(id(leader), [threading.Lock(), None,
+                                                        self._group_sizes[id(leader)]])
+            slot[2] -= 1
+            if slot[2] <= 0:
+                self._shared.pop(id(leader), None)
+
+    def _process(self, row):
+        photo_pil, timing = PhotoUtils.process_timed(
+            row.read_photo(), row.fio, self.detect_budget
+        )
+        self._meter.photo(timing)
+        return photo_pil
+
+    @property
+    def chunk(self) -> int:
+        """Карточек на листе — из раскладки, а не константа"""
+        return self.layout.capacity
+
     def _new_doc(self):
+        lay = self.layout
         doc = Document()
         s = doc.sections[0]
-        for attr in ("left_margin", "right_margin", "top_margin", "bottom_margin"):
-            setattr(s, attr, Mm(10))
-        s.page_width, s.page_height = Mm(210), Mm(297)
+        if lay.landscape:
+            s.orientation = WD_ORIENT.LANDSCAPE
+        s.page_width, s.page_height = Cm(lay.page_w), Cm(lay.page_h)
+        # ══ Блоки по центру листа: верхнее поле = отступ раскладки ══
+        s.top_margin = Cm(lay.top)
+        for attr in ("left_margin", "right_margin", "bottom_margin"):
+            setattr(s, attr, Cm(lay.margin))
         return doc
 
-    def _table(self, doc):
-        t = doc.add_table(rows=4, cols=2)
+    def _tables(self, doc) -> list:
+        """Таблица на каждый блок раскладки, между ними абзац 1 pt"""
+        tables = []
+        for i, band in enumerate(self.layout.bands):
+            if i > 0:
+                self._spacer(doc)
+            tables.append(self._table(doc, band))
+        return tables
+
+    def _table(self, doc, band):
+        t = doc.add_table(rows=band.rows, cols=band.cols)
         t.autofit = False
         t.allow_autofit = False
         t.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
         # ══ Ширина колонки = карточка + отступ для резки ══
-        margin = self.cfg.cut_margin
-        col_w = Cm(self.cfg.card_w + margin * 2)
+        col_w = Cm(band.cell_w)
         for c in t.columns:
             c.width = col_w
 
         # ══ Небольшие отступы ячеек для зазора между карточками ══
-        self._set_cell_margins(t, margin)
+        self._set_cell_margins(t, self.cfg.cut_margin)
         self._remove_table_borders(t)
 
+        # ══ Высота строки = карточка + отступы сверху/снизу ══
+        for r in t.rows:
+            r.height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
+            r.height = Cm(band.cell_h)
+
         return t
 
-    def _insert(self, table, row, col, card_img: Image.Image):
-        buf = io.BytesIO()
-        card_img.save(buf, format="PNG")
-        buf.seek(0)
+    def _page_break(self, doc):
+        self._spacer(doc).add_run().add_break(WD_BREAK.PAGE)
 
-        margin = self.cfg.cut_margin
-        cell = table.rows[row].cells[col]
-        cell.width = Cm(self.cfg.card_w + margin * 2)
+    @staticmethod
+    def _spacer(doc):
+        """Абзац высотой 1 pt — ровно столько заложено в раскладке"""
+        p = doc.add_paragraph()
+        pf = p.paragraph_format
+        pf.space_before = Pt(0)
+        pf.space_after = Pt(0)
+        pf.line_spacing_rule = WD_LINE_SPACING.EXACTLY
+        pf.line_spacing = Pt(1)
+        return p
+
+    def _insert(self, table, slot: Slot, card_img: Image.Image | bytes,
+                back: bool = False):
+        """card_img — изображение или уже готовый PNG (вставляется как есть)"""
+        if slot.rotated:
+            card_img = self._rotate(card_img, back)
+        if isinstance(card_img, bytes):
+            buf = io.BytesIO(card_img)
+        else:
+            buf = io.BytesIO()
+            card_img.save(buf, format="PNG")
+            buf.seek(0)
+
+        w, h = self.cfg.card_w, self.cfg.card_h
+        if slot.rotated:
+            w, h = h, w
+        cell = table.rows[slot.row].cells[slot.col]
+        cell.width = Cm(w + self.cfg.cut_margin * 2)
 
         p = cell.paragraphs[0]
         p.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -111,15 +386,21 @@ class DocumentBuilder:
         pf.space_after = Cm(0)
 
         # ══ Картинка = ТОЧНО размер карточки ══
-        p.add_run().add_picture(
-            buf,
-            width=Cm(self.cfg.card_w),
-            height=Cm(self.cfg.card_h),
-        )
+        shape = p.add_run().add_picture(buf, width=Cm(w), height=Cm(h))
+        rId = shape._inline.graphic.graphicData.pic.blipFill.blip.embed
+        self._spill.track(p.part.related_parts[rId])
 
-        # ══ Высота строки = карточка + отступы сверху/снизу ══
-        table.rows[row].height_rule = WD_ROW_HEIGHT_RULE.EXACTLY
-        table.rows[row].height = Cm(self.cfg.card_h + margin * 2)
+    @staticmethod
+    def _rotate(card_img, back: bool = False) -> Image.Image:
+        """
+        Лицевая — верхом вправо, оборотная — верхом влево: после переворота
+        листа по вертикальной оси оборот совпадает с лицевой
+        """
+        if isinstance(card_img, bytes):
+            card_img = Image.open(io.BytesIO(card_img))
+        return card_img.transpose(
+            Image.Transpose.ROTATE_90 if back else Image.Transpose.ROTATE_270
+        )
 
     # ── XML-утилиты ────────────────────────────────
 
@@ -1,10 +1,10 @@
 """Утилиты рисования — ИСПРАВЛЕНЫ"""
 
 import os
+from functools import lru_cache
 from typing import Tuple, Dict
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 from config import PassConfig
-from photo_utils import PhotoUtils
 
 
 class DrawingUtils:
@@ -13,7 +13,17 @@ class DrawingUtils:
 
     @staticmethod
     def get_fonts(cfg: PassConfig) -> Dict[str, ImageFont.FreeTypeFont]:
-        """Загрузка шрифтов — несколько уровней fallback"""
+        """Загрузка шрифтов — несколько уровней fallback.
+
+        Результат поиска и сами шрифты кэшируются на процесс: повторный
+        вызов (новая сессия, новый CardRenderer) не трогает диск.
+        """
+        return dict(DrawingUtils._fonts_for_dir(cfg.font_dir))
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _fonts_for_dir(font_dir: str) -> Dict[str, ImageFont.FreeTypeFont]:
+        cfg = PassConfig(font_dir=font_dir)
         bold = DrawingUtils._find_font(cfg, [
             "DejaVuSans-Bold.ttf", "arialbd.ttf", "LiberationSans-Bold.ttf"
         ])
@@ -51,8 +61,9 @@ class DrawingUtils:
         return candidates[0]
 
     @staticmethod
+    @lru_cache(maxsize=256)
     def _load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
-        """Загружает шрифт с fallback"""
+        """Загружает шрифт с fallback (кэш по пути и размеру)"""
         try:
             return ImageFont.truetype(path, size)
         except Exception:
@@ -65,7 +76,9 @@ class DrawingUtils:
     # ── Градиент ───────────────────────────────────
 
     @staticmethod
+    @lru_cache(maxsize=16)
     def create_gradient(w: int, h: int, c1: str, c2: str) -> Image.Image:
+        """Вертикальный градиент. Кэшируется — результат только для чтения"""
         img = Image.new("RGB", (w, h))
         draw = ImageDraw.Draw(img)
         r1, g1, b1 = DrawingUtils.hex2rgb(c1)
@@ -116,20 +129,46 @@ class DrawingUtils:
     # ── Фото с рамкой ─────────────────────────────
 
     @staticmethod
-    def add_photo(img, photo_pil, x, y, size, border_color="#FFFFFF", border_w=8) -> int:
-        """Вставляет фото, возвращает ПРАВУЮ границу"""
+    def add_photo(img, photo_pil, x, y, size, border_color="#FFFFFF", border_w=8,
+                  fused=True) -> int:
+        """
+        Вставляет фото, возвращает ПРАВУЮ границу.
+
+        fused=True — рамка, белое поле и фото рисуются прямо в img, без
+        промежуточных холстов; тень берётся из кэша по размеру; фото,
+        уже вписанное в size (PhotoStore), не масштабируется. Пиксели те
+        же, что у fused=False — прежнего пути через framed_photo.
+        """
+        if not fused:
+            return DrawingUtils._add_photo_layers(
+                img, photo_pil, x, y, size, border_color, border_w
+            )
         try:
             tw, th = size
+            bw = border_w
+            shadow = DrawingUtils._photo_shadow(tw + bw * 2, th + bw * 2)
+            img.paste(shadow, (x - 4, y + 4), shadow)
+
+            # Рамка, поверх неё белое поле под фото
+            img.paste(border_color, (x, y, x + tw + bw * 2, y + th + bw * 2))
+            img.paste("white", (x + bw, y + bw, x + bw + tw, y + bw + th))
+
             ratio = min(tw / photo_pil.width, th / photo_pil.height)
             nw, nh = int(photo_pil.width * ratio), int(photo_pil.height * ratio)
-            resized = photo_pil.resize((nw, nh), Image.Resampling.LANCZOS)
+            if (nw, nh) != photo_pil.size:
+                photo_pil = photo_pil.resize((nw, nh), Image.Resampling.LANCZOS)
+            img.paste(photo_pil, (x + bw + (tw - nw) // 2, y + bw + (th - nh) // 2))
 
-            canvas = Image.new("RGB", size, "white")
-            canvas.paste(resized, ((tw - nw) // 2, (th - nh) // 2))
+            return x + tw + bw * 2
+        except Exception as e:
+            print(f"  ⚠️ Ошибка фото: {e}")
+            return x
 
-            bw = border_w
-            bordered = Image.new("RGB", (tw + bw * 2, th + bw * 2), border_color)
-            bordered.paste(canvas, (bw, bw))
+    @staticmethod
+    def _add_photo_layers(img, photo_pil, x, y, size, border_color, border_w) -> int:
+        """Прежний путь: холст с фото → холст с рамкой → тень → вставка"""
+        try:
+            bordered = DrawingUtils.framed_photo(photo_pil, size, border_color, border_w)
 
             # Тень
             shadow = Image.new("RGBA", bordered.size, (0, 0, 0, 0))
@@ -145,6 +184,30 @@ class DrawingUtils:
             print(f"  ⚠️ Ошибка фото: {e}")
             return x
 
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def _photo_shadow(w: int, h: int) -> Image.Image:
+        """Размытая тень под фото — одна на размер (только для чтения)"""
+        shadow = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+        ImageDraw.Draw(shadow).rectangle([0, 0, w, h], fill=(0, 0, 0, 30))
+        return shadow.filter(ImageFilter.GaussianBlur(8))
+
+    @staticmethod
+    def framed_photo(photo_pil, size, border_color="#FFFFFF", border_w=8) -> Image.Image:
+        """Фото, вписанное в size на белом фоне, с рамкой border_w"""
+        tw, th = size
+        ratio = min(tw / photo_pil.width, th / photo_pil.height)
+        nw, nh = int(photo_pil.width * ratio), int(photo_pil.height * ratio)
+        resized = photo_pil.resize((nw, nh), Image.Resampling.LANCZOS)
+
+        canvas = Image.new("RGB", size, "white")
+        canvas.paste(resized, ((tw - nw) // 2, (th - nh) // 2))
+
+        bw = border_w
+        bordered = Image.new("RGB", (tw + bw * 2, th + bw * 2), border_color)
+        bordered.paste(canvas, (bw, bw))
+        return bordered
+
     # ── Перенос текста ─────────────────────────────
 
     @staticmethod
@@ -0,0 +1,129 @@
+"""
+Атлас глифов — переменный текст карточки (ФИО на обороте) без FreeType.
+
+Каждый символ растрируется FreeType один раз на шрифт и размер: маска,
+смещение от начала строки и ширина (advance); кернинг пары букв —
+тоже один раз. Дальше строка меряется сложением ширин, а рисуется
+сборкой маски из готовых глифов — стоимость не зависит от того, сколько
+разных фамилий в реестре.
+
+Результат попиксельно совпадает с ImageDraw.text базовой раскладки PIL
+(без libraqm): глифы ставятся на целые позиции пера, перекрытия
+сводятся так же, как в самом PIL, а цвет накладывается один раз
+через ImageDraw.bitmap. С libraqm (лигатуры, сложная раскладка) или
+для встроенного шрифта atlas_for отдаёт None — рисует FreeType.
+
+    atlas = atlas_for(font)
+    w = atlas.width("Иванов")
+    atlas.draw(draw, (x, y), "Иванов", fill)
+"""
+
+import threading
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+class GlyphAtlas:
+
+    def __init__(self, font: ImageFont.FreeTypeFont):
+        self.font = font
+        self._glyphs: dict[str, tuple] = {}      # символ → (маска, dx, dy, ширина)
+        self._kerning: dict[str, float] = {}     # пара → поправка
+        self._lock = threading.Lock()
+
+    # ── Измерение ──────────────────────────────────
+
+    def width(self, text: str) -> float:
+        """Как font.getlength(text)"""
+        pen = 0.0
+        for i, ch in enumerate(text):
+            pen += self._glyph(ch)[3]
+            if i + 1 < len(text):
+                pen += self._pair(ch, text[i + 1])
+        return pen
+
+    def bbox(self, text: str) -> tuple[int, int, int, int]:
+        """Как draw.textbbox((0, 0), text, font) для однострочного текста"""
+        return self._layout(text)[0]
+
+    # ── Рисование ─────────────────────────────────
+
+    def mask(self, text: str) -> tuple[Image.Image, int, int]:
+        """Маска строки и её смещение от (x, y) рисования"""
+        import numpy as np
+
+        (x0, y0, x1, y1), placed = self._layout(text)
+        out = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=np.uint32)
+        for x, y, glyph in placed:
+            region = out[y - y0:y - y0 + glyph.shape[0], x - x0:x - x0 + glyph.shape[1]]
+            # Перекрытие соседних глифов — «поверх», как в font_render PIL:
+            # a + b·(255 − a)/255 с округлением MULDIV255
+            t = glyph * (255 - region) + 128
+            region += ((t >> 8) + t) >> 8
+        return Image.fromarray(out.astype(np.uint8), "L"), x0, y0
+
+    def draw(self, draw, xy, text: str, fill):
+        """Как draw.text(xy, text, font, fill) для целых xy"""
+        if not text:
+            return
+        mask, dx, dy = self.mask(text)
+        if mask.width and mask.height:
+            draw.bitmap((xy[0] + dx, xy[1] + dy), mask, fill=fill)
+
+    # ── Приватные ──────────────────────────────────
+
+    def _glyph(self, ch: str):
+        glyph = self._glyphs.get(ch)
+        if glyph is None:
+            import numpy as np
+
+            with self._lock:
+                glyph = self._glyphs.get(ch)
+                if glyph is None:
+                    dx, dy, x1, y1 = self.font.getbbox(ch)
+                    mask = Image.new("L", (max(x1 - dx, 0), max(y1 - dy, 0)))
+                    ImageDraw.Draw(mask).text((-dx, -dy), ch, font=self.font, fill=255)
+                    arr = np.asarray(mask, dtype=np.uint32)
+                    glyph = self._glyphs[ch] = (arr, dx, dy, self.font.getlength(ch))
+        return glyph
+
+    def _pair(self, a: str, b: str) -> float:
+        pair = a + b
+        kern = self._kerning.get(pair)
+        if kern is None:
+            kern = self.font.getlength(pair) - self._glyph(a)[3] - self._glyph(b)[3]
+            self._kerning[pair] = kern
+        return kern
+
+    def _layout(self, text: str):
+        """Рамка строки и глифы на своих местах: [(x, y, маска)]"""
+        placed, pen = [], 0.0
+        for i, ch in enumerate(text):
+            arr, dx, dy, advance = self._glyph(ch)
+            if arr.size:
+                placed.append((int(round(pen)) + dx, dy, arr))
+            pen += advance
+            if i + 1 < len(text):
+                pen += self._pair(ch, text[i + 1])
+        if not placed:
+            return (0, 0, int(pen), 0), placed
+        # По горизонтали — не уже пера: пробелы по краям тоже занимают место
+        box = (min(0, min(x for x, _, _ in placed)),
+               min(y for _, y, _ in placed),
+               max(int(pen), max(x + a.shape[1] for x, _, a in placed)),
+               max(y + a.shape[0] for _, y, a in placed))
+        return box, placed
+
+
+@lru_cache(maxsize=64)
+def _atlas(path: str, size: int, index: int) -> GlyphAtlas:
+    return GlyphAtlas(ImageFont.truetype(path, size, index=index))
+
+
+def atlas_for(font) -> GlyphAtlas | None:
+    """Атлас для шрифта (общий на путь и размер) или None, если не подходит"""
+    path = getattr(font, "path", None)
+    if not path or getattr(font, "layout_engine", None) != ImageFont.Layout.BASIC:
+        return None
+    return _atlas(path, font.size, font.index)
@@ -0,0 +1,223 @@
+"""
+Нагрузочная проверка app.py — N сессий Streamlit одновременно, без
+браузера и сети (streamlit.testing AppTest, все сессии в одном процессе,
+как на сервере: общие st.cache_resource, пул рендера и кэш документов).
+
+    python load_test.py                     # 4 сессии, 2 круга
+    python load_test.py -n 8 --rounds 3 --csv load.csv
+
+Каждая сессия: открыть страницу → загрузить фото из image/ (превью) →
+поменять настройку в сайдбаре (новое превью) → собрать .docx. Замеряются
+задержка каждого rerun, время сборки и память процесса (RSS раз в 0.2 с).
+У каждой сессии свой заголовок пропуска — документы не берутся из кэша
+друг друга (--shared-settings — у всех одинаковые настройки).
+"""
+
+import argparse
+import csv
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+
+from memory_budget import peak_rss_mb
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+STEPS = ("open", "upload", "settings", "build")
+
+
+@dataclass
+class Sample:
+    session: int
+    round: int
+    step: str
+    seconds: float
+    error: str = ""
+
+
+@dataclass
+class LoadReport:
+    sessions: int
+    rounds: int
+    samples: list[Sample] = field(default_factory=list)
+    rss_mb: list[float] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def lines(self) -> list[str]:
+        out = [f"Сессий: {self.sessions}, кругов: {self.rounds}, "
+               f"всего {self.seconds:.1f} с"]
+        out.append(f"{'этап':<10}{'n':>5}{'p50, с':>9}{'p95, с':>9}{'макс, с':>9}{'ошибок':>8}")
+        for step in STEPS:
+            got = [s for s in self.samples if s.step == step]
+            if not got:
+                continue
+            ok = sorted(s.seconds for s in got if not s.error)
+            errors = len(got) - len(ok)
+            if ok:
+                out.append(f"{step:<10}{len(got):>5}{_pct(ok, 0.5):>9.2f}"
+                           f"{_pct(ok, 0.95):>9.2f}{ok[-1]:>9.2f}{errors:>8}")
+            else:
+                out.append(f"{step:<10}{len(got):>5}{'—':>9}{'—':>9}{'—':>9}{errors:>8}")
+        if self.rss_mb:
+            out.append(f"RSS: старт {self.rss_mb[0]:.0f} МБ, "
+                       f"макс. {max(self.rss_mb):.0f} МБ, в конце {self.rss_mb[-1]:.0f} МБ "
+                       f"(пик процесса {peak_rss_mb():.0f} МБ)")
+        for s in self.samples:
+            if s.error:
+                out.append(f"❌ сессия {s.session}, круг {s.round}, {s.step}: {s.error}")
+        return out
+
+    def to_csv(self, path: str):
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(["сессия", "круг", "этап", "секунд", "ошибка"])
+            for s in self.samples:
+                w.writerow([s.session, s.round, s.step, f"{s.seconds:.3f}", s.error])
+
+
+def _pct(ordered: list[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def current_rss_mb() -> float:
+    """Текущий RSS (Linux); на других платформах — пиковый"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+# ═══════════════════════════════════════════════════
+#  СЕССИЯ
+# ═══════════════════════════════════════════════════
+
+def load_photos(folder: str) -> list[tuple[str, bytes]]:
+    from config import PassConfig
+    skip = PassConfig().default_logo
+    out = []
+    for name in sorted(os.listdir(folder)):
+        if name == skip or os.path.splitext(name)[1].lower() not in (".png", ".jpg", ".jpeg"):
+            continue
+        with open(os.path.join(folder, name), "rb") as f:
+            out.append((name, f.read()))
+    return out
+
+
+def run_session(index: int, photos, rounds: int, shared: bool,
+                samples: list[Sample], timeout: float):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+
+    def step(rnd, name, action=None):
+        t = time.perf_counter()
+        error = ""
+        try:
+            if action:
+                action()
+            at.run()
+            if at.exception:
+                error = at.exception[0].message.splitlines()[0][:200]
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"[:200]
+        samples.append(Sample(index, rnd, name, time.perf_counter() - t, error))
+        return not error
+
+    def upload():
+        fu = at.file_uploader(key="photos")
+        for name, data in photos:
+            fu.upload(name, data, "image/png")
+
+    for rnd in range(rounds):
+        if rnd == 0:
+            if not step(rnd, "open") or not step(rnd, "upload", upload):
+                return
+        header = "РАБОТНИК ОХРАНЫ" if shared else f"РАБОТНИК ОХРАНЫ {index}"
+        header += f" {rnd}" if rnd % 2 else ""
+        step(rnd, "settings", lambda: _header_input(at).set_value(header))
+        step(rnd, "build", lambda: _build_button(at).click())
+
+
+def _header_input(at):
+    for w in at.sidebar.text_input:
+        if w.label == "Заголовок пропуска":
+            return w
+    raise LookupError("нет поля «Заголовок пропуска»")
+
+
+def _build_button(at):
+    for b in at.button:
+        if ".docx" in b.label:
+            return b
+    raise LookupError("нет кнопки сборки .docx")
+
+
+def run_load(
+    sessions: int = 4,
+    rounds: int = 2,
+    photo_dir: str = "image",
+    shared: bool = False,
+    stagger: float = 0.5,
+    timeout: float = 600,
+) -> LoadReport:
+    photos = load_photos(photo_dir)
+    report = LoadReport(sessions, rounds)
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.is_set():
+            report.rss_mb.append(current_rss_mb())
+            stop.wait(0.2)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+
+    threads = []
+    for i in range(sessions):
+        t = threading.Thread(
+            target=run_session, name=f"load-session-{i}",
+            args=(i, photos, rounds, shared, report.samples, timeout),
+        )
+        t.start()
+        threads.append(t)
+        time.sleep(stagger)
+    for t in threads:
+        t.join()
+
+    report.seconds = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+    report.rss_mb.append(current_rss_mb())
+    return report
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Нагрузочная проверка app.py")
+    p.add_argument("-n", "--sessions", type=int, default=4)
+    p.add_argument("--rounds", type=int, default=2, help="кругов «настройка → сборка»")
+    p.add_argument("--images", default="image", help="папка с фото для загрузки")
+    p.add_argument("--shared-settings", action="store_true",
+                   help="одинаковые настройки у всех сессий (сборки берутся из кэша)")
+    p.add_argument("--stagger", type=float, default=0.5, metavar="С",
+                   help="пауза между стартами сессий")
+    p.add_argument("--csv", metavar="ФАЙЛ", help="все замеры в CSV")
+    args = p.parse_args(argv)
+
+    print(f"🚦 {args.sessions} сессий × {args.rounds} круга, фото из {args.images}")
+    report = run_load(args.sessions, args.rounds, args.images,
+                      args.shared_settings, args.stagger)
+    for line in report.lines():
+        print(f"  {line}")
+    if args.csv:
+        report.to_csv(args.csv)
+    return 1 if any(s.error for s in report.samples) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,244 @@
 """
 Генератор пропусков для работников охраны — точка входа
+
+    python main.py                          # фото из image/, имя файла = ФИО
+    python main.py --roster staff.csv       # реестр CSV/XLSX с сериями и датами
+    python main.py --zip photos.zip         # фото одним ZIP-архивом
+    python main.py --preflight fail         # остановиться, если фото/ФИО с ошибками
+    python main.py --watch                  # пересобирать при изменениях в image/
+    python main.py --export-zip cards.zip   # картинки сторон для карточного принтера
 """
 
+import argparse
 import os
-from config import Config
+from card_export import FORMATS, export_zip
+from config import PassConfig
 from document_builder import DocumentBuilder
+from photo_archive import iter_zip_photos, open_photo_zip, rows_from_zip
+from photo_utils import PhotoUtils
+from preflight import POLICIES, PreflightError, photo_frame_px, scan
+from roster import iter_roster, match_photos, rows_from_folder
+from sharding import build_shards
+from sheet_layout import PAPER_MM, pack
+from watcher import watch
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Генератор пропусков")
+    p.add_argument("--images", default="image",
+                   help="папка с фото сотрудников (имя файла = ФИО)")
+    p.add_argument("--zip", help="ZIP-архив с фото (имя файла = ФИО)")
+    p.add_argument("--roster",
+                   help="реестр CSV/XLSX: ФИО, серия, номер, даты, фото")
+    p.add_argument("--logo", help="логотип (по умолчанию assets/ или папка фото)")
+    p.add_argument("-o", "--output", default="propuska.docx",
+                   help="итоговый документ")
+    p.add_argument("--memory-budget", type=float, metavar="МБ",
+                   help="держать в памяти не больше МБ картинок, остальное — на диск")
+    p.add_argument("--report", action="store_true",
+                   help="отчёт о памяти по этапам (tracemalloc)")
+    p.add_argument("--shard-pages", type=int, metavar="N",
+                   help="разбить на документы по N страниц, результат — ZIP")
+    p.add_argument("--workers", type=int, help="процессов для сборки частей")
+    p.add_argument("--job", metavar="ПАПКА",
+                   help="задание для сборки на нескольких машинах: части по "
+                        "--shard-pages страниц (по умолчанию 10) в общей папке, "
+                        "рабочие — python distributed.py work ПАПКА; с --workers "
+                        "рабочие запускаются здесь и части сводятся в ZIP")
+    p.add_argument("--watch", action="store_true",
+                   help="следить за папкой фото и пересобирать только изменённые "
+                        "карточки (PNG карточек — в <документ>_cards/)")
+    p.add_argument("--interval", type=float, default=2.0, metavar="С",
+                   help="период опроса папки в режиме --watch")
+    p.add_argument("--quiet", type=float, default=3.0, metavar="С",
+                   help="сколько секунд папка должна не меняться перед сборкой")
+    p.add_argument("--preflight", choices=("off",) + POLICIES, default="report",
+                   help="проверка фото и ФИО до сборки: report — только отчёт, "
+                        "skip — пропустить строки с ошибками, fail — остановиться")
+    p.add_argument("--preflight-csv", metavar="ФАЙЛ",
+                   help="сохранить полный отчёт проверки в CSV")
+    p.add_argument("--paper", choices=tuple(PAPER_MM), default="A4",
+                   help="формат листа; сколько карточек на листе — считается")
+    p.add_argument("--page-margin", type=float, default=5.0, metavar="ММ",
+                   help="поле до края листа")
+    p.add_argument("--detect-budget", type=float, metavar="С",
+                   help="секунд на поиск лица в одном фото, дальше — обрезка по "
+                        "центру (по умолчанию PASS_DETECT_BUDGET или 5, 0 — без ограничения)")
+    p.add_argument("--export-zip", metavar="ФАЙЛ",
+                   help="вместо документа — ZIP с PNG лицевой и оборотной "
+                        "стороны каждого пропуска (для карточного принтера)")
+    p.add_argument("--export-dpi", type=int, metavar="DPI",
+                   help="разрешение картинок для --export-zip (по умолчанию как в настройках)")
+    p.add_argument("--export-format", choices=tuple(FORMATS), default="png",
+                   help="формат картинок для --export-zip")
+    p.add_argument("--variants", metavar="JSON",
+                   help="несколько вариантов пропуска за одну сборку: список "
+                        "настроек поверх базовых, документ на вариант, фото "
+                        "обрабатываются один раз")
+    p.add_argument("--photo-store", metavar="ПАПКА",
+                   help="хранилище готовых фото: обрезаются только новые и "
+                        "изменённые, остальные берутся из файла без декодирования")
+    return p.parse_args(argv)
+
+
+def find_logo(cfg: PassConfig, args) -> str | None:
+    for path in (args.logo, cfg.default_logo_path(),
+                 os.path.join(args.images, cfg.default_logo)):
+        if path and os.path.exists(path):
+            return path
+    return None
 
 
-def main():
+def main(argv=None):
     print("🎨 Генератор профессиональных пропусков")
     print("=" * 50)
 
-    cfg = Config()
+    args = parse_args(argv)
+    cfg = PassConfig(paper=args.paper, page_margin=args.page_margin / 10)
+    try:
+        print(f"🧩 {pack(cfg).describe()}")
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    if args.detect_budget is not None:
+        # Через окружение бюджет доходит и до процессов сборки частей
+        os.environ["PASS_DETECT_BUDGET"] = str(args.detect_budget)
+        PhotoUtils.detect_budget = args.detect_budget
+
+    if args.zip and not os.path.exists(args.zip):
+        print(f"❌ Архив {args.zip} не найден!")
+        return
+
+    if args.watch:
+        if not os.path.isdir(args.images):
+            print(f"❌ Папка {args.images} не найдена!")
+            return
+        logo_path = find_logo(cfg, args)
+        logo_bytes = None
+        if logo_path:
+            with open(logo_path, "rb") as f:
+                logo_bytes = f.read()
+        watch(args.images, args.output, cfg, logo_bytes,
+              exclude=[cfg.default_logo], interval=args.interval, quiet=args.quiet)
+        return
+
+    if args.roster:
+        if not os.path.exists(args.roster):
+            print(f"❌ Реестр {args.roster} не найден!")
+            return
+        photo_dir = args.images if os.path.isdir(args.images) else ""
+        rows = iter_roster(args.roster, photo_dir)
+        if args.zip:
+            rows = match_photos(rows, iter_zip_photos(open_photo_zip(args.zip)))
+    elif args.zip:
+        rows = rows_from_zip(args.zip, exclude=[cfg.default_logo])
+    else:
+        if not os.path.exists(args.images):
+            print(f"❌ Папка {args.images} не найдена!")
+            print(f"   Создайте папку и поместите туда:")
+            print(f"   - Фотографии сотрудников (имя файла = ФИО)")
+            print(f"   - Логотип: {cfg.default_logo}")
+            return
+        rows = rows_from_folder(args.images, exclude=[cfg.default_logo])
+
+    groups = None
+    if args.preflight != "off":
+        rows = list(rows)
+        report = scan(rows, cfg)
+        print("\n🔎 Проверка пакета")
+        for line in report.lines():
+            print(f"   {line}")
+        if args.preflight_csv:
+            with open(args.preflight_csv, "wb") as f:
+                f.write(report.to_csv())
+        groups = report.photo_groups(rows, args.preflight)
+        try:
+            rows = report.apply(rows, args.preflight)
+        except PreflightError as e:
+            print(f"❌ Сборка остановлена: {e}")
+            return
+
+    logo_path = find_logo(cfg, args)
+    logo_bytes = None
+    if logo_path:
+        with open(logo_path, "rb") as f:
+            logo_bytes = f.read()
+
+    store = None
+    if args.photo_store:
+        from photo_store import PhotoStore
+        rows = list(rows)
+        store = PhotoStore(args.photo_store, photo_frame_px(cfg))
+        stats = store.update(rows)
+        print(f"\n🗄️ Хранилище фото {args.photo_store}: {stats.line()}")
+
+    if args.export_zip:
+        count = export_zip(rows, cfg, logo_bytes, args.export_zip,
+                           dpi=args.export_dpi, fmt=args.export_format,
+                           photo_store=store, photo_groups=groups)
+        print(f"\n🎉 Экспортировано {count} пропусков: {args.export_zip}")
+        return
+
+    if args.variants:
+        from variants import build_variants, load_variants, variant_path
+        try:
+            variants = load_variants(args.variants, cfg)
+        except (OSError, ValueError) as e:
+            print(f"❌ Варианты {args.variants}: {e}")
+            return
+        outs = [variant_path(args.output, name) for name, _ in variants]
+        counts = build_variants(
+            list(rows), [c for _, c in variants], logo_bytes, outs,
+            memory_budget_mb=args.memory_budget, photo_store=store, photo_groups=groups,
+        )
+        print(f"\n🎉 Собрано {len(outs)} вариантов:")
+        for out, count in zip(outs, counts):
+            print(f"   {out}: {count} пропусков")
+        return
+
+    if args.job:
+        from distributed import merge, plan, run_local
+        try:
+            units = plan(rows, cfg, logo_bytes, args.job, args.shard_pages or 10)
+        except FileExistsError as e:
+            print(f"❌ {e}")
+            return
+        print(f"\n📋 Задание {args.job}: {units} частей")
+        if not args.workers:
+            print(f"   Рабочие: python distributed.py work {args.job}")
+            return
+        run_local(args.job, args.workers)
+        out = os.path.splitext(args.output)[0] + ".zip"
+        results = merge(args.job, out)
+        failed = [r for r in results if r.error]
+        print(f"\n🎉 Собрано {sum(r.cards for r in results)} пропусков "
+              f"в {len(results) - len(failed)} частях: {out}")
+        for r in failed:
+            print(f"   ❌ Часть {r.index} ({r.first} … {r.last}): {r.error}")
+        return
 
-    if not os.path.exists(cfg.FOLDER_PATH):
-        print(f"❌ Папка {cfg.FOLDER_PATH} не найдена!")
-        print(f"   Создайте папку и поместите туда:")
-        print(f"   - Фотографии сотрудников (имя файла = ФИО)")
-        print(f"   - Логотип: {cfg.LOGO_FILENAME}")
+    if args.shard_pages:
+        out = os.path.splitext(args.output)[0] + ".zip"
+        results = build_shards(
+            rows, cfg, logo_bytes, out, args.shard_pages, args.workers
+        )
+        failed = [r for r in results if r.error]
+        count = sum(r.cards for r in results if not r.error)
+        print(f"\n🎉 Создано {count} пропусков в {len(results) - len(failed)} частях: {out}")
+        for r in failed:
+            print(f"   ❌ Часть {r.index} ({r.first} … {r.last}): {r.error}")
         return
 
-    builder = DocumentBuilder()
-    builder.build()
+    builder = DocumentBuilder(
+        cfg, memory_budget_mb=args.memory_budget, report=args.report,
+        photo_store=store, photo_groups=groups,
+    )
+    count = builder.build_rows(rows, logo_bytes, args.output)
 
-    print("\n🎉 Процесс завершен успешно!")
+    print(f"\n🎉 Создано {count} пропусков: {args.output}")
+    for line in builder.last_report.lines():
+        print(f"   {line}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
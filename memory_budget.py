@@ -0,0 +1,312 @@
+"""
+Бюджет памяти сборки — выгрузка картинок документа на диск
+и отчёт о пиковом потреблении (RSS + tracemalloc по этапам)
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from docx.parts.image import ImagePart
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+
+
+# ═══════════════════════════════════════════════════
+#  ВЫГРУЗКА КАРТИНОК ДОКУМЕНТА
+# ═══════════════════════════════════════════════════
+
+class _StoredImagePart(ImagePart):
+    """
+    ImagePart с запомненным SHA1 и, после выгрузки, blob во временном файле.
+
+    python-docx при каждой вставке картинки сверяет SHA1 со всеми уже
+    добавленными — без кэша это O(n²) хэширования на больших документах.
+    """
+
+    _sha1_cache: str = ""
+    _spill_path: str | None = None
+
+    @property
+    def blob(self) -> bytes:
+        if self._spill_path is None:
+            return self._blob or b""
+        with open(self._spill_path, "rb") as f:
+            return f.read()
+
+    @property
+    def sha1(self) -> str:
+        return self._sha1_cache
+
+
+class MediaSpill:
+    """
+    Следит за объёмом картинок в документе. Пока он в пределах бюджета,
+    картинки держатся в памяти, сверх бюджета — пишутся во временную папку
+    и читаются обратно только при сохранении документа.
+    budget_mb=None — выгрузки нет, только кэш SHA1.
+    """
+
+    def __init__(self, budget_mb: float | None = None, tmp_dir: str | None = None):
+        self.budget = None if budget_mb is None else int(budget_mb * MB)
+        self._tmp_root = tmp_dir
+        self._tmp = None
+        self.in_memory = 0
+        self.spilled = 0
+        self.spilled_bytes = 0
+
+    def track(self, part: ImagePart):
+        """Вызывается для каждой только что вставленной картинки"""
+        if isinstance(part, _StoredImagePart):
+            return  # та же картинка вставлена повторно
+        blob = part._blob or b""
+        part.__class__ = _StoredImagePart
+        part._sha1_cache = hashlib.sha1(blob).hexdigest()
+
+        if self.budget is None or self.in_memory + len(blob) <= self.budget:
+            self.in_memory += len(blob)
+            return
+
+        if self._tmp is None:
+            self._tmp = tempfile.TemporaryDirectory(
+                prefix="pass_media_", dir=self._tmp_root
+            )
+        path = os.path.join(self._tmp.name, f"{self.spilled:06d}.bin")
+        with open(path, "wb") as f:
+            f.write(blob)
+        part._spill_path = path
+        part._blob = None
+        part._image = None
+        self.spilled += 1
+        self.spilled_bytes += len(blob)
+
+    def cleanup(self):
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
+
+
+# ═══════════════════════════════════════════════════
+#  ОТЧЁТ О ПАМЯТИ
+# ═══════════════════════════════════════════════════
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    peak: int = 0       # наибольший прирост памяти внутри одного вызова
+    retained: int = 0   # сколько осталось занято после всех вызовов
+
+
+# Фото дольше этого попадает в отчёт поимённо
+SLOW_PHOTO_S = 1.0
+
+
+@dataclass
+class BuildReport:
+    stages: dict[str, StageStats] = field(default_factory=dict)
+    traced_peak: int = 0
+    peak_rss_mb: float = 0.0
+    spilled: int = 0
+    spilled_mb: float = 0.0
+    sheets: int = 0
+    layout: str = ""
+    photo_seconds: list[float] = field(default_factory=list)
+    slow_photos: list = field(default_factory=list)   # PhotoTiming
+
+    @property
+    def timed_out(self) -> list:
+        return [t for t in self.slow_photos if t.timed_out]
+
+    def lines(self) -> list[str]:
+        out = [f"Пиковый RSS процесса: {self.peak_rss_mb:.0f} МБ"]
+        if self.sheets:
+            out.append(f"Листов: {self.sheets} ({self.layout})")
+        out += self.photo_lines()
+        if self.stages:
+            out.append(f"Пик tracemalloc: {self.traced_peak / MB:.1f} МБ")
+        for name, s in self.stages.items():
+            out.append(
+                f"  {name:<8} {s.calls:>6} выз.  {s.seconds:7.2f} с  "
+                f"пик +{s.peak / MB:6.1f} МБ  осталось {s.retained / MB:+6.1f} МБ"
+            )
+        if self.spilled:
+            out.append(f"Выгружено на диск: {self.spilled} картинок, "
+                       f"{self.spilled_mb:.1f} МБ")
+        return out
+
+    def photo_lines(self, limit: int = 10) -> list[str]:
+        """Распределение времени обработки фото и самые медленные фото"""
+        if not self.photo_seconds:
+            return []
+        ordered = sorted(self.photo_seconds)
+
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+        out = [f"Фото: {len(ordered)}, p50 {pct(0.5):.0f} мс, p99 {pct(0.99):.0f} мс, "
+               f"макс. {ordered[-1] * 1000:.0f} мс"]
+        if self.timed_out:
+            out.append(f"Детекция лица не уложилась в бюджет: {len(self.timed_out)} "
+                       f"фото обрезано по центру")
+        slow = sorted(self.slow_photos, key=lambda t: -t.seconds)
+        for t in slow[:limit]:
+            mark = "⏱️ по центру" if t.timed_out else "🐢"
+            out.append(f"  {mark} {t.name}: {t.seconds:.1f} с "
+                       f"(детекция {t.detect:.1f} с, {t.size[0]}×{t.size[1]})")
+        if len(slow) > limit:
+            out.append(f"  … и ещё {len(slow) - limit}")
+        return out
+
+
+class BuildMeter:
+    """
+    Замеры по этапам сборки. tracemalloc видит Python-объекты и массивы
+    numpy, но не буферы изображений PIL — их отражает пиковый RSS.
+    При enabled=False этапы не замеряются, отчёт содержит только RSS.
+
+    tracemalloc один на процесс: трассировку включает первый замер и
+    выключает последний (счётчик _users). Если отчёты строят несколько
+    сессий одновременно, их этапы видят и чужие выделения памяти.
+    """
+
+    _users = 0
+    _owns_tracing = False
+    _lock = threading.Lock()
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.report = BuildReport()
+        self._started = False
+        if enabled:
+            with BuildMeter._lock:
+                if BuildMeter._users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    BuildMeter._owns_tracing = True
+                BuildMeter._users += 1
+            self._started = True
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            s = self.report.stages.setdefault(name, StageStats())
+            s.calls += 1
+            s.seconds += time.perf_counter() - t
+            s.peak = max(s.peak, peak - before)
+            s.retained += current - before
+            self.report.traced_peak = max(self.report.traced_peak, peak)
+
+    def photo(self, timing):
+        """Время обработки фото (PhotoTiming) — замеряется всегда, это дёшево"""
+        self.report.photo_seconds.append(timing.seconds)
+        if timing.timed_out or timing.seconds >= SLOW_PHOTO_S:
+            self.report.slow_photos.append(timing)
+
+    def finish(self, spill: MediaSpill | None = None) -> BuildReport:
+        if self._started:
+            with BuildMeter._lock:
+                BuildMeter._users -= 1
+                if BuildMeter._users == 0 and BuildMeter._owns_tracing:
+                    tracemalloc.stop()
+                    BuildMeter._owns_tracing = False
+            self._started = False
+        self.report.peak_rss_mb = peak_rss_mb()
+        if spill is not None:
+            self.report.spilled = spill.spilled
+            self.report.spilled_mb = spill.spilled_bytes / MB
+        return self.report
+
+
+# ── Выделения на одну операцию ─────────────────
+
+@dataclass
+class AllocStats:
+    pil_images: int = 0     # сколько изображений PIL создано
+    pil_bytes: int = 0      # байт пикселей в них (суммарно, не пик)
+    traced_peak: int = 0    # пик tracemalloc: Python и массивы numpy/cv2
+
+    def per(self, n: int) -> "AllocStats":
+        return AllocStats(self.pil_images // n, self.pil_bytes // n, self.traced_peak)
+
+    def line(self) -> str:
+        return (f"PIL: {self.pil_images} изобр., {self.pil_bytes / MB:.1f} МБ; "
+                f"numpy/Python: пик {self.traced_peak / MB:.1f} МБ")
+
+
+_PIXEL_BYTES = {"1": 1, "L": 1, "P": 1, "I;16": 2}
+
+
+@contextmanager
+def count_allocations():
+    """
+    Замер выделений внутри блока — только для render_check и load_test,
+    не для сборок в приложении или сервисе. Буферы PIL не видны
+    tracemalloc, поэтому новые изображения считаются перехватом
+    Image.Image._new (через него проходят new, convert, resize, crop,
+    filter…) — перехват на весь процесс. Пока идёт сборка с замером
+    (BuildMeter), замер не запускается: reset_peak сбил бы её этапы.
+    Сам замер тоже считается пользователем tracemalloc (BuildMeter._users).
+    """
+    from PIL import Image
+
+    with BuildMeter._lock:
+        if BuildMeter._users > 0:
+            raise RuntimeError("count_allocations: идёт другой замер памяти "
+                               "(сборка с отчётом или вложенный замер)")
+        BuildMeter._users += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            BuildMeter._owns_tracing = True
+
+    stats = AllocStats()
+    real_new = Image.Image._new
+    lock = threading.Lock()
+
+    def counting_new(self, im):
+        w, h = im.size
+        with lock:
+            stats.pil_images += 1
+            stats.pil_bytes += w * h * _PIXEL_BYTES.get(im.mode, 4)
+        return real_new(self, im)
+
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    Image.Image._new = counting_new
+    try:
+        yield stats
+    finally:
+        Image.Image._new = real_new
+        stats.traced_peak = tracemalloc.get_traced_memory()[1] - before
+        with BuildMeter._lock:
+            BuildMeter._users -= 1
+            if BuildMeter._users == 0 and BuildMeter._owns_tracing:
+                tracemalloc.stop()
+                BuildMeter._owns_tracing = False
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса (МБ); 0, если платформа не сообщает"""
+    if resource is None:
+        return 0.0
+    # Linux отдаёт КБ, macOS — байты
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (MB if os.uname().sysname == "Darwin" else 1024)
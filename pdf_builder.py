@@ -0,0 +1,168 @@
+"""Сборка PDF — те же листы, что и в Word: лицевые, затем зеркальные оборотные"""
+
+import io
+from itertools import islice
+from typing import BinaryIO
+
+from PIL import Image
+
+from document_builder import DocumentBuilder
+
+
+class PdfBuilder(DocumentBuilder):
+    """
+    Каждая страница собирается как растровый лист в dpi карточек по той же
+    раскладке (sheet_layout), что и Word, и сразу дописывается в открытый
+    PDF (_PdfPages) — в памяти только один лист. out — путь или поток.
+    """
+
+    def _build_doc(self, rows, logo_pil, out, progress_cb, total) -> int:
+        cards = self._cards(rows, logo_pil)
+        done = 0
+        pdf = _PdfPages(out, self.cfg.dpi)
+
+        def step():
+            nonlocal done
+            done += 1
+            if progress_cb and total:
+                progress_cb(min(done / (total * 2), 1.0))
+
+        def add_page(sheet):
+            with self._meter.stage("save"):
+                pdf.add(sheet)
+
+        front_slots = self.layout.slots()
+        back_slots = self.layout.slots(back=True)
+        sheets = 0
+        try:
+            while chunk := list(islice(cards, self.chunk)):
+                sheet = self._sheet()
+                for slot, (row, card, _) in zip(front_slots, chunk):
+                    with self._meter.stage("insert"):
+                        self._place(sheet, slot, card)
+                    step()
+                add_page(sheet)
+
+                sheet = self._sheet()
+                for slot, (row, _, back) in zip(back_slots, chunk):
+                    card = self._back(row) if back is None else back
+                    with self._meter.stage("insert"):
+                        self._place(sheet, slot, card, back=True)
+                    step()
+                add_page(sheet)
+                sheets += 1
+
+            with self._meter.stage("save"):
+                pdf.close()
+        finally:
+            pdf.release()
+        self._meter.report.sheets = sheets
+        self._meter.report.layout = self.layout.describe()
+        return done // 2
+
+    # ── Приватные ──────────────────────────────────
+
+    def _px(self, cm: float) -> int:
+        return round(cm / 2.54 * self.cfg.dpi)
+
+    def _sheet(self) -> Image.Image:
+        return Image.new("RGB", (self._px(self.layout.page_w),
+                                 self._px(self.layout.page_h)), "white")
+
+    def _place(self, sheet, slot, card_img, back: bool = False):
+        """Карточка в место раскладки; повёрнутые — как в Word"""
+        if isinstance(card_img, bytes):
+            card_img = Image.open(io.BytesIO(card_img))
+        # Размер — по тому же правилу, что у рендерера: готовая карточка
+        # не пересэмплируется, только чужого dpi
+        size = self.cfg.get_px()
+        card = card_img if card_img.size == size else card_img.resize(size)
+        if slot.rotated:
+            card = self._rotate(card, back)
+        sheet.paste(card, (self._px(slot.x), self._px(slot.y)))
+
+
+class _PdfPages:
+    """
+    PDF, который пишется по странице: лист — JPEG (как у PIL, quality 95)
+    на всю страницу. Дерево страниц и таблица xref пишутся в close().
+    Дописывание через save(append=True) перечитывало бы весь растущий
+    файл на каждой странице — квадратично от числа листов.
+    """
+
+    QUALITY = 95
+
+    def __init__(self, out: str | BinaryIO, dpi: int):
+        self.out = out
+        self.dpi = dpi
+        self.f = None                  # открывается с первой страницей
+        self.offsets: list[int] = []   # смещение объекта n — offsets[n - 1]
+        self.pages: list[int] = []
+        self._base = 0
+
+    def add(self, sheet: Image.Image):
+        if self.f is None:
+            self._start()
+        buf = io.BytesIO()
+        if sheet.mode != "RGB":
+            sheet = sheet.convert("RGB")
+        sheet.save(buf, "JPEG", quality=self.QUALITY)
+        w, h = sheet.size
+        pw, ph = w * 72.0 / self.dpi, h * 72.0 / self.dpi
+
+        image = self._obj(
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+            b"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode "
+            b"/Length %d >>" % (w, h, buf.tell()), buf.getvalue())
+        content = b"q %f 0 0 %f 0 0 cm /image Do Q\n" % (pw, ph)
+        contents = self._obj(b"<< /Length %d >>" % len(content), content)
+        self.pages.append(self._obj(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %f %f] "
+            b"/Resources << /ProcSet [/PDF /ImageC] /XObject << /image %d 0 R >> >> "
+            b"/Contents %d 0 R >>" % (pw, ph, image, contents)))
+
+    def close(self):
+        """Дописывает дерево страниц и xref; без страниц файл не создаётся"""
+        if self.f is None:
+            return
+        kids = b" ".join(b"%d 0 R" % n for n in self.pages)
+        self._obj(b"<< /Type /Pages /Count %d /Kids [%s] >>" % (len(self.pages), kids), num=2)
+        self._obj(b"<< /Type /Catalog /Pages 2 0 R >>", num=1)
+
+        xref = self._tell()
+        self.f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.offsets) + 1))
+        for off in self.offsets:
+            self.f.write(b"%010d 00000 n \n" % off)
+        self.f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                     % (len(self.offsets) + 1, xref))
+        self.release()
+
+    def release(self):
+        """Закрывает свой файл (после ошибки — недописанным)"""
+        if isinstance(self.out, str) and self.f is not None and not self.f.closed:
+            self.f.close()
+
+    # ── Приватные ──────────────────────────────────
+
+    def _start(self):
+        self.f = open(self.out, "wb") if isinstance(self.out, str) else self.out
+        self._base = self.f.tell()
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._reserve()                # 1 — каталог
+        self._reserve()                # 2 — дерево страниц
+
+    def _tell(self) -> int:
+        return self.f.tell() - self._base
+
+    def _reserve(self) -> int:
+        self.offsets.append(0)
+        return len(self.offsets)
+
+    def _obj(self, head: bytes, stream: bytes | None = None, num: int | None = None) -> int:
+        num = num or self._reserve()
+        self.offsets[num - 1] = self._tell()
+        self.f.write(b"%d 0 obj\n%s\n" % (num, head))
+        if stream is not None:
+            self.f.write(b"stream\n%s\nendstream\n" % stream)
+        self.f.write(b"endobj\n")
+        return num
@@ -0,0 +1,85 @@
+"""ZIP-архив с фото сотрудников — чтение по одному файлу, имя файла = ФИО"""
+
+import os
+import zipfile
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from roster import PHOTO_EXT, RosterRow
+
+# Флаг «имя в UTF-8» в заголовке ZIP (бит 11)
+_UTF8_FLAG = 0x800
+
+
+def open_photo_zip(source: str | BinaryIO) -> zipfile.ZipFile:
+    """Открывает архив: читается только центральный каталог, не содержимое"""
+    return zipfile.ZipFile(source)
+
+
+def entry_name(info: zipfile.ZipInfo) -> str:
+    """
+    Имя файла в архиве с корректной кириллицей.
+    Без флага UTF-8 zipfile декодирует имя как cp437; архиваторы же
+    пишут туда UTF-8 (без флага) или cp866 (русская Windows).
+    """
+    name = info.filename
+    if info.flag_bits & _UTF8_FLAG:
+        return name
+    try:
+        raw = name.encode("cp437")
+    except UnicodeEncodeError:
+        return name
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("cp866")
+
+
+class ZipEntry:
+    """
+    Загрузчик одного фото из архива: вызов распаковывает файл целиком,
+    open() отдаёт поток — для чтения только заголовка (preflight).
+    """
+
+    def __init__(self, zf: zipfile.ZipFile, info: zipfile.ZipInfo):
+        self.zf = zf
+        self.info = info
+
+    def __call__(self) -> bytes:
+        return self.zf.read(self.info)
+
+    def open(self) -> BinaryIO:
+        return self.zf.open(self.info)
+
+
+def iter_zip_photos(
+    zf: zipfile.ZipFile, exclude: Iterable[str] = ()
+) -> Iterator[tuple[str, Callable[[], bytes]]]:
+    """
+    Пары (имя файла, загрузчик) для фото в архиве.
+    Загрузчик (ZipEntry) распаковывает один файл в момент вызова.
+    """
+    skip = {name.lower() for name in exclude}
+    entries = []
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        path = entry_name(info)
+        name = os.path.basename(path)
+        if (path.startswith("__MACOSX/") or name.startswith(".")
+                or name.lower() in skip
+                or os.path.splitext(name)[1].lower() not in PHOTO_EXT):
+            continue
+        entries.append((name, info))
+
+    entries.sort(key=lambda e: e[0])
+    for name, info in entries:
+        yield name, ZipEntry(zf, info)
+
+
+def rows_from_zip(
+    source: str | BinaryIO | zipfile.ZipFile, exclude: Iterable[str] = ()
+) -> Iterator[RosterRow]:
+    """Строки пропусков из архива: ФИО = имя файла без расширения"""
+    zf = source if isinstance(source, zipfile.ZipFile) else open_photo_zip(source)
+    for name, loader in iter_zip_photos(zf, exclude):
+        yield RosterRow(os.path.splitext(name)[0], loader=loader)
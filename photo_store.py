@@ -0,0 +1,238 @@
+"""
+Хранилище готовых фото реестра — один файл NumPy, открытый через mmap.
+
+Каждое фото один раз проходит PhotoUtils (декодирование, поиск лица,
+обрезка) и вписывается в рамку лицевой стороны — ровно как в
+DrawingUtils.framed_photo, поэтому карточка из хранилища попиксельно
+совпадает с обычной. Дальше рендер берёт фото из карты без копирования:
+Image.frombuffer поверх строки массива (RGBX — 4 байта на пиксель, иначе
+PIL копирует). На диске ~0.7 МБ на сотрудника при карточке 9.5×6.5 см.
+
+    store = PhotoStore("photo_store", photo_frame_px(cfg))
+    store.update(rows)                  # только новые и изменённые фото
+    DocumentBuilder(cfg, photo_store=store).build_rows(rows, ...)
+
+Индекс (index.json): слоты по SHA1 содержимого, SHA1 по ФИО и по файлу
+(mtime и размер — чтобы не перечитывать неизменённые файлы).
+Хранилище привязано к размеру рамки: другой размер карточки — пересборка.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from PIL import Image
+
+from roster import RosterRow
+
+ARRAY = "photos.npy"
+INDEX = "index.json"
+
+
+@dataclass
+class StoreStats:
+    added: int = 0
+    reused: int = 0
+    removed: int = 0
+    failed: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def line(self) -> str:
+        return (f"новых {self.added}, без изменений {self.reused}, "
+                f"удалено {self.removed}, ошибок {len(self.failed)} "
+                f"за {self.seconds:.1f} с")
+
+
+class PhotoStore:
+
+    def __init__(self, folder: str, size: tuple[int, int]):
+        """size — рамка фото (ширина, высота): preflight.photo_frame_px(cfg)"""
+        self.folder = folder
+        self.size = tuple(size)
+        os.makedirs(folder, exist_ok=True)
+        self.slots: dict[str, int] = {}      # sha1 → слот
+        self.by_fio: dict[str, str] = {}     # ФИО → sha1
+        self.sources: dict[str, list] = {}   # путь → [mtime_ns, размер, sha1]
+        self._map = None
+        self._load()
+
+    # ── Чтение ─────────────────────────────────────
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def photo(self, sha1: str) -> Image.Image | None:
+        """Фото из карты без копирования (только чтение)"""
+        slot = self.slots.get(sha1)
+        if slot is None:
+            return None
+        return Image.frombuffer("RGBX", self.size, self._map[slot], "raw", "RGBX", 0, 1)
+
+    def photo_for(self, row: RosterRow) -> Image.Image | None:
+        """Фото строки: по файлу (если не менялся), иначе по ФИО"""
+        sha1 = self._source_sha1(row) or self.by_fio.get(_fio_key(row.fio))
+        return self.photo(sha1) if sha1 else None
+
+    # ── Обновление ─────────────────────────────────
+
+    def update(self, rows: list[RosterRow], workers: int | None = None,
+               prune: bool = True) -> StoreStats:
+        """
+        Добавляет новые и изменённые фото; prune=True освобождает слоты
+        фото, которых больше нет в rows. Обработка — в пуле потоков.
+        """
+        start = time.perf_counter()
+        stats = StoreStats()
+        todo: dict[str, tuple[RosterRow, bytes | None]] = {}
+        by_fio: dict[str, str] = {}
+        sources: dict[str, list] = {}
+
+        for row in rows:
+            try:
+                sha1, data = self._hash_row(row, sources)
+            except Exception:
+                stats.failed.append(row.fio)
+                continue
+            key = _fio_key(row.fio)
+            # Однофамильцы с разными фото — по ФИО не искать
+            by_fio[key] = sha1 if by_fio.get(key, sha1) == sha1 else ""
+            if sha1 in self.slots or sha1 in todo:
+                stats.reused += 1
+            else:
+                todo[sha1] = (row, data)
+
+        if prune:
+            keep = set(by_fio.values()) | {s[2] for s in sources.values()}
+            for sha1 in [s for s in self.slots if s not in keep]:
+                del self.slots[sha1]
+                stats.removed += 1
+
+        if todo:
+            used = set(self.slots.values())
+            free = [i for i in range(len(self._map)) if i not in used]
+            free.reverse()
+            workers = workers or min(8, os.cpu_count() or 2)
+            with ThreadPoolExecutor(workers, thread_name_prefix="photo-store") as pool:
+                for sha1, pixels in zip(todo, pool.map(self._normalize, todo.values())):
+                    if pixels is None:
+                        stats.failed.append(todo[sha1][0].fio)
+                        continue
+                    if not free:
+                        size = len(self._map)
+                        self._grow(size * 2)
+                        free = list(range(size * 2 - 1, size - 1, -1))
+                    slot = free.pop()
+                    self._map[slot] = pixels
+                    self.slots[sha1] = slot
+                    stats.added += 1
+
+        # Не попавшие в хранилище фото (ошибка) — не ссылаться на них
+        by_fio = {k: v for k, v in by_fio.items() if v in self.slots}
+        sources = {k: v for k, v in sources.items() if v[2] in self.slots}
+        if prune:
+            self.by_fio, self.sources = by_fio, sources
+        else:
+            self.by_fio.update(by_fio)
+            self.sources.update(sources)
+
+        self._save()
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    # ── Приватные ──────────────────────────────────
+
+    def _normalize(self, item):
+        """Обрезка по лицу и вписывание в рамку → массив (h, w, 4)"""
+        import numpy as np
+        from drawing_utils import DrawingUtils as DU
+        from photo_utils import PhotoUtils
+
+        row, data = item
+        try:
+            data = data if data is not None else row.read_photo()
+            photo = PhotoUtils.process_upload(data, row.fio)
+            framed = DU.framed_photo(photo, self.size, "#FFFFFF", 0)
+        except Exception as e:
+            print(f"  ⚠️ «{row.fio}»: фото не читается ({e})")
+            return None
+        return np.asarray(framed.convert("RGBX"))
+
+    def _hash_row(self, row: RosterRow, sources: dict):
+        """SHA1 содержимого; файл без изменений не перечитывается"""
+        if row.photo_path and row.photo_bytes is None and row.loader is None:
+            st = os.stat(row.photo_path)
+            key = os.path.abspath(row.photo_path)
+            known = self.sources.get(key)
+            if known and known[:2] == [st.st_mtime_ns, st.st_size] and known[2] in self.slots:
+                sources[key] = known
+                return known[2], None
+            data = row.read_photo()
+            sha1 = hashlib.sha1(data).hexdigest()
+            sources[key] = [st.st_mtime_ns, st.st_size, sha1]
+            return sha1, data
+        data = row.read_photo()
+        return hashlib.sha1(data).hexdigest(), data
+
+    def _source_sha1(self, row: RosterRow) -> str:
+        if not row.photo_path or row.photo_bytes is not None or row.loader is not None:
+            return ""
+        known = self.sources.get(os.path.abspath(row.photo_path))
+        if not known:
+            return ""
+        try:
+            st = os.stat(row.photo_path)
+        except OSError:
+            return ""
+        return known[2] if known[:2] == [st.st_mtime_ns, st.st_size] else ""
+
+    def _grow(self, capacity: int):
+        """Файл пересоздаётся большего размера (старые слоты копируются)"""
+        import numpy as np
+
+        path = os.path.join(self.folder, ARRAY)
+        w, h = self.size
+        new = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=np.uint8,
+                                        shape=(capacity, h, w, 4))
+        if self._map is not None and len(self._map):
+            new[:len(self._map)] = self._map
+            self._map.flush()
+        new.flush()
+        del new
+        self._map = None
+        os.replace(path + ".tmp", path)
+        self._map = np.lib.format.open_memmap(path, mode="r+")
+
+    def _load(self):
+        import numpy as np
+
+        path = os.path.join(self.folder, ARRAY)
+        try:
+            with open(os.path.join(self.folder, INDEX), encoding="utf-8") as f:
+                index = json.load(f)
+            if tuple(index["size"]) != self.size:
+                print(f"  ♻️ Размер рамки изменился — хранилище фото {self.folder} "
+                      f"собирается заново")
+                raise ValueError("size")
+            self._map = np.lib.format.open_memmap(path, mode="r+")
+            self.slots = index["slots"]
+            self.by_fio = index["fio"]
+            self.sources = index["sources"]
+        except (OSError, ValueError, KeyError):
+            self.slots, self.by_fio, self.sources = {}, {}, {}
+            self._grow(16)
+
+    def _save(self):
+        self._map.flush()
+        path = os.path.join(self.folder, INDEX)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"size": list(self.size), "slots": self.slots,
+                       "fio": self.by_fio, "sources": self.sources},
+                      f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+def _fio_key(fio: str) -> str:
+    return " ".join(fio.lower().split())
@@ -1,41 +1,239 @@
 """Обработка фото — детекция лица, обрезка (работает с байтами)"""
 
-import cv2
-import numpy as np
-from PIL import Image
 import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from PIL import Image
+
+# cv2 и numpy импортируются лениво — они нужны только при обработке фото,
+# а их загрузка заметно удлиняет холодный старт приложения
+
+
+@dataclass
+class PhotoTiming:
+    """Сколько заняла обработка одного фото"""
+    name: str
+    seconds: float = 0.0
+    detect: float = 0.0
+    size: tuple[int, int] = (0, 0)
+    timed_out: bool = False   # детекция не уложилась — обрезано по центру
 
 
 class PhotoUtils:
 
+    # ── Бюджет времени на детекцию ─────────────────
+    # detectMultiScale на огромном или шумном фото может идти секундами
+    # и останавливать всю сборку. Детекция идёт в потоке-демоне; если не
+    # уложилась в бюджет, поток бросается (досчитает в фоне и вернёт
+    # каскад в пул), а фото обрезается по центру. Пока брошенных потоков
+    # MAX_ABANDONED, новые фото сразу обрезаются по центру — ядра заняты.
+    # Бюджет — PASS_DETECT_BUDGET (сек), 0 — без ограничения.
+
+    detect_budget: float = float(os.environ.get("PASS_DETECT_BUDGET", "5"))
+    MAX_ABANDONED = 4
+    _abandoned = 0
+    _abandon_lock = threading.Lock()
+
     @staticmethod
     def process_upload(file_bytes: bytes, filename: str = "") -> Image.Image:
         """Принимает байты загруженного файла → PIL Image с обрезкой по лицу"""
+        return PhotoUtils.process_timed(file_bytes, filename)[0]
+
+    @staticmethod
+    def process_timed(
+        file_bytes: bytes, filename: str = "", budget: float | None = None,
+    ) -> tuple[Image.Image, PhotoTiming]:
+        """То же, что process_upload, плюс замер; budget — вместо detect_budget"""
+        import cv2
+        import numpy as np
+
+        timing = PhotoTiming(filename)
+        start = time.perf_counter()
         try:
             arr = np.frombuffer(file_bytes, dtype=np.uint8)
             img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
 
             if img is None:
-                return Image.open(io.BytesIO(file_bytes)).convert("RGB")
-
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            faces = PhotoUtils._detect(gray)
-
-            if len(faces) > 0:
-                cropped = PhotoUtils._crop_face(img, faces)
+                result = Image.open(io.BytesIO(file_bytes)).convert("RGB")
             else:
-                cropped = PhotoUtils._crop_center(img)
+                timing.size = (img.shape[1], img.shape[0])
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                t = time.perf_counter()
+                faces = PhotoUtils._detect_within(gray, budget)
+                timing.detect = time.perf_counter() - t
+
+                if faces is None:
+                    timing.timed_out = True
+                    cropped = PhotoUtils._crop_center(img)
+                elif len(faces) > 0:
+                    cropped = PhotoUtils._crop_face(img, faces)
+                else:
+                    cropped = PhotoUtils._crop_center(img)
 
-            return Image.fromarray(cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB))
+                result = PhotoUtils._bgr_to_pil(cropped)
 
         except Exception:
-            return Image.open(io.BytesIO(file_bytes)).convert("RGB")
+            result = Image.open(io.BytesIO(file_bytes)).convert("RGB")
+
+        timing.seconds = time.perf_counter() - start
+        return result, timing
+
+    @staticmethod
+    def _detect_within(gray, budget: float | None = None):
+        """Лица или None, если детекция не уложилась в бюджет"""
+        budget = PhotoUtils.detect_budget if budget is None else budget
+        if not budget or budget <= 0:
+            return PhotoUtils._detect(gray)
+
+        lock = PhotoUtils._abandon_lock
+        with lock:
+            if PhotoUtils._abandoned >= PhotoUtils.MAX_ABANDONED:
+                return None
+
+        box = {}
+        done = threading.Event()
+
+        def work():
+            try:
+                box["faces"] = PhotoUtils._detect(gray)
+            except BaseException as e:
+                box["error"] = e
+            finally:
+                with lock:
+                    box["finished"] = True
+                    if box.get("abandoned"):
+                        PhotoUtils._abandoned -= 1
+                done.set()
+
+        threading.Thread(target=work, name="pass-detect", daemon=True).start()
+        if not done.wait(budget):
+            with lock:
+                if not box.get("finished"):
+                    box["abandoned"] = True
+                    PhotoUtils._abandoned += 1
+                    return None
+            done.wait()
+        if "error" in box:
+            raise box["error"]
+        return box["faces"]
 
     @staticmethod
     def _detect(gray):
-        cascade = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-        fc = cv2.CascadeClassifier(cascade)
-        return fc.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+        with PhotoUtils._cascade() as fc:
+            return fc.detectMultiScale(gray, 1.1, 5, minSize=(30, 30))
+
+    # ── Каскад Хаара ───────────────────────────────
+    # Загрузка XML-каскада занимает десятки мс, поэтому классификаторы
+    # переиспользуются. Один экземпляр не делится между потоками
+    # одновременно — каждый поток берёт свободный из пула.
+
+    _cascade_pool: list = []
+    _cascade_lock = threading.Lock()
+
+    @staticmethod
+    def _new_cascade():
+        import cv2
+        path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        return cv2.CascadeClassifier(path)
+
+    @staticmethod
+    @contextmanager
+    def _cascade():
+        with PhotoUtils._cascade_lock:
+            fc = PhotoUtils._cascade_pool.pop() if PhotoUtils._cascade_pool else None
+        if fc is None:
+            fc = PhotoUtils._new_cascade()
+        try:
+            yield fc
+        finally:
+            with PhotoUtils._cascade_lock:
+                PhotoUtils._cascade_pool.append(fc)
+
+    @staticmethod
+    def warm_up():
+        """Загружает cv2 и один классификатор заранее"""
+        with PhotoUtils._cascade():
+            pass
+
+    # ── Похожие фото ───────────────────────────────
+    # dHash 8×8: фото в оттенках серого уменьшается до 9×8, бит = «пиксель
+    # светлее правого соседа». Пересохранение, сжатие и другой размер
+    # меняют единицы бит из 64, другой человек — около половины.
+    # JPEG декодируется сразу в 1/8 размера (IMREAD_REDUCED_GRAYSCALE_8),
+    # это в разы быстрее полного декодирования.
+
+    DUPLICATE_BITS = 6   # до стольких различающихся бит — «похожие»
+
+    @staticmethod
+    def dhash(file_bytes: bytes) -> int | None:
+        """64-битный перцептивный хэш; None — не изображение"""
+        import cv2
+        import numpy as np
+
+        try:
+            gray = cv2.imdecode(np.frombuffer(file_bytes, dtype=np.uint8),
+                                cv2.IMREAD_REDUCED_GRAYSCALE_8)
+            if gray is None:
+                pil = Image.open(io.BytesIO(file_bytes))
+                pil.draft("L", (72, 64))
+                gray = np.asarray(pil.convert("L"))
+            small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        except Exception:
+            return None
+        bits = np.packbits(small[:, 1:] > small[:, :-1])
+        return int.from_bytes(bits.tobytes(), "big")
+
+    @staticmethod
+    def group_duplicates(hashes: list[int | None], max_bits: int | None = None) -> list[int]:
+        """
+        Для каждого фото — индекс первого похожего на него (или свой).
+        Попарные расстояния Хэмминга считаются numpy блоками по 256 строк.
+        """
+        import numpy as np
+
+        max_bits = PhotoUtils.DUPLICATE_BITS if max_bits is None else max_bits
+        leaders = list(range(len(hashes)))
+        known = [i for i, h in enumerate(hashes) if h is not None]
+        if len(known) < 2:
+            return leaders
+
+        h = np.array([hashes[i] for i in known], dtype=np.uint64)
+        popcount = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint8)
+        for start in range(0, len(h), 256):
+            block = h[start:start + 256, None] ^ h[None, :]
+            dist = popcount[block.view(np.uint8)].reshape(len(block), len(h), 8).sum(axis=2)
+            for a, row in enumerate(dist):
+                i = start + a
+                if leaders[known[i]] != known[i]:
+                    continue
+                for j in np.nonzero(row[i + 1:] <= max_bits)[0] + i + 1:
+                    if leaders[known[j]] == known[j]:
+                        leaders[known[j]] = known[i]
+        return leaders
+
+    @staticmethod
+    def _bgr_to_pil(crop) -> Image.Image:
+        """
+        Вырез BGR (вид на декодированный массив, без копии) → RGB Image
+        одним копированием: PIL читает строки с шагом исходного массива
+        и сам переставляет каналы (rawmode «BGR»).
+        """
+        import numpy as np
+
+        h, w = crop.shape[:2]
+        stride = crop.strides[0]
+        if not (h and w) or crop.strides[1:] != (3, 1) or stride < w * 3:
+            import cv2
+            return Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+        # Сам вырез PIL не примет (не C-contiguous) — байтовый вид на него
+        # же, с первого пикселя до последнего: вид numpy не выходит за свой
+        # буфер, а строки между ними — байты того же массива
+        flat = np.lib.stride_tricks.as_strided(
+            crop, shape=(stride * (h - 1) + w * 3,), strides=(1,), writeable=False)
+        return Image.frombuffer("RGB", (w, h), flat, "raw", "BGR", stride, 1)
 
     @staticmethod
     def _crop_face(img, faces):
@@ -0,0 +1,298 @@
+"""
+Предварительная проверка пакета — до рендера, за секунды на тысячи фото.
+
+Каждое фото открывается только по заголовку (PIL читает размер, режим,
+формат и EXIF, не декодируя пиксели), ФИО разбирается так же, как в
+CardRenderer.back. Проверки идут в пуле потоков.
+
+Похожие фото (одно и то же под двумя именами, пересохранённое в другом
+размере) ищутся по перцептивному хэшу PhotoUtils.dhash — для него JPEG
+декодируется в 1/8 размера. report.photo_groups(rows) отдаёт группы
+DocumentBuilder, чтобы фото группы обрабатывалось один раз.
+
+    report = scan(rows, cfg)
+    rows = report.apply(rows, "skip")   # или "fail" — PreflightError
+"""
+
+import csv
+import io
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from PIL import Image, UnidentifiedImageError
+
+from config import PassConfig
+from photo_utils import PhotoUtils
+from roster import RosterRow
+
+# Меньше этого лицо не найдётся, а фото превратится в кашу
+MIN_SIDE_PX = 100
+EXIF_ORIENTATION = 0x0112
+
+# Режимы, которые рендер переводит в RGB без потерь смысла
+_PLAIN_MODES = ("RGB", "L", "RGBA", "P", "LA")
+
+POLICIES = ("report", "skip", "fail")
+
+
+class PreflightError(ValueError):
+    """Проверка нашла ошибки, а сборка запущена с policy="fail" """
+
+
+@dataclass
+class PreflightItem:
+    index: int
+    fio: str
+    source: str = ""
+    width: int = 0
+    height: int = 0
+    mode: str = ""
+    format: str = ""
+    orientation: int = 1
+    phash: int | None = None
+    same_photo: int = -1      # строка (с 0), на фото которой похоже это
+    errors: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+@dataclass
+class PreflightReport:
+    items: list[PreflightItem]
+    elapsed: float = 0.0
+
+    @property
+    def errors(self) -> list[PreflightItem]:
+        return [it for it in self.items if it.errors]
+
+    @property
+    def warnings(self) -> list[PreflightItem]:
+        return [it for it in self.items if it.warnings and not it.errors]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def duplicates(self) -> list[PreflightItem]:
+        return [it for it in self.items if it.same_photo >= 0]
+
+    def photo_groups(self, rows: list[RosterRow], policy: str = "report") -> dict[int, RosterRow]:
+        """
+        id(строки) → строка, чьё фото печатается для всей группы похожих,
+        для DocumentBuilder(photo_groups=...). rows — тот же список, что
+        в scan(); policy — та же, что в apply(): группы только из строк,
+        которые дойдут до сборки. Выброшенная первая строка группы
+        уступает место следующей; группа из одной строки — не группа.
+        """
+        bad = {it.index for it in self.errors} if policy == "skip" else set()
+        members: dict[int, list[int]] = {}
+        for it in self.items:
+            if it.index not in bad:
+                leader = it.same_photo if it.same_photo >= 0 else it.index
+                members.setdefault(leader, []).append(it.index)
+        return {
+            id(rows[i]): rows[group[0]]
+            for group in members.values() if len(group) > 1
+            for i in group
+        }
+
+    def apply(self, rows: list[RosterRow], policy: str = "skip") -> list[RosterRow]:
+        """
+        report — строки не меняются; skip — строки с ошибками выбрасываются;
+        fail — PreflightError при первой же ошибке в отчёте.
+        rows — тот же список, что передавался в scan().
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"policy: ожидается одно из {POLICIES}")
+        if policy == "fail" and self.errors:
+            first = self.errors[0]
+            raise PreflightError(
+                f"{len(self.errors)} строк с ошибками, первая — "
+                f"«{first.fio}»: {'; '.join(first.errors)}"
+            )
+        if policy == "skip":
+            bad = {it.index for it in self.errors}
+            return [row for i, row in enumerate(rows) if i not in bad]
+        return rows
+
+    def lines(self, limit: int = 20) -> list[str]:
+        out = [
+            f"Проверено {len(self.items)} за {self.elapsed:.2f} с: "
+            f"ошибок {len(self.errors)}, предупреждений {len(self.warnings)}"
+        ]
+        problems = self.errors + self.warnings
+        for it in problems[:limit]:
+            mark = "❌" if it.errors else "⚠️"
+            out.append(f"{mark} {it.fio or it.source}: {'; '.join(it.errors + it.warnings)}")
+        if len(problems) > limit:
+            out.append(f"… и ещё {len(problems) - limit}")
+        return out
+
+    def to_csv(self) -> bytes:
+        buf = io.StringIO()
+        w = csv.writer(buf, delimiter=";")
+        w.writerow(["№", "ФИО", "Файл", "Ширина", "Высота", "Режим", "Формат",
+                    "EXIF-поворот", "Похоже на строку", "Ошибки", "Предупреждения"])
+        for it in self.items:
+            w.writerow([it.index + 1, it.fio, it.source, it.width, it.height,
+                        it.mode, it.format, it.orientation,
+                        it.same_photo + 1 if it.same_photo >= 0 else "",
+                        "; ".join(it.errors), "; ".join(it.warnings)])
+        return buf.getvalue().encode("utf-8-sig")
+
+
+# ═══════════════════════════════════════════════════
+#  ПРОВЕРКА
+# ═══════════════════════════════════════════════════
+
+def scan(
+    rows: list[RosterRow],
+    cfg: PassConfig | None = None,
+    workers: int | None = None,
+    duplicates: bool = True,
+) -> PreflightReport:
+    """
+    Проверяет все строки параллельно; порядок отчёта = порядок rows.
+    duplicates=False — без поиска похожих фото (только заголовки).
+    """
+    cfg = cfg or PassConfig()
+    min_w, min_h = photo_frame_px(cfg)
+    workers = workers or min(32, (os.cpu_count() or 2) * 4)
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(workers, thread_name_prefix="preflight") as pool:
+        items = list(pool.map(
+            lambda pair: check_row(pair[0], pair[1], min_w, min_h, duplicates),
+            enumerate(rows),
+        ))
+
+    # Дубликаты видны только по всему пакету
+    seen: dict[str, int] = {}
+    for it in items:
+        key = " ".join(it.fio.lower().split())
+        if key and key in seen:
+            it.warnings.append(f"ФИО повторяется (строка {seen[key] + 1})")
+        seen.setdefault(key, it.index)
+
+    if duplicates:
+        leaders = PhotoUtils.group_duplicates([it.phash for it in items])
+        for it, leader in zip(items, leaders):
+            if leader != it.index:
+                it.same_photo = leader
+                it.warnings.append(f"похоже на фото строки {leader + 1} «{items[leader].fio}»")
+
+    return PreflightReport(items, time.perf_counter() - start)
+
+
+def check_row(index: int, row: RosterRow, min_w: int = 0, min_h: int = 0,
+              phash: bool = False) -> PreflightItem:
+    it = PreflightItem(index, row.fio, row.photo_path or row.fio)
+    check_fio(row.fio, it)
+    try:
+        probe = probe_photo(row)
+    except FileNotFoundError:
+        it.errors.append("нет фото")
+        return it
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        it.errors.append(f"не читается как изображение ({e.__class__.__name__})")
+        return it
+    except Exception as e:
+        it.errors.append(f"нет фото ({e})")
+        return it
+
+    it.width, it.height, it.mode, it.format, it.orientation, truncated = probe
+    if truncated:
+        it.errors.append("файл обрезан (нет конца JPEG)")
+
+    # EXIF-поворот на 90° меняет местами стороны
+    w, h = (it.height, it.width) if it.orientation in (5, 6, 7, 8) else (it.width, it.height)
+    if min(w, h) < MIN_SIDE_PX:
+        it.errors.append(f"слишком маленькое фото {w}×{h}")
+    elif w < min_w or h < min_h:
+        it.warnings.append(f"фото {w}×{h} меньше рамки {min_w}×{min_h} — будет растянуто")
+
+    if it.mode == "CMYK":
+        it.warnings.append("CMYK — цвета могут исказиться")
+    elif it.mode not in _PLAIN_MODES:
+        it.warnings.append(f"необычный режим {it.mode}")
+
+    if phash and not it.errors:
+        try:
+            it.phash = PhotoUtils.dhash(row.read_photo())
+        except Exception:
+            pass
+    return it
+
+
+def check_fio(fio: str, it: PreflightItem):
+    parts = fio.split()
+    if not parts:
+        it.errors.append("пустое ФИО")
+        return
+    if len(parts) < 3:
+        missing = ("имя", "отчество")[len(parts) - 1:]
+        it.warnings.append(f"в ФИО {len(parts)} из 3 частей — пустое поле: {', '.join(missing)}")
+    if re.search(r"\d|_", fio):
+        it.warnings.append("в ФИО цифры или «_» — похоже на имя файла камеры")
+
+
+def probe_photo(row: RosterRow) -> tuple[int, int, str, str, int, bool]:
+    """
+    (ширина, высота, режим, формат, EXIF-поворот, обрезан) без декодирования.
+    Файл с диска или запись ZIP читается потоком, только заголовок;
+    конец файла проверяется там, где перемотка ничего не стоит.
+    """
+    if row.photo_bytes is None and row.loader is None and not row.photo_path:
+        raise FileNotFoundError(row.fio)
+    with row.open_photo() as f:
+        return _probe(f, tail=isinstance(f, (io.BufferedReader, io.BytesIO)))
+
+
+def photo_frame_px(cfg: PassConfig) -> tuple[int, int]:
+    """Размер рамки фото на лицевой стороне — из CardRenderer._photo_box"""
+    from card_renderer import CardRenderer
+    return CardRenderer(cfg)._photo_box(0)[2]
+
+
+# ── Приватные ──────────────────────────────────────
+
+def _probe(f, tail: bool = True) -> tuple[int, int, str, str, int, bool]:
+    with Image.open(f) as img:
+        width, height = img.size
+        mode, fmt = img.mode, img.format or ""
+        orientation = _orientation(img)
+    truncated = tail and fmt == "JPEG" and not _has_eoi(f)
+    return width, height, mode, fmt, orientation, truncated
+
+
+def _orientation(img) -> int:
+    """
+    EXIF-поворот из заголовка. У PNG getexif() декодирует всё изображение
+    в поисках eXIf после данных — берём только то, что уже прочитано.
+    """
+    try:
+        if img.format == "JPEG":
+            exif = img.getexif()
+        else:
+            exif = Image.Exif()
+            raw = img.info.get("exif")
+            if raw:
+                exif.load(raw)
+        return int(exif.get(EXIF_ORIENTATION, 1))
+    except Exception:
+        return 1
+
+
+def _has_eoi(f) -> bool:
+    """JPEG заканчивается маркером FFD9 (после него бывают нули-заполнители)"""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(max(0, size - 64))
+    return b"\xff\xd9" in f.read()
@@ -0,0 +1,461 @@
+"""
+Проверка попиксельной эквивалентности быстрых путей рендера эталонному.
+
+Любое ускорение CardRenderer, DrawingUtils или PhotoUtils может незаметно
+сдвинуть вёрстку, которую ФИКСы выверяли вручную. Проверка рендерит
+фиксированный набор карточек (фото из image/, длинные и короткие названия
+организации, длинное ФИО, несколько PassConfig) эталонным путём и каждым
+быстрым путём и сравнивает пиксели.
+
+    python render_check.py                        # все пути, код 1 при расхождении
+    python render_check.py --diff check_diff/     # картинки различий
+    python render_check.py --save-golden golden/  # снять эталон с текущего дерева
+    python render_check.py --golden golden/       # сравнить эталон с ранее снятым
+
+Эталонный путь — свежий CardRenderer с очищенными кэшами шрифтов,
+градиента и каскада, как при холодном старте. Быстрый путь добавляется
+через register(); у каждого свой допуск (по умолчанию — точное совпадение).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from typing import Callable
+
+from PIL import Image
+
+from config import PassConfig
+
+LONG_ORG = ("Государственное учреждение образования «Областной "
+            "профессионально-технический колледж строительства и транспорта»")
+LONG_FIO = "Константинопольская-Мамина-Сибирячка Александра-Мария Вильгельмовна"
+
+
+@dataclass
+class Case:
+    name: str
+    cfg: PassConfig
+    fio: str
+    photo_path: str
+    logo_path: str = ""
+    series: str = ""
+    number: str = ""
+    date_start: str = ""
+    date_end: str = ""
+
+    def photo_bytes(self) -> bytes:
+        with open(self.photo_path, "rb") as f:
+            return f.read()
+
+    def logo(self) -> Image.Image | None:
+        if not self.logo_path:
+            return None
+        return Image.open(self.logo_path).convert("RGBA")
+
+    def front_kwargs(self) -> dict:
+        """Только заданные поля — эталон можно снять и со старого дерева"""
+        kw = {"series": self.series, "number": self.number, "date_end": self.date_end}
+        return {k: v for k, v in kw.items() if v}
+
+
+@dataclass
+class FastPath:
+    name: str
+    render: Callable[[Case], tuple[Image.Image, Image.Image]]
+    tol: int = 0            # допустимая разница канала, 0..255
+    max_share: float = 0.0  # доля пикселей, где разница больше tol
+    available: Callable[[], str] = lambda: ""   # непусто — почему пропущен
+
+
+@dataclass
+class Mismatch:
+    case: str
+    path: str
+    side: str
+    max_diff: int
+    share: float
+    note: str = ""
+
+
+@dataclass
+class CheckResult:
+    cases: int = 0
+    compared: int = 0
+    skipped: dict[str, str] = field(default_factory=dict)
+    mismatches: list[Mismatch] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches
+
+    def lines(self) -> list[str]:
+        out = [f"Карточек: {self.cases}, сравнений: {self.compared}, "
+               f"расхождений: {len(self.mismatches)} за {self.seconds:.1f} с"]
+        for name, why in self.skipped.items():
+            out.append(f"⏭️ {name}: пропущен ({why})")
+        for m in self.mismatches:
+            out.append(
+                f"❌ {m.path} / {m.case} / {m.side}: макс. разница {m.max_diff}, "
+                f"отличается {m.share:.4%} пикселей{(' — ' + m.note) if m.note else ''}"
+            )
+        return out
+
+
+PATHS: dict[str, FastPath] = {}
+
+
+def register(name: str, render, tol: int = 0, max_share: float = 0.0,
+             available=lambda: ""):
+    """Добавляет быстрый путь: render(case) → (лицевая, оборотная)"""
+    PATHS[name] = FastPath(name, render, tol, max_share, available)
+
+
+# ═══════════════════════════════════════════════════
+#  НАБОР КАРТОЧЕК
+# ═══════════════════════════════════════════════════
+
+def corpus(photo_dir: str = "image", logo_path: str | None = None) -> list[Case]:
+    base = PassConfig()
+    logo_path = logo_path if logo_path is not None else _find_logo(base, photo_dir)
+    photos = sorted(
+        os.path.join(photo_dir, f) for f in os.listdir(photo_dir)
+        if not f.startswith(".") and f != base.default_logo
+        and os.path.splitext(f)[1].lower() in (".png", ".jpg", ".jpeg")
+    )
+    if not photos:
+        raise FileNotFoundError(f"в {photo_dir} нет фото")
+
+    cases = [
+        Case(f"фото {i + 1}", base, os.path.splitext(os.path.basename(p))[0], p, logo_path)
+        for i, p in enumerate(photos)
+    ]
+    first = photos[0]
+    cases += [
+        Case("длинное ФИО", base, LONG_FIO, first, logo_path),
+        Case("ФИО из двух слов", base, "Иванов Иван", first),
+        Case("длинная организация", replace(base, org_name=LONG_ORG), "Петров Пётр Петрович", first),
+        Case("короткая организация", replace(base, org_name="ООО «Щит»"), "Петров Пётр Петрович", first),
+        Case("серия и даты", base, "Петров Пётр Петрович", first, logo_path,
+             series="АБ", number="123456", date_start="01.02.2026", date_end="01.02.2031"),
+        Case("ID-1 на 200 dpi", replace(base, card_w=8.56, card_h=5.4, dpi=200),
+             "Сидорова Анна Сергеевна", first, logo_path),
+        Case("другие цвета", replace(base, primary_color="#1B5E20", accent_color="#FF6F00",
+                                     gradient_start="#66BB6A", gradient_end="#1B5E20"),
+             "Сидорова Анна Сергеевна", first, logo_path),
+    ]
+    return cases
+
+
+def _find_logo(cfg: PassConfig, photo_dir: str) -> str:
+    for path in (cfg.default_logo_path(), os.path.join(photo_dir, cfg.default_logo)):
+        if os.path.exists(path):
+            return path
+    return ""
+
+
+# ═══════════════════════════════════════════════════
+#  ЭТАЛОН И БЫСТРЫЕ ПУТИ
+# ═══════════════════════════════════════════════════
+
+def reference(case: Case) -> tuple[Image.Image, Image.Image]:
+    """Холодный рендер: кэши шрифтов, градиента и каскада сброшены"""
+    from card_renderer import CardRenderer
+    from photo_utils import PhotoUtils
+
+    _clear_caches()
+    renderer = CardRenderer(case.cfg)
+    renderer.use_atlas = False   # текст — напрямую через FreeType
+    renderer.fused_photo = False  # фото — через промежуточные холсты
+    photo = PhotoUtils.process_upload(case.photo_bytes(), case.fio)
+    front = renderer.front(photo, case.logo(), **case.front_kwargs())
+    back = renderer.back(case.fio, case.date_start) if case.date_start else renderer.back(case.fio)
+    return front, back
+
+
+def _clear_caches():
+    from drawing_utils import DrawingUtils
+    from photo_utils import PhotoUtils
+
+    for name in ("_fonts_for_dir", "_load_font", "create_gradient"):
+        fn = getattr(DrawingUtils, name, None)
+        if hasattr(fn, "cache_clear"):
+            fn.cache_clear()
+    pool = getattr(PhotoUtils, "_cascade_pool", None)
+    if pool is not None:
+        pool.clear()
+
+
+def _warm(case: Case):
+    """Рендерер из реестра на кэшах, которые заполнил эталонный рендер"""
+    from photo_utils import PhotoUtils
+    from render_pool import renderer_for
+
+    renderer = renderer_for(case.cfg)
+    photo = PhotoUtils.process_upload(case.photo_bytes(), case.fio)
+    front = renderer.front(photo, case.logo(), case.series, case.number, case.date_end)
+    return front, renderer.back(case.fio, case.date_start)
+
+
+def _atlas(case: Case):
+    """Текст оборота из атласа глифов, атлас строится с нуля"""
+    from card_renderer import CardRenderer
+    from glyph_atlas import _atlas as atlas_cache
+    from photo_utils import PhotoUtils
+
+    atlas_cache.cache_clear()
+    renderer = CardRenderer(case.cfg)
+    renderer.use_atlas = True
+    photo = PhotoUtils.process_upload(case.photo_bytes(), case.fio)
+    front = renderer.front(photo, case.logo(), case.series, case.number, case.date_end)
+    return front, renderer.back(case.fio, case.date_start)
+
+
+def _pooled(case: Case):
+    """Через DocumentBuilder.cards и общий пул — карточки рендерятся параллельно"""
+    from document_builder import DocumentBuilder
+    from render_pool import renderer_for
+    from roster import RosterRow
+
+    row = RosterRow(case.fio, photo_path=case.photo_path, series=case.series,
+                    number=case.number, date_start=case.date_start,
+                    date_end=case.date_end)
+    logo = None
+    if case.logo_path:
+        with open(case.logo_path, "rb") as f:
+            logo = f.read()
+    builder = DocumentBuilder(case.cfg, submit=_scheduler().for_session("check"),
+                              renderer=renderer_for(case.cfg))
+    # Вторая копия той же карточки рендерится одновременно в другом потоке
+    cards = list(builder.cards([row] * 2, logo))
+    return cards[-1][1], cards[-1][2]
+
+
+_scheduler_instance = None
+
+
+def _scheduler():
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        from render_pool import FairScheduler
+        _scheduler_instance = FairScheduler(4)
+    return _scheduler_instance
+
+
+def _svg(case: Case):
+    """SVG, растеризованный cairosvg. Текст растрируется иначе — допуск шире"""
+    import io
+    import cairosvg
+    from photo_utils import PhotoUtils
+    from svg_renderer import SvgCardRenderer
+
+    renderer = SvgCardRenderer(case.cfg, embed_fonts=True)
+    photo = PhotoUtils.process_upload(case.photo_bytes(), case.fio)
+    sides = (renderer.front(photo, case.logo(), case.series, case.number, case.date_end),
+             renderer.back(case.fio, case.date_start))
+    return tuple(
+        Image.open(io.BytesIO(cairosvg.svg2png(bytestring=s.encode("utf-8")))).convert("RGB")
+        for s in sides
+    )
+
+
+def _has_cairosvg() -> str:
+    try:
+        import cairosvg  # noqa: F401
+        return ""
+    except (ImportError, OSError):
+        return "нет cairosvg"
+
+
+register("warm", _warm)
+register("atlas", _atlas)
+register("pool", _pooled)
+register("svg", _svg, tol=48, max_share=0.03, available=_has_cairosvg)
+
+
+# ═══════════════════════════════════════════════════
+#  СРАВНЕНИЕ
+# ═══════════════════════════════════════════════════
+
+def alloc_lines(cases: list[Case]) -> list[str]:
+    """
+    Выделения на одну лицевую сторону (фото из байтов → карточка):
+    прежний путь фото (холсты framed_photo) и вставка прямо в карточку.
+    """
+    from card_renderer import CardRenderer
+    from memory_budget import count_allocations
+    from photo_utils import PhotoUtils
+
+    out = []
+    for fused in (False, True):
+        total, peak = None, 0
+        for case in cases:
+            renderer = CardRenderer(case.cfg)
+            renderer.fused_photo = fused
+            data, kw = case.photo_bytes(), case.front_kwargs()
+            # Без логотипа: его выделения от пути фото не зависят и заслоняют разницу
+            renderer.front(PhotoUtils.process_upload(data, case.fio), **kw)   # прогрев
+            with count_allocations() as st:
+                renderer.front(PhotoUtils.process_upload(data, case.fio), **kw)
+            if total is None:
+                total = st
+            else:
+                total.pil_images += st.pil_images
+                total.pil_bytes += st.pil_bytes
+            peak = max(peak, st.traced_peak)
+        avg = total.per(len(cases))
+        avg.traced_peak = peak
+        out.append(f"{'вставка в карточку' if fused else 'прежний путь'}: {avg.line()}")
+    return out
+
+
+def compare(ref: Image.Image, img: Image.Image, tol: int = 0):
+    """(макс. разница канала, доля пикселей с разницей > tol, карта различий)"""
+    import numpy as np
+
+    if ref.size != img.size:
+        return 255, 1.0, None
+    a = np.asarray(ref.convert("RGB"), dtype=np.int16)
+    b = np.asarray(img.convert("RGB"), dtype=np.int16)
+    diff = np.abs(a - b).max(axis=2)
+    return int(diff.max()), float((diff > tol).mean()), diff
+
+
+def diff_image(ref: Image.Image, img: Image.Image, diff) -> Image.Image:
+    """Эталон | быстрый путь | различия (красным, усилены)"""
+    import numpy as np
+
+    w, h = ref.size
+    out = Image.new("RGB", (w * 3, h), "white")
+    out.paste(ref.convert("RGB"), (0, 0))
+    out.paste(img.convert("RGB").resize(ref.size), (w, 0))
+    if diff is not None:
+        mask = np.clip(diff.astype(np.int32) * 8, 0, 255).astype(np.uint8)
+        red = Image.new("RGB", (w, h), "red")
+        gray = ref.convert("L").convert("RGB")
+        out.paste(Image.composite(red, gray, Image.fromarray(mask)), (w * 2, 0))
+    return out
+
+
+def run(
+    cases: list[Case],
+    paths: list[str] | None = None,
+    diff_dir: str | None = None,
+    golden_dir: str | None = None,
+) -> CheckResult:
+    """Сравнивает каждый путь с эталоном (и эталон с golden_dir, если задан)"""
+    start = time.perf_counter()
+    result = CheckResult(cases=len(cases))
+    selected = [PATHS[name] for name in (paths or PATHS)]
+    active = []
+    for path in selected:
+        why = path.available()
+        if why:
+            result.skipped[path.name] = why
+        else:
+            active.append(path)
+    golden = _load_golden(golden_dir) if golden_dir else None
+
+    for case in cases:
+        ref = reference(case)
+        if golden is not None:
+            stored = golden.get(case.name)
+            if stored is None:
+                result.skipped[f"эталон «{case.name}»"] = "нет в golden"
+            else:
+                _check(result, case, "golden", ref, stored, 0, 0.0, diff_dir, reverse=True)
+        for path in active:
+            try:
+                fast = path.render(case)
+            except Exception as e:
+                result.mismatches.append(Mismatch(case.name, path.name, "обе", 255, 1.0,
+                                                  f"ошибка {e.__class__.__name__}: {e}"))
+                continue
+            _check(result, case, path.name, ref, fast, path.tol, path.max_share, diff_dir)
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _check(result, case, path_name, ref, other, tol, max_share, diff_dir, reverse=False):
+    for side, a, b in zip(("front", "back"), ref, other):
+        if reverse:
+            a, b = b, a
+        result.compared += 1
+        max_diff, share, diff = compare(a, b, tol)
+        if share > max_share:
+            result.mismatches.append(Mismatch(case.name, path_name, side, max_diff, share))
+            if diff_dir:
+                os.makedirs(diff_dir, exist_ok=True)
+                diff_image(a, b, diff).save(
+                    os.path.join(diff_dir, f"{path_name}_{case.name}_{side}.png")
+                )
+
+
+# ── Эталон на диске ────────────────────────────────
+
+def save_golden(cases: list[Case], folder: str):
+    os.makedirs(folder, exist_ok=True)
+    index = {}
+    for i, case in enumerate(cases):
+        front, back = reference(case)
+        names = [f"{i:03d}_front.png", f"{i:03d}_back.png"]
+        front.save(os.path.join(folder, names[0]))
+        back.save(os.path.join(folder, names[1]))
+        index[case.name] = names
+    with open(os.path.join(folder, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+
+
+def _load_golden(folder: str) -> dict:
+    with open(os.path.join(folder, "index.json"), encoding="utf-8") as f:
+        index = json.load(f)
+    return {
+        name: tuple(Image.open(os.path.join(folder, n)).convert("RGB") for n in names)
+        for name, names in index.items()
+    }
+
+
+# ═══════════════════════════════════════════════════
+#  ЗАПУСК
+# ═══════════════════════════════════════════════════
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description="Попиксельная проверка быстрых путей рендера")
+    p.add_argument("--images", default="image", help="папка с фото для набора")
+    p.add_argument("--paths", nargs="*", choices=sorted(PATHS),
+                   help="какие пути проверять (по умолчанию все)")
+    p.add_argument("--cases", help="только карточки, в имени которых есть эта строка")
+    p.add_argument("--diff", metavar="ПАПКА", help="сохранить картинки различий")
+    p.add_argument("--golden", metavar="ПАПКА", help="сравнить эталон с сохранённым")
+    p.add_argument("--save-golden", metavar="ПАПКА", help="сохранить эталон и выйти")
+    p.add_argument("--alloc", action="store_true",
+                   help="выделения памяти на лицевую сторону: прежний и быстрый путь фото")
+    args = p.parse_args(argv)
+
+    cases = corpus(args.images)
+    if args.cases:
+        cases = [c for c in cases if args.cases in c.name]
+
+    if args.alloc:
+        for line in alloc_lines(cases):
+            print(f"  {line}")
+        return 0
+
+    if args.save_golden:
+        save_golden(cases, args.save_golden)
+        print(f"💾 Эталон {len(cases)} карточек сохранён в {args.save_golden}")
+        return 0
+
+    result = run(cases, args.paths, args.diff, args.golden)
+    for line in result.lines():
+        print(f"  {line}")
+    print("✅ Совпадает" if result.ok else "❌ Есть расхождения")
+    return 0 if result.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
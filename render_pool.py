@@ -0,0 +1,129 @@
+"""
+Общие на процесс ресурсы рендера — для всех сессий Streamlit и сервиса.
+
+renderer_for(cfg)   готовый CardRenderer по отпечатку настроек: шрифты и
+                    шаблоны не загружаются заново на каждый rerun.
+FairScheduler       постоянный пул потоков с очередью на каждую сессию.
+                    Задачи берутся по кругу из очередей сессий, поэтому
+                    сборка на 1000 карточек (1000 задач) не задерживает
+                    превью соседа (8 задач) — они чередуются.
+"""
+
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from config import PassConfig
+
+MAX_RENDERERS = 8
+
+_renderers: "OrderedDict[tuple, object]" = OrderedDict()
+_renderers_lock = threading.Lock()
+
+
+def renderer_for(cfg: PassConfig, kind: str = "png"):
+    """CardRenderer (kind="png") или SvgCardRenderer (kind="svg") из реестра"""
+    key = (kind, cfg.fingerprint())
+    with _renderers_lock:
+        renderer = _renderers.get(key)
+        if renderer is not None:
+            _renderers.move_to_end(key)
+            return renderer
+
+    # Создание — вне блокировки: шрифты могут грузиться с диска
+    if kind == "svg":
+        from svg_renderer import SvgCardRenderer
+        renderer = SvgCardRenderer(cfg)
+    else:
+        from card_renderer import CardRenderer
+        renderer = CardRenderer(cfg)
+
+    with _renderers_lock:
+        renderer = _renderers.setdefault(key, renderer)
+        _renderers.move_to_end(key)
+        while len(_renderers) > MAX_RENDERERS:
+            _renderers.popitem(last=False)
+    return renderer
+
+
+class FairScheduler:
+    """Пул потоков с круговым обходом очередей сессий"""
+
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or max(1, os.cpu_count() or 2)
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._cv = threading.Condition()
+        self._running = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"pass-render-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, session: str, fn, *args, **kwargs) -> Future:
+        fut = Future()
+        with self._cv:
+            if self._closed:
+                raise RuntimeError("планировщик остановлен")
+            self._queues.setdefault(session, deque()).append((fut, fn, args, kwargs))
+            self._cv.notify()
+        return fut
+
+    def for_session(self, session: str):
+        """submit(fn, *args) для одной сессии — так его ждёт DocumentBuilder"""
+        return lambda fn, *args, **kwargs: self.submit(session, fn, *args, **kwargs)
+
+    def cancel(self, session: str) -> int:
+        """Снимает невыполненные задачи сессии (сессия закрыта / перезапуск)"""
+        with self._cv:
+            queue = self._queues.pop(session, deque())
+        for fut, *_ in queue:
+            fut.cancel()
+        return len(queue)
+
+    def stats(self) -> dict:
+        with self._cv:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": {s: len(q) for s, q in self._queues.items()},
+            }
+
+    def shutdown(self):
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+
+    # ── Приватные ──────────────────────────────────
+
+    def _next(self):
+        """Первая сессия в очереди отдаёт одну задачу и уходит в конец"""
+        session, queue = next(iter(self._queues.items()))
+        item = queue.popleft()
+        if queue:
+            self._queues.move_to_end(session)
+        else:
+            del self._queues[session]
+        return item
+
+    def _work(self):
+        while True:
+            with self._cv:
+                while not self._queues and not self._closed:
+                    self._cv.wait()
+                if self._closed and not self._queues:
+                    return
+                fut, fn, args, kwargs = self._next()
+                self._running += 1
+            try:
+                if fut.set_running_or_notify_cancel():
+                    try:
+                        fut.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        fut.set_exception(e)
+            finally:
+                with self._cv:
+                    self._running -= 1
@@ -0,0 +1,219 @@
+"""Реестр сотрудников — построчное чтение CSV/XLSX и папок с фото"""
+
+import codecs
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+PHOTO_EXT = (".jpg", ".jpeg", ".png")
+
+# Допустимые заголовки колонок (сравнение без регистра и пробелов по краям)
+COLUMNS = {
+    "fio": ("фио", "ф.и.о.", "сотрудник", "fio", "name"),
+    "series": ("серия", "series"),
+    "number": ("номер", "№", "number"),
+    "date_start": ("дата оформления", "дата выдачи", "date_start", "issue_date"),
+    "date_end": ("дата окончания", "действителен до", "date_end", "expiry_date"),
+    "photo_path": ("фото", "файл фото", "photo", "photo_path"),
+}
+
+
+@dataclass
+class RosterRow:
+    """Одна строка реестра = один пропуск.
+
+    Пустые series/number/даты — берутся плейсхолдеры и даты из PassConfig.
+    Фото не хранится в строке: оно читается в read_photo() в момент рендера.
+    """
+
+    fio: str
+    photo_path: str = ""
+    series: str = ""
+    number: str = ""
+    date_start: str = ""
+    date_end: str = ""
+    photo_bytes: bytes | None = field(default=None, repr=False)
+    loader: Callable[[], bytes] | None = field(default=None, repr=False, compare=False)
+
+    def read_photo(self) -> bytes:
+        if self.photo_bytes is not None:
+            return self.photo_bytes
+        if self.loader is not None:
+            return self.loader()
+        with open(self.photo_path, "rb") as f:
+            return f.read()
+
+    def open_photo(self) -> BinaryIO:
+        """
+        Фото как поток — когда нужен только заголовок. Загрузчик с методом
+        open() (ZipEntry) отдаёт поток без распаковки всего файла.
+        """
+        if self.photo_bytes is not None:
+            return io.BytesIO(self.photo_bytes)
+        if self.loader is not None:
+            opener = getattr(self.loader, "open", None)
+            return opener() if opener else io.BytesIO(self.loader())
+        return open(self.photo_path, "rb")
+
+
+# ═══════════════════════════════════════════════════
+#  ИСТОЧНИКИ СТРОК
+# ═══════════════════════════════════════════════════
+
+def rows_from_photos(photos: dict[str, bytes]) -> Iterator[RosterRow]:
+    """Старый формат {ФИО: байты фото}"""
+    for fio, data in photos.items():
+        yield RosterRow(fio, photo_bytes=data)
+
+
+def rows_from_folder(folder: str, exclude: Iterable[str] = ()) -> Iterator[RosterRow]:
+    """Папка с фото, имя файла = ФИО"""
+    skip = {name.lower() for name in exclude}
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in PHOTO_EXT or name.lower() in skip:
+            continue
+        yield RosterRow(stem, photo_path=os.path.join(folder, name))
+
+
+def iter_roster(source: str | BinaryIO, photo_dir: str = "") -> Iterator[RosterRow]:
+    """
+    Читает реестр CSV/XLSX лениво, по одной строке.
+    source — путь или бинарный поток с атрибутом name (как UploadedFile).
+    Относительные пути к фото ищутся в photo_dir (по умолчанию — рядом
+    с реестром); без колонки фото — файл «<ФИО>.jpg|.jpeg|.png».
+    """
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    if not photo_dir and isinstance(source, str):
+        photo_dir = os.path.dirname(os.path.abspath(source))
+
+    if name.lower().endswith((".xlsx", ".xlsm")):
+        records = _xlsx_records(source)
+    else:
+        records = _csv_records(source)
+
+    header = None
+    for values in records:
+        if header is None:
+            header = _map_header(values)
+            continue
+        row = _make_row(header, values, photo_dir)
+        if row is not None:
+            yield row
+
+
+def match_photos(
+    rows: Iterable[RosterRow],
+    sources: Iterable[tuple[str, Callable[[], bytes]]],
+) -> Iterator[RosterRow]:
+    """
+    Привязывает к строкам реестра фото из загруженных файлов или архива
+    (пары «имя файла, загрузчик») — по имени из колонки фото или по ФИО.
+    Строки без найденного фото отдаются как есть (без загрузчика).
+    """
+    files = {}
+    for name, loader in sources:
+        files[name.lower()] = loader
+        files.setdefault(os.path.splitext(name)[0].lower(), loader)
+
+    for row in rows:
+        key = os.path.basename(row.photo_path).lower()
+        loader = files.get(key) if key else None
+        row.loader = loader or files.get(row.fio.lower())
+        yield row
+
+
+# ── Приватные ──────────────────────────────────────
+
+def _csv_records(source) -> Iterator[list]:
+    raw = open(source, "rb") if isinstance(source, str) else source
+    try:
+        head = raw.read(64 * 1024)
+        raw.seek(0)
+        try:
+            # Инкрементальный декодер: символ, разрезанный границей head,
+            # не считается ошибкой
+            codecs.getincrementaldecoder("utf-8-sig")().decode(head, final=False)
+            encoding = "utf-8-sig"
+        except UnicodeDecodeError:
+            encoding = "cp1251"  # выгрузка из русского Excel
+        try:
+            dialect = csv.Sniffer().sniff(head.decode(encoding, "ignore"), ";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        text = io.TextIOWrapper(raw, encoding=encoding, newline="")
+        try:
+            yield from csv.reader(text, dialect)
+        finally:
+            text.detach()
+    finally:
+        if isinstance(source, str):
+            raw.close()
+
+
+def _xlsx_records(source) -> Iterator[tuple]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise RuntimeError("Для реестров XLSX установите openpyxl") from e
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _map_header(values) -> dict[str, int]:
+    aliases = {a: key for key, names in COLUMNS.items() for a in names}
+    header = {}
+    for i, v in enumerate(values):
+        key = aliases.get(_cell(v).lower())
+        if key and key not in header:
+            header[key] = i
+    if "fio" not in header:
+        raise ValueError("В реестре нет колонки «ФИО»")
+    return header
+
+
+def _make_row(header, values, photo_dir) -> RosterRow | None:
+    def get(key):
+        i = header.get(key)
+        return _cell(values[i]) if i is not None and i < len(values) else ""
+
+    fio = " ".join(get("fio").split())
+    if not fio:
+        return None
+
+    photo = get("photo_path")
+    if photo and not os.path.isabs(photo):
+        photo = os.path.join(photo_dir, photo)
+    if not photo:
+        photo = _find_photo(photo_dir, fio)
+
+    return RosterRow(
+        fio, photo,
+        series=get("series"), number=get("number"),
+        date_start=get("date_start"), date_end=get("date_end"),
+    )
+
+
+def _find_photo(photo_dir, fio) -> str:
+    for ext in PHOTO_EXT:
+        path = os.path.join(photo_dir, fio + ext)
+        if os.path.exists(path):
+            return path
+    return ""
+
+
+def _cell(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, (datetime, date)):
+        return v.strftime("%d.%m.%Y")
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
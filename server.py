@@ -0,0 +1,432 @@
+"""
+HTTP-сервис генерации пропусков для внутренних систем — только stdlib,
+работает локально, без внешних сервисов.
+
+    python server.py --port 8502 --workers 4 --queue 32
+
+POST /render           JSON карточки → PNG одной стороны
+POST /batch            JSON пакета → 202 {"job": id}; сборка DOCX/PDF в фоне
+GET  /jobs/<id>        статус задания
+GET  /jobs/<id>/result готовый документ
+GET  /health           состояние пула и очереди
+
+Карточка: {"fio", "photo" (base64), "series", "number", "date_start",
+"date_end"}. /render дополнительно принимает "side": "front"|"back".
+Общие поля: "config" (поля PassConfig), "logo" (base64, иначе логотип
+по умолчанию), для /batch — "format": "docx"|"pdf" и "cards": [...].
+
+Рендер идёт в постоянном пуле прогретых процессов. Запросов в работе
+и в очереди не больше --queue; сверх этого — 429 Too Many Requests
+(и когда журнал заданий занят незавершёнными). Если процесс пула упал,
+пул пересоздаётся, а запрос получает 503 — его можно повторить.
+"""
+
+import argparse
+import base64
+import io
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import PassConfig
+
+# Пути на сервере клиент задавать не может
+_PRIVATE_FIELDS = ("font_dir", "assets_dir", "default_logo")
+
+FORMATS = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+
+# ═══════════════════════════════════════════════════
+#  ВОРКЕРЫ (выполняются в дочерних процессах)
+# ═══════════════════════════════════════════════════
+
+def _init_worker():
+    from warmup import warm_up
+    warm_up()
+
+
+def _renderer(cfg: PassConfig):
+    """Рендерер процесса-воркера — из общего реестра render_pool"""
+    from render_pool import renderer_for
+    return renderer_for(cfg)
+
+
+def _logo_pil(logo_bytes):
+    from PIL import Image
+    if not logo_bytes:
+        return None
+    return Image.open(io.BytesIO(logo_bytes)).convert("RGBA")
+
+
+def render_card(cfg: PassConfig, row, side: str, logo_bytes) -> bytes:
+    from PIL import Image
+
+    from photo_utils import PhotoUtils
+
+    renderer = _renderer(cfg)
+    if side == "back":
+        img = renderer.back(row.fio, row.date_start)
+    else:
+        # Нечитаемое фото или логотип — ошибка клиента (400), не воркера
+        try:
+            photo = PhotoUtils.process_upload(row.read_photo(), row.fio)
+            logo = _logo_pil(logo_bytes)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            raise ValueError(f"image is not readable: {e}") from None
+        img = renderer.front(photo, logo, row.series, row.number, row.date_end)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def build_batch(cfg: PassConfig, rows, fmt: str, logo_bytes, path: str) -> int:
+    from document_builder import DocumentBuilder
+    from pdf_builder import PdfBuilder
+
+    builder_cls = PdfBuilder if fmt == "pdf" else DocumentBuilder
+    builder = builder_cls(cfg, renderer=_renderer(cfg))
+    return builder.build_rows(rows, logo_bytes, path)
+
+
+# ═══════════════════════════════════════════════════
+#  СЕРВИС
+# ═══════════════════════════════════════════════════
+
+class PassService:
+    """Пул процессов + ограниченная очередь + журнал заданий"""
+
+    MAX_JOBS = 200
+
+    def __init__(self, workers: int, queue: int, jobs_dir: str | None = None):
+        self.workers = workers
+        self.capacity = queue
+        self._slots = threading.BoundedSemaphore(queue)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._broken = False
+        self.pool = self._new_pool()
+        self.jobs: dict[str, dict] = {}
+        self._tmp = None
+        if jobs_dir is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="pass_jobs_")
+            jobs_dir = self._tmp.name
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        ctx = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(self.workers, mp_context=ctx,
+                                   initializer=_init_worker)
+        # Пустая задача поднимает и прогревает все процессы сразу
+        for _ in range(self.workers):
+            pool.submit(time.sleep, 0)
+        return pool
+
+    def submit(self, fn, *args):
+        """
+        Future или None, если очередь заполнена. BrokenProcessPool — пул
+        сломан (умер процесс): он уже пересоздаётся, запрос можно повторить.
+        """
+        self.heal()
+        if not self._slots.acquire(blocking=False):
+            return None
+        with self._lock:
+            self._in_flight += 1
+            pool = self.pool
+        try:
+            fut = pool.submit(fn, *args)
+        except BaseException as e:
+            self._release(pool, None)
+            if isinstance(e, BrokenProcessPool):
+                self._mark_broken(pool)
+                self.heal()
+            raise
+        fut.add_done_callback(lambda f: self._release(pool, f))
+        return fut
+
+    def _release(self, pool, fut):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        if fut is not None and not fut.cancelled() \
+                and isinstance(fut.exception(), BrokenProcessPool):
+            self._mark_broken(pool)
+
+    def _mark_broken(self, pool):
+        with self._lock:
+            # Старый пул, уже заменённый, второй раз не пересоздаётся
+            if pool is self.pool:
+                self._broken = True
+
+    def heal(self):
+        """
+        Сломанный пул — заменить новым, прогретым. Пересоздание — в потоке
+        запроса, не в колбэке future (тот выполняется в потоке самого пула).
+        """
+        with self._lock:
+            if not self._broken:
+                return
+            broken, self.pool, self._broken = self.pool, self._new_pool(), False
+        print("  ♻️ Процесс рендера упал — пул пересоздан")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def start_job(self, cfg, rows, fmt, logo_bytes) -> str | None:
+        """id задания или None, если очередь или журнал заданий заполнены"""
+        with self._lock:
+            self._trim_jobs()
+            if len(self.jobs) >= self.MAX_JOBS:
+                return None
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.jobs_dir, f"{job_id}.{fmt}")
+        fut = self.submit(build_batch, cfg, rows, fmt, logo_bytes, path)
+        if fut is None:
+            return None
+
+        job = {"id": job_id, "format": fmt, "cards": len(rows),
+               "created": time.time(), "path": path, "future": fut}
+        with self._lock:
+            self.jobs[job_id] = job
+        fut.add_done_callback(lambda _f: job.setdefault("finished", time.time()))
+        return job_id
+
+    def job_status(self, job_id: str) -> dict | None:
+        """Статус выводится из future при каждом запросе, в job не пишется"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        fut = job["future"]
+        out = {k: v for k, v in job.items() if k not in ("path", "future")}
+        if not fut.done():
+            out["status"] = "running" if fut.running() else "queued"
+        elif fut.cancelled():
+            out["status"] = "failed"
+            out["error"] = "cancelled"
+        elif fut.exception() is not None:
+            out["status"] = "failed"
+            out["error"] = str(fut.exception())
+        elif not fut.result():
+            # Ни одной карточки (нет годных фото) — файл не создан
+            out["status"] = "failed"
+            out["error"] = "no cards rendered: no valid photos"
+            out["built"] = 0
+        else:
+            out["status"] = "done"
+            out["built"] = fut.result()
+        return out
+
+    def _trim_jobs(self):
+        """
+        Место под новое задание: вытесняются старейшие ЗАВЕРШЁННЫЕ.
+        Задание в очереди или в работе не трогается — иначе воркер запишет
+        файл, на который уже никто не ссылается, а клиент получит 404.
+        """
+        for job_id in [j for j, job in self.jobs.items() if job["future"].done()]:
+            if len(self.jobs) < self.MAX_JOBS:
+                break
+            old = self.jobs.pop(job_id)
+            if os.path.exists(old["path"]):
+                os.remove(old["path"])
+
+    def health(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "in_flight": self._in_flight,
+                    "capacity": self.capacity, "jobs": len(self.jobs)}
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+        if self._tmp is not None:
+            shutil.rmtree(self._tmp.name, ignore_errors=True)
+
+
+# ═══════════════════════════════════════════════════
+#  HTTP
+# ═══════════════════════════════════════════════════
+
+class Handler(BaseHTTPRequestHandler):
+    service: PassService
+    protocol_version = "HTTP/1.1"
+    RENDER_TIMEOUT = 120
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._json(200, self.service.health())
+        m = re.fullmatch(r"/jobs/([0-9a-f]{32})(/result)?", self.path)
+        if not m:
+            return self._json(404, {"error": "not found"})
+        status = self.service.job_status(m.group(1))
+        if status is None:
+            return self._json(404, {"error": "unknown job"})
+        if not m.group(2):
+            return self._json(200, status)
+        if status["status"] != "done":
+            return self._json(409, {"error": f"job is {status['status']}"})
+        path = self.service.jobs.get(m.group(1), {}).get("path", "")
+        self._file(path, FORMATS[status["format"]], f"propuska.{status['format']}")
+
+    def do_POST(self):
+        try:
+            body = self._body()
+            cfg = _config(body.get("config") or {})
+            logo = _logo(body, cfg)
+        except (ValueError, TypeError) as e:
+            return self._json(400, {"error": str(e)})
+
+        if self.path == "/render":
+            side = "back" if body.get("side") == "back" else "front"
+            try:
+                row = _row(body, require_photo=side == "front")
+            except (ValueError, TypeError) as e:
+                return self._json(400, {"error": str(e)})
+            try:
+                fut = self.service.submit(render_card, cfg, row, side, logo)
+                if fut is None:
+                    return self._busy()
+                png = fut.result(timeout=self.RENDER_TIMEOUT)
+            except BrokenProcessPool:
+                return self._unavailable()
+            except TimeoutError:
+                return self._json(504, {"error": "render timed out"})
+            except ValueError as e:
+                # Битое фото или логотип (render_card сводит их к ValueError)
+                return self._json(400, {"error": str(e)})
+            except Exception as e:
+                return self._json(500, {"error": str(e)})
+            return self._bytes(200, png, "image/png")
+
+        if self.path == "/batch":
+            fmt = body.get("format", "docx")
+            if fmt not in FORMATS:
+                return self._json(400, {"error": f"format must be one of {list(FORMATS)}"})
+            try:
+                rows = [_row(c) for c in body.get("cards") or []]
+            except (ValueError, TypeError) as e:
+                return self._json(400, {"error": str(e)})
+            if not rows:
+                return self._json(400, {"error": "no cards"})
+            try:
+                job_id = self.service.start_job(cfg, rows, fmt, logo)
+            except BrokenProcessPool:
+                return self._unavailable()
+            if job_id is None:
+                return self._busy()
+            return self._json(202, {"job": job_id, "status": "queued",
+                                    "status_url": f"/jobs/{job_id}"})
+
+        self._json(404, {"error": "not found"})
+
+    # ── Ответы ─────────────────────────────────────
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        data = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(data, dict):
+            raise ValueError("JSON object expected")
+        return data
+
+    def _busy(self):
+        self._json(429, {"error": "queue is full"}, {"Retry-After": "2"})
+
+    def _unavailable(self):
+        # Пул уже пересоздан (submit/heal), повтор через пару секунд пройдёт
+        self.service.heal()
+        self._json(503, {"error": "render worker crashed, retry later"},
+                   {"Retry-After": "2"})
+
+    def _json(self, code, data, headers=None):
+        raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._bytes(code, raw, "application/json; charset=utf-8", headers)
+
+    def _bytes(self, code, data, ctype, headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _file(self, path, ctype, name):
+        if not os.path.exists(path):
+            return self._json(410, {"error": "result is no longer available"})
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{name}"')
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile)
+
+
+def _config(data: dict) -> PassConfig:
+    if not isinstance(data, dict):
+        raise ValueError("config must be an object")
+    return PassConfig.from_dict(
+        {k: v for k, v in data.items() if k not in _PRIVATE_FIELDS}
+    )
+
+
+def _logo(body: dict, cfg: PassConfig) -> bytes | None:
+    if body.get("logo"):
+        return base64.b64decode(body["logo"])
+    if cfg.has_default_logo():
+        with open(cfg.default_logo_path(), "rb") as f:
+            return f.read()
+    return None
+
+
+def _row(card: dict, require_photo: bool = False):
+    from roster import RosterRow
+
+    fio = " ".join(str(card.get("fio", "")).split())
+    if not fio:
+        raise ValueError("card without fio")
+    if require_photo and not card.get("photo"):
+        raise ValueError("front side needs a photo")
+    photo = base64.b64decode(card["photo"]) if card.get("photo") else b""
+    return RosterRow(
+        fio,
+        series=str(card.get("series", "")), number=str(card.get("number", "")),
+        date_start=str(card.get("date_start", "")),
+        date_end=str(card.get("date_end", "")),
+        photo_bytes=photo,
+    )
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="HTTP-сервис генерации пропусков")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8502)
+    p.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    p.add_argument("--queue", type=int, default=32,
+                   help="запросов в работе и в очереди, сверх — 429")
+    p.add_argument("--jobs-dir", help="куда складывать готовые документы")
+    args = p.parse_args(argv)
+
+    service = PassService(args.workers, args.queue, args.jobs_dir)
+    Handler.service = service
+    httpd = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"🪪 Сервис пропусков: http://{args.host}:{args.port} "
+          f"({args.workers} процессов, очередь {args.queue})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
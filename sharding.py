@@ -0,0 +1,309 @@
+"""
+Разбиение большого тиража на части — каждая часть отдельный .docx,
+части собираются параллельно в отдельных процессах и упаковываются
+в ZIP вместе с оглавлением index.csv
+"""
+
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, replace
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator
+
+from config import PassConfig
+from roster import RosterRow
+from sheet_layout import SheetLayout, pack
+
+
+@dataclass
+class ShardTask:
+    index: int
+    rows: list[RosterRow]
+    cfg: PassConfig
+    logo_bytes: bytes | None
+    path: str
+    photos_dir: str = ""
+
+
+@dataclass
+class ShardResult:
+    index: int
+    path: str
+    cards: int = 0
+    first: str = ""
+    last: str = ""
+    error: str = ""
+    attempts: int = 0
+
+    @property
+    def file_name(self) -> str:
+        return f"shard_{self.index:04d}.docx"
+
+
+def cards_per_shard(pages: int, chunk: int) -> int:
+    """
+    Страниц в части → карточек в части. Страницы идут парами
+    (лицевая + оборотная на лист из chunk карточек), поэтому число страниц
+    округляется вниз до чётного, минимум одна пара.
+    """
+    return max(1, pages // 2) * chunk
+
+
+def build_shard(task: ShardTask) -> ShardResult:
+    """Собирает одну часть. Выполняется в дочернем процессе.
+
+    Файл пишется под временным именем и переименовывается атомарно —
+    недособранная часть не выглядит готовой. Рядом кладётся .json
+    с итогом — по нему часть подхватывается при повторном запуске.
+    """
+    from document_builder import DocumentBuilder
+
+    tmp = task.path + ".part"
+    count = DocumentBuilder(task.cfg).build_rows(task.rows, task.logo_bytes, tmp)
+    res = ShardResult(
+        task.index, task.path, count,
+        task.rows[0].fio if task.rows else "",
+        task.rows[-1].fio if task.rows else "",
+    )
+    with open(task.path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"cards": res.cards, "first": res.first, "last": res.last},
+                  f, ensure_ascii=False)
+    os.replace(tmp, task.path)
+    return res
+
+
+def build_shards(
+    rows: Iterable[RosterRow],
+    cfg: PassConfig,
+    logo_bytes: bytes | None,
+    out: str | BinaryIO,
+    pages_per_shard: int = 50,
+    workers: int | None = None,
+    retries: int = 1,
+    work_dir: str | None = None,
+    progress_cb=None,
+) -> list[ShardResult]:
+    """
+    Собирает части параллельно и пишет ZIP (части + index.csv) в out.
+
+    Строки читаются лениво; в работе одновременно не больше 2×workers
+    частей. Фото из архивов и загрузок перед отправкой выкладываются
+    в work_dir, в процессы уходят пути — память не растёт с размером
+    реестра. Упавшая часть пересобирается до retries раз, остальные не
+    трогаются; если процесс сборки погиб (OOM, сбой), пул пересоздаётся.
+    Имя части содержит хэш её строк, настроек и логотипа: при повторном
+    запуске с тем же work_dir готовые части того же реестра не
+    собираются заново, а части другого реестра не подхватываются.
+    progress_cb(готово_частей) вызывается по мере сборки.
+    """
+    layout = pack(cfg)
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    per_shard = cards_per_shard(pages_per_shard, layout.capacity)
+    tmp = None
+    if work_dir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="pass_shards_")
+        work_dir = tmp.name
+    os.makedirs(work_dir, exist_ok=True)
+
+    try:
+        results = _run(
+            _tasks(rows, cfg, logo_bytes, per_shard, work_dir),
+            workers, retries, progress_cb,
+        )
+        _write_zip(out, results, layout)
+        return results
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+
+# ── Приватные ──────────────────────────────────────
+
+def _tasks(rows, cfg, logo_bytes, per_shard, work_dir) -> Iterator[ShardTask]:
+    salt = f"{cfg.fingerprint()}\0{hashlib.sha1(logo_bytes or b'').hexdigest()}"
+    it = iter(rows)
+    index = 0
+    while chunk := list(islice(it, per_shard)):
+        index += 1
+        yield _prepare(index, chunk, cfg, logo_bytes, salt, work_dir)
+
+
+def _prepare(index, chunk, cfg, logo_bytes, salt, work_dir) -> ShardTask:
+    """
+    Фото из загрузчиков — в файлы work_dir/photos_NNNN, строки части
+    ссылаются на них по пути. Одновременно в памяти одно фото.
+    """
+    h = hashlib.sha1(salt.encode())
+    photos_dir = os.path.join(work_dir, f"photos_{index:04d}")
+    out_rows = []
+    for n, row in enumerate(chunk):
+        h.update("\0".join(
+            (row.fio, row.series, row.number, row.date_start, row.date_end)
+        ).encode("utf-8"))
+
+        if row.photo_bytes is None and row.loader is None:
+            try:
+                st = os.stat(row.photo_path)
+                h.update(f"\0{row.photo_path}\0{st.st_size}\0{st.st_mtime_ns}".encode())
+            except OSError:
+                h.update(b"\0no-photo")
+            out_rows.append(row)
+            continue
+
+        try:
+            data = row.read_photo()
+        except Exception:
+            data = b""
+        h.update(hashlib.sha1(data).digest())
+        path = ""
+        if data:
+            os.makedirs(photos_dir, exist_ok=True)
+            path = os.path.join(photos_dir, f"{n:05d}")
+            with open(path, "wb") as f:
+                f.write(data)
+        # Без фото: пустой путь → сборщик пропустит строку
+        out_rows.append(replace(row, photo_path=path, photo_bytes=None, loader=None))
+
+    path = os.path.join(work_dir, f"shard_{index:04d}_{h.hexdigest()[:12]}.docx")
+    return ShardTask(index, out_rows, cfg, logo_bytes, path, photos_dir)
+
+
+def _resumed(task: ShardTask) -> ShardResult | None:
+    """Готовая часть от прошлого запуска (того же реестра) или None"""
+    try:
+        with open(task.path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(task.path):
+        return None
+    return ShardResult(task.index, task.path, int(meta.get("cards", 0)),
+                       meta.get("first", ""), meta.get("last", ""))
+
+
+def _run(tasks, workers, retries, progress_cb) -> list[ShardResult]:
+    """
+    Планировщик частей. Обычная ошибка в части — повтор только её.
+    Гибель процесса ломает весь пул: пул пересоздаётся, а части, бывшие
+    в работе, запускаются по одной — так виновник находится и получает
+    свои retries, а остальные не страдают.
+    """
+    ctx = multiprocessing.get_context("spawn")  # безопасно из потоков Streamlit
+    results: dict[int, ShardResult] = {}
+    retry: deque = deque()      # (task, attempt)
+    suspects: deque = deque()   # (task, attempt) — были в упавшем пуле
+    pending: dict = {}          # future → (task, attempt, один_в_пуле)
+    tasks = iter(tasks)
+    exhausted = False
+    pool = ProcessPoolExecutor(workers, mp_context=ctx)
+
+    def finish(task, res, attempt):
+        res.attempts = attempt
+        results[task.index] = res
+        if task.photos_dir:
+            shutil.rmtree(task.photos_dir, ignore_errors=True)
+        if progress_cb:
+            progress_cb(len(results))
+
+    def fail(task, attempt, error):
+        finish(task, ShardResult(task.index, task.path, error=error,
+                                 first=task.rows[0].fio, last=task.rows[-1].fio),
+               attempt)
+
+    try:
+        while True:
+            if suspects:
+                if not pending:
+                    task, attempt = suspects.popleft()
+                    pending[pool.submit(build_shard, task)] = (task, attempt, True)
+            else:
+                while len(pending) < workers * 2:
+                    if retry:
+                        task, attempt = retry.popleft()
+                    elif exhausted:
+                        break
+                    else:
+                        task = next(tasks, None)
+                        if task is None:
+                            exhausted = True
+                            break
+                        attempt = 1
+                        res = _resumed(task)
+                        if res is not None:
+                            finish(task, res, 0)
+                            continue
+                    pending[pool.submit(build_shard, task)] = (task, attempt, False)
+
+            if not pending:
+                if suspects or retry:
+                    continue
+                break
+
+            broken = False
+            for fut in wait(pending, return_when=FIRST_COMPLETED).done:
+                task, attempt, alone = pending.pop(fut)
+                try:
+                    res = fut.result()
+                except BrokenProcessPool:
+                    broken = True
+                    if not alone:
+                        suspects.append((task, attempt))
+                    elif attempt <= retries:
+                        print(f"  ⚠️ Часть {task.index}: процесс сборки погиб — повтор")
+                        suspects.append((task, attempt + 1))
+                    else:
+                        fail(task, attempt, "процесс сборки аварийно завершился")
+                    continue
+                except Exception as e:
+                    if attempt <= retries:
+                        print(f"  ⚠️ Часть {task.index}: {e} — повтор")
+                        (suspects if alone else retry).append((task, attempt + 1))
+                    else:
+                        fail(task, attempt, str(e))
+                    continue
+                finish(task, res, attempt)
+
+            if broken:
+                # Остальные задачи упавшего пула тоже не доделаны
+                for fut in wait(pending).done:
+                    task, attempt, _ = pending.pop(fut)
+                    try:
+                        finish(task, fut.result(), attempt)
+                    except Exception:
+                        suspects.append((task, attempt))
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = ProcessPoolExecutor(workers, mp_context=ctx)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return [results[i] for i in sorted(results)]
+
+
+def _write_zip(out, results: list[ShardResult], layout: SheetLayout):
+    index = io.StringIO()
+    w = csv.writer(index, delimiter=";")
+    w.writerow(["Часть", "Файл", "Пропусков", "Страниц", "Первый", "Последний", "Статус"])
+
+    # .docx уже сжат — кладём без повторного сжатия
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+        for r in results:
+            ok = not r.error and os.path.exists(r.path)
+            if ok:
+                zf.write(r.path, r.file_name)
+            pages = layout.pages(r.cards) if ok else 0
+            w.writerow([
+                r.index, r.file_name if ok else "", r.cards, pages,
+                r.first, r.last, "ок" if ok else f"ошибка: {r.error}",
+            ])
+        zf.writestr("index.csv", index.getvalue().encode("utf-8-sig"),
+                    zipfile.ZIP_DEFLATED)
@@ -0,0 +1,178 @@
+"""
+Раскладка карточек на листе — сколько помещается и где стоят.
+
+Ячейка = карточка + cut_margin с каждой стороны (зазор для резки, как
+в таблице Word). Рабочее поле — лист PAPER_MM минус page_margin с каждой
+стороны. Перебираются книжная и альбомная ориентация листа, карточки
+прямо и повёрнутыми на 90°, а также два блока друг под другом разной
+ориентации (остаток высоты не пропадает). Побеждает раскладка с
+наибольшим числом карточек; при равенстве — без поворота и книжная.
+
+Каждый блок — сетка rows×cols, в Word это отдельная таблица, между
+блоками и после последнего — абзац высотой 1 pt (иначе Word склеит
+таблицы или вынесет разрыв страницы на лишний лист).
+
+Оборот зеркалится по вертикальной оси листа: при двусторонней печати
+книжный лист переворачивается по длинному краю, альбомный — по короткому,
+и оборот ложится точно под лицевую сторону.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+from config import PassConfig
+
+PAPER_MM = {"A4": (210, 297), "A3": (297, 420), "SRA3": (320, 450)}
+
+# Абзац-разделитель после каждого блока (1 pt), см
+PARA_CM = 2.54 / 72
+
+_EPS = 1e-9
+
+
+@dataclass(frozen=True)
+class Band:
+    """Блок одинаково повёрнутых карточек"""
+    rows: int
+    cols: int
+    rotated: bool
+    cell_w: float   # см, с зазором
+    cell_h: float
+
+    @property
+    def capacity(self) -> int:
+        return self.rows * self.cols
+
+
+@dataclass(frozen=True)
+class Slot:
+    """Место карточки на листе: левый верхний угол самой карточки (см)"""
+    band: int
+    row: int
+    col: int
+    x: float
+    y: float
+    rotated: bool
+
+
+@dataclass(frozen=True)
+class SheetLayout:
+    paper: str
+    landscape: bool
+    page_w: float   # см, с учётом ориентации
+    page_h: float
+    margin: float
+    gutter: float   # cut_margin
+    card_w: float
+    card_h: float
+    bands: tuple[Band, ...]
+
+    @property
+    def capacity(self) -> int:
+        return sum(b.capacity for b in self.bands)
+
+    @property
+    def used_h(self) -> float:
+        """Высота блоков вместе с абзацами-разделителями"""
+        return sum(b.rows * b.cell_h for b in self.bands) + PARA_CM * len(self.bands)
+
+    @property
+    def top(self) -> float:
+        """Отступ сверху: блоки по центру листа, но не ближе поля"""
+        return max(self.margin, (self.page_h - self.used_h) / 2)
+
+    def sheets(self, cards: int) -> int:
+        return -(-cards // self.capacity)
+
+    def pages(self, cards: int) -> int:
+        """Страниц документа: лицевая + оборотная на каждый лист"""
+        return self.sheets(cards) * 2
+
+    def slots(self, back: bool = False) -> list[Slot]:
+        """Места по порядку карточек; back=True — зеркально для оборота"""
+        out = []
+        y = self.top
+        for bi, band in enumerate(self.bands):
+            left = (self.page_w - band.cols * band.cell_w) / 2
+            for r in range(band.rows):
+                for c in range(band.cols):
+                    col = band.cols - 1 - c if back else c
+                    out.append(Slot(
+                        bi, r, col,
+                        left + col * band.cell_w + self.gutter,
+                        y + r * band.cell_h + self.gutter,
+                        band.rotated,
+                    ))
+            y += band.rows * band.cell_h + PARA_CM
+        return out
+
+    def describe(self) -> str:
+        grid = " + ".join(
+            f"{b.rows}×{b.cols}{' ↻' if b.rotated else ''}" for b in self.bands
+        )
+        side = "альбомный" if self.landscape else "книжный"
+        return f"{self.paper} {side}: {self.capacity} на листе ({grid})"
+
+
+def pack(cfg: PassConfig) -> SheetLayout:
+    """Лучшая раскладка для настроек; ValueError, если карточка не влезает"""
+    return _pack(cfg.paper, cfg.card_w, cfg.card_h, cfg.cut_margin, cfg.page_margin)
+
+
+@lru_cache(maxsize=64)
+def _pack(paper: str, card_w: float, card_h: float, gutter: float,
+          margin: float) -> SheetLayout:
+    if paper not in PAPER_MM:
+        raise ValueError(f"paper: ожидается одно из {tuple(PAPER_MM)}, получено {paper!r}")
+    pw, ph = (mm / 10 for mm in PAPER_MM[paper])
+
+    best, best_key = None, None
+    for landscape in (False, True):
+        w, h = (ph, pw) if landscape else (pw, ph)
+        for bands in _candidates(w - 2 * margin, h - 2 * margin, card_w, card_h, gutter):
+            layout = SheetLayout(paper, landscape, w, h, margin, gutter,
+                                 card_w, card_h, bands)
+            # Больше карточек; затем меньше блоков, без поворота, книжная
+            key = (layout.capacity, -len(bands),
+                   -sum(b.rotated for b in bands), not landscape)
+            if best_key is None or key > best_key:
+                best, best_key = layout, key
+
+    if best is None or best.capacity == 0:
+        raise ValueError(
+            f"карточка {card_w}×{card_h} см с зазором {gutter} см "
+            f"не помещается на лист {paper}"
+        )
+    return best
+
+
+def _candidates(w, h, card_w, card_h, gutter):
+    """Варианты блоков для рабочего поля w×h (см)"""
+    kinds = [
+        (False, card_w + 2 * gutter, card_h + 2 * gutter),
+        (True, card_h + 2 * gutter, card_w + 2 * gutter),
+    ]
+
+    def fit(length, cell):
+        return int((length + _EPS) // cell) if length > 0 else 0
+
+    for rotated, cw, ch in kinds:
+        cols = fit(w, cw)
+        max_rows = fit(h - PARA_CM, ch)
+        if not cols or not max_rows:
+            continue
+        yield (Band(max_rows, cols, rotated, cw, ch),)
+
+        # Сверху n рядов этой ориентации, остаток высоты — другой
+        for other, ocw, och in kinds:
+            if other == rotated:
+                continue
+            ocols = fit(w, ocw)
+            if not ocols:
+                continue
+            for n in range(1, max_rows + 1):
+                rest = h - n * ch - 2 * PARA_CM
+                orows = fit(rest, och)
+                if orows:
+                    yield (Band(n, cols, rotated, cw, ch),
+                           Band(orows, ocols, other, ocw, och))
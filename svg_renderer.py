@@ -0,0 +1,300 @@
+"""
+Векторный рендер карточек — та же вёрстка, что у CardRenderer, но на
+выходе SVG: текст остаётся текстом (DejaVu), шапка — linearGradient,
+фото и логотип встраиваются по одному разу. Растром остаются только они.
+
+Вёрстка не дублируется: SvgCanvas повторяет нужную часть интерфейса
+ImageDraw (textbbox, text, line, rectangle, ellipse, arc), поэтому
+CardRenderer и DrawingUtils рисуют на нём без изменений. Размеры текста
+меряются теми же шрифтами PIL, ширина строки фиксируется textLength —
+переносы и подбор размера совпадают с растровой карточкой.
+"""
+
+import base64
+import io
+import itertools
+import math
+import os
+from functools import lru_cache
+from xml.sax.saxutils import escape, quoteattr
+
+from PIL import Image, ImageDraw
+
+from card_renderer import CardRenderer
+from config import PassConfig
+from drawing_utils import DrawingUtils as DU
+
+# Откуда брать семейство, если шрифт не найден и PIL отдал встроенный
+_FALLBACK_FAMILY = "DejaVu Sans, Verdana, sans-serif"
+
+_canvas_ids = itertools.count(1)
+
+
+class SvgCanvas:
+    """Холст, совместимый с ImageDraw в объёме, нужном CardRenderer"""
+
+    def __init__(self, w: int, h: int, background: str = "white"):
+        self.w, self.h = w, h
+        self.defs: list[str] = []
+        self.body: list[str] = []
+        self._measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+        # id уникальны на процесс: несколько SVG в одной странице не пересекаются
+        self._prefix = f"c{next(_canvas_ids)}"
+        self._ids = 0
+        self.rectangle([0, 0, w - 1, h - 1], fill=background)
+
+    # ── Интерфейс ImageDraw ────────────────────────
+
+    def textbbox(self, xy, text, font=None, **kw):
+        return self._measure.textbbox(xy, text, font=font, **kw)
+
+    def text(self, xy, text, font=None, fill="black", **kw):
+        if not text:
+            return
+        x, y = xy
+        ascent = font.getmetrics()[0] if hasattr(font, "getmetrics") else 0
+        family, weight = _font_style(font)
+        size = getattr(font, "size", 10)
+        length = font.getlength(text) if hasattr(font, "getlength") else 0
+        self.body.append(
+            f'<text x="{_n(x)}" y="{_n(y + ascent)}" font-family={quoteattr(family)} '
+            f'font-size="{size}" font-weight="{weight}" fill="{_color(fill)}" '
+            f'textLength="{_n(length)}" lengthAdjust="spacingAndGlyphs" '
+            f'xml:space="preserve">{escape(text)}</text>'
+        )
+
+    def line(self, xy, fill=None, width=1, **kw):
+        pts = _points(xy)
+        self.body.append(
+            f'<polyline points="{" ".join(f"{_n(x)},{_n(y)}" for x, y in pts)}" '
+            f'fill="none" stroke="{_color(fill)}" stroke-width="{width}"/>'
+        )
+
+    def rectangle(self, xy, fill=None, outline=None, width=1):
+        (x1, y1), (x2, y2) = _points(xy)
+        # PIL включает правую и нижнюю границу
+        self.body.append(
+            f'<rect x="{_n(x1)}" y="{_n(y1)}" width="{_n(x2 - x1 + 1)}" '
+            f'height="{_n(y2 - y1 + 1)}"{_paint(fill, outline, width)}/>'
+        )
+
+    def ellipse(self, xy, fill=None, outline=None, width=1):
+        (x1, y1), (x2, y2) = _points(xy)
+        self.body.append(
+            f'<ellipse cx="{_n((x1 + x2 + 1) / 2)}" cy="{_n((y1 + y2 + 1) / 2)}" '
+            f'rx="{_n((x2 - x1 + 1) / 2)}" ry="{_n((y2 - y1 + 1) / 2)}"'
+            f'{_paint(fill, outline, width)}/>'
+        )
+
+    def arc(self, xy, start, end, fill=None, width=1):
+        (x1, y1), (x2, y2) = _points(xy)
+        # PIL рисует дугу внутрь рамки — ось штриха сдвинута на width/2
+        rx = (x2 - x1 + 1 - width) / 2
+        ry = (y2 - y1 + 1 - width) / 2
+        cx, cy = (x1 + x2 + 1) / 2, (y1 + y2 + 1) / 2
+        a0, a1 = math.radians(start), math.radians(end)
+        sx, sy = cx + rx * math.cos(a0), cy + ry * math.sin(a0)
+        ex, ey = cx + rx * math.cos(a1), cy + ry * math.sin(a1)
+        large = 1 if (end - start) % 360 > 180 else 0
+        self.body.append(
+            f'<path d="M{_n(sx)},{_n(sy)} A{_n(rx)},{_n(ry)} 0 {large} 1 '
+            f'{_n(ex)},{_n(ey)}" fill="none" stroke="{_color(fill)}" '
+            f'stroke-width="{width}"/>'
+        )
+
+    # ── Векторные элементы ─────────────────────────
+
+    def gradient(self, x, y, w, h, c1, c2):
+        gid = self._id("g")
+        self.defs.append(
+            f'<linearGradient id="{gid}" x1="0" y1="0" x2="0" y2="1">'
+            f'<stop offset="0" stop-color="{c1}"/>'
+            f'<stop offset="1" stop-color="{c2}"/></linearGradient>'
+        )
+        self.body.append(
+            f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="url(#{gid})"/>'
+        )
+
+    def image(self, x, y, w, h, uri, opacity=1.0):
+        op = f' opacity="{opacity:g}"' if opacity < 1 else ""
+        self.body.append(
+            f'<image x="{x}" y="{y}" width="{w}" height="{h}"{op} '
+            f'preserveAspectRatio="none" href="{uri}"/>'
+        )
+
+    def shadow(self, x, y, w, h, opacity, blur):
+        fid = self._id("s")
+        self.defs.append(
+            f'<filter id="{fid}" x="-50%" y="-50%" width="200%" height="200%">'
+            f'<feGaussianBlur stdDeviation="{blur}"/></filter>'
+        )
+        self.body.append(
+            f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="black" '
+            f'fill-opacity="{opacity:.3f}" filter="url(#{fid})"/>'
+        )
+
+    def style(self, css: str):
+        self.defs.append(f"<style>{css}</style>")
+
+    def to_svg(self, width_mm: float | None = None, height_mm: float | None = None) -> str:
+        size = (f'width="{width_mm:g}mm" height="{height_mm:g}mm"'
+                if width_mm else f'width="{self.w}" height="{self.h}"')
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" {size} '
+            f'viewBox="0 0 {self.w} {self.h}">'
+            f'<defs>{"".join(self.defs)}</defs>{"".join(self.body)}</svg>'
+        )
+
+    def _id(self, prefix: str) -> str:
+        self._ids += 1
+        return f"{self._prefix}{prefix}{self._ids}"
+
+
+class SvgCardRenderer(CardRenderer):
+    """
+    front()/back() возвращают строку SVG вместо Image.
+
+    physical_size=True — размеры SVG в мм (для печати), иначе в пикселях
+    (для превью). embed_fonts=True встраивает TTF из cfg.font_dir через
+    @font-face — файл самодостаточен, но тяжелее на ~0.7 МБ за начертание.
+    Для нескольких карточек на одной странице лучше один блок font_css()
+    на страницу и SVG прямо в разметке.
+    """
+
+    # Текст остаётся текстом — атлас глифов не нужен
+    use_atlas = False
+
+    def __init__(self, cfg: PassConfig, physical_size: bool = False,
+                 embed_fonts: bool = False):
+        super().__init__(cfg)
+        self.physical_size = physical_size
+        self.embed_fonts = embed_fonts
+        self._logo_cache = None
+
+    # ── Холст ──────────────────────────────────────
+
+    def _new_canvas(self):
+        canvas = SvgCanvas(self.w, self.h)
+        if self.embed_fonts:
+            canvas.style(self.font_css())
+        return canvas, canvas
+
+    def _finish(self, canvas):
+        if self.physical_size:
+            return canvas.to_svg(self.cfg.card_w * 10, self.cfg.card_h * 10)
+        return canvas.to_svg()
+
+    # ── Растровые элементы ─────────────────────────
+
+    def _paint_gradient(self, canvas, hh):
+        canvas.gradient(0, 0, self.w, hh, self.cfg.gradient_start, self.cfg.gradient_end)
+
+    def _front_photo(self, canvas, photo_pil, hh) -> int:
+        x, y, size = self._photo_box(hh)
+        try:
+            bordered = DU.framed_photo(photo_pil, size, "#FFFFFF", 10)
+        except Exception as e:
+            print(f"  ⚠️ Ошибка фото: {e}")
+            return x
+        bw, bh = bordered.size
+        canvas.shadow(x - 4, y + 4, bw, bh, 30 / 255, 8)
+        canvas.image(x, y, bw, bh, _data_uri(bordered, "JPEG"))
+        return x + bw
+
+    def _front_logo(self, canvas, logo_pil, photo_right, header_h):
+        try:
+            logo = logo_pil.convert("RGBA")
+            x, y, lw, lh = self._logo_box(logo, photo_right, header_h)
+            canvas.image(x, y, lw, lh, self._logo_uri(logo_pil, logo, lw, lh),
+                         opacity=0.30)
+        except Exception as e:
+            print(f"  ⚠️ Ошибка логотипа: {e}")
+
+    # ── Приватные ──────────────────────────────────
+
+    def _logo_uri(self, logo_pil, logo, lw, lh) -> str:
+        """
+        Логотип один на весь тираж — кодируем его один раз. Ключ — сам
+        объект логотипа (ссылка хранится, id не переиспользуется).
+        """
+        cached = self._logo_cache
+        if cached is None or cached[0] is not logo_pil or cached[1] != (lw, lh):
+            resized = logo.resize((lw, lh), Image.Resampling.LANCZOS)
+            self._logo_cache = cached = (logo_pil, (lw, lh), _data_uri(resized, "PNG"))
+        return cached[2]
+
+    def font_css(self) -> str:
+        """@font-face для шрифтов карточки — один блок на страницу превью"""
+        return font_face_css(tuple(
+            (getattr(f, "path", ""),) + _font_style(f) for f in self.fonts.values()
+        ))
+
+
+# ── Утилиты ────────────────────────────────────────
+
+@lru_cache(maxsize=8)
+def font_face_css(faces: tuple) -> str:
+    """(путь, семейство, насыщенность) → блок @font-face со шрифтами в base64"""
+    out = []
+    seen = set()
+    for path, family, weight in faces:
+        if not path or path in seen or not os.path.exists(path):
+            continue
+        seen.add(path)
+        with open(path, "rb") as f:
+            data = base64.b64encode(f.read()).decode("ascii")
+        out.append(
+            f"@font-face{{font-family:'{family.split(',')[0]}';"
+            f"font-weight:{weight};"
+            f"src:url(data:font/ttf;base64,{data}) format('truetype')}}"
+        )
+    return "".join(out)
+
+
+def _font_style(font) -> tuple[str, str]:
+    """Семейство (с запасными) и насыщенность для атрибутов SVG"""
+    try:
+        family, style = font.getname()
+    except Exception:
+        return _FALLBACK_FAMILY, "normal"
+    generic = "serif" if "serif" in family.lower() and "sans" not in family.lower() \
+        else "sans-serif"
+    weight = "bold" if style and "bold" in style.lower() else "normal"
+    return f"{family}, {generic}", weight
+
+
+def _data_uri(img: Image.Image, fmt: str) -> str:
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img.convert("RGB").save(buf, "JPEG", quality=92)
+    else:
+        img.save(buf, fmt, optimize=True)
+    mime = "image/jpeg" if fmt == "JPEG" else "image/png"
+    return f"data:{mime};base64,{base64.b64encode(buf.getvalue()).decode('ascii')}"
+
+
+def _points(xy) -> list[tuple[float, float]]:
+    """[(x, y), ...] или [x1, y1, x2, y2, ...] → список точек"""
+    xy = list(xy)
+    if xy and not isinstance(xy[0], (tuple, list)):
+        xy = list(zip(xy[0::2], xy[1::2]))
+    return [(float(x), float(y)) for x, y in xy]
+
+
+def _color(c) -> str:
+    if c is None:
+        return "none"
+    if isinstance(c, tuple):
+        return f"rgb({c[0]},{c[1]},{c[2]})"
+    return str(c)
+
+
+def _paint(fill, outline, width) -> str:
+    out = f' fill="{_color(fill)}"'
+    if outline:
+        out += f' stroke="{_color(outline)}" stroke-width="{width}"'
+    return out
+
+
+def _n(v: float) -> str:
+    return f"{v:.2f}".rstrip("0").rstrip(".")
@@ -0,0 +1,44 @@
+import os
+
+from build_cache import BuildCache
+
+
+def _file(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_file_larger_than_cache_is_not_cached(tmp_path):
+    cache = BuildCache(str(tmp_path / "cache"), max_mb=0.5)
+    src = _file(tmp_path, "big.docx", 1024 * 1024)
+
+    path = cache.put("k", src)
+
+    assert os.path.exists(path)
+    assert cache.get("k") is None
+
+
+def test_put_never_evicts_the_new_entry(tmp_path):
+    cache = BuildCache(str(tmp_path / "cache"), max_mb=1)
+    cache.put("old", _file(tmp_path, "a.docx", 600 * 1024))
+
+    path = cache.put("new", _file(tmp_path, "b.docx", 600 * 1024))
+
+    assert os.path.exists(path)
+    assert cache.get("new") == path
+    assert cache.get("old") is None
+
+
+def test_meta_travels_with_the_file_and_is_evicted_with_it(tmp_path):
+    cache = BuildCache(str(tmp_path / "cache"), max_mb=1)
+    cache.put("old", _file(tmp_path, "a.docx", 600 * 1024), {"count": 7})
+
+    assert cache.meta("old") == {"count": 7}
+
+    cache.put("new", _file(tmp_path, "b.docx", 600 * 1024), {"count": 3})
+
+    assert cache.meta("new") == {"count": 3}
+    assert cache.meta("old") == {}
+    assert sorted(os.listdir(tmp_path / "cache")) == sorted(
+        os.path.basename(cache._path("new"))[:-4] + ext for ext in (".bin", ".json"))
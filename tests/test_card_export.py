@@ -0,0 +1,44 @@
+import io
+import os
+import zipfile
+
+from PIL import Image
+
+from card_export import card_file_base, export_zip, unique_name
+from config import PassConfig
+from roster import RosterRow
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _photo():
+    folder = os.path.join(ROOT, "image")
+    name = sorted(f for f in os.listdir(folder) if not f.startswith("logo"))[0]
+    return os.path.join(folder, name)
+
+
+def test_names_are_safe_and_unique():
+    taken = set()
+    assert unique_name(card_file_base('Иванов  "И"/И.'), taken) == "Иванов _И__И"
+    assert unique_name(card_file_base("Иванов _И__И"), taken) == "Иванов _И__И (2)"
+    assert card_file_base("  ") == "без имени"
+
+
+def test_export_writes_both_sides_at_requested_dpi():
+    cfg = PassConfig()
+    rows = [RosterRow("Петров Пётр Петрович", photo_path=_photo()),
+            RosterRow("Петров Пётр Петрович", photo_path=_photo()),
+            RosterRow("Без Фото", photo_path="нет.jpg")]
+    buf = io.BytesIO()
+
+    count = export_zip(rows, cfg, None, buf, dpi=150)
+
+    zf = zipfile.ZipFile(buf)
+    assert count == 2
+    assert zf.namelist() == [
+        "Петров Пётр Петрович_front.png", "Петров Пётр Петрович_back.png",
+        "Петров Пётр Петрович (2)_front.png", "Петров Пётр Петрович (2)_back.png",
+        "index.csv",
+    ]
+    img = Image.open(io.BytesIO(zf.read(zf.namelist()[0])))
+    assert img.size == (int(cfg.card_w / 2.54 * 150), int(cfg.card_h / 2.54 * 150))
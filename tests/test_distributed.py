@@ -0,0 +1,71 @@
+import io
+import os
+import signal
+import subprocess
+import sys
+import time
+import zipfile
+
+from PIL import Image
+
+import distributed
+from config import PassConfig
+from roster import RosterRow
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rows(n):
+    rows = []
+    for i in range(n):
+        buf = io.BytesIO()
+        Image.new("RGB", (300, 400), (20 * i, 120, 200)).save(buf, "JPEG")
+        rows.append(RosterRow(f"Сотрудник Номер {i:02d}", photo_bytes=buf.getvalue()))
+    return rows
+
+
+def _cards(zip_path):
+    with zipfile.ZipFile(zip_path) as zf:
+        index = zf.read("index.csv").decode("utf-8-sig").splitlines()[1:]
+    return sum(int(line.split(";")[2]) for line in index)
+
+
+def test_abandoned_unit_is_picked_up(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    job = str(tmp_path / "job")
+    assert distributed.plan(_rows(10), PassConfig(), None, job, pages_per_unit=2) == 2
+
+    # Рабочий захватил первую часть и пропал
+    claim = os.path.join(job, "claims", "unit_0001")
+    assert distributed._try_claim(claim, "погибший")
+    old = time.time() - 120
+    os.utime(claim, (old, old))
+    assert distributed.status(job, lease=5).stale == 1
+
+    assert distributed.work(job, "живой", lease=5, poll=0.1) == 2
+
+    results = distributed.merge(job, str(tmp_path / "out.zip"))
+    assert [r.cards for r in results] == [8, 2]
+    assert results[0].attempts == 1 and not results[0].error
+    assert _cards(tmp_path / "out.zip") == 10
+
+
+def test_killed_worker_process(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    job = str(tmp_path / "job")
+    distributed.plan(_rows(12), PassConfig(), None, job, pages_per_unit=2)
+
+    proc = subprocess.Popen([sys.executable, "distributed.py", "work", job,
+                             "--id", "жертва", "--lease", "1"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while not os.listdir(os.path.join(job, "claims")) and time.time() < deadline:
+        time.sleep(0.05)
+    proc.send_signal(signal.SIGKILL)
+    proc.wait()
+
+    distributed.work(job, "живой", lease=1, poll=0.1)
+
+    assert distributed.status(job, lease=1).done == 2
+    distributed.merge(job, str(tmp_path / "out.zip"))
+    assert _cards(tmp_path / "out.zip") == 12
@@ -0,0 +1,72 @@
+import io
+from concurrent.futures import Future
+
+from PIL import Image
+
+from config import PassConfig
+from document_builder import DocumentBuilder
+from roster import RosterRow
+
+
+def _rows(n=3):
+    rows = []
+    for i in range(n):
+        buf = io.BytesIO()
+        Image.new("RGB", (300, 400), (40 * i, 90, 160)).save(buf, "JPEG")
+        rows.append(RosterRow(f"Сотрудник Номер {i}", photo_bytes=buf.getvalue()))
+    return rows
+
+
+def test_pooled_cards_carry_their_own_back_and_cancel_on_close():
+    futures = []
+
+    def submit(fn, *args):
+        fut = Future()
+        if not futures:             # первая карточка готова, остальные в очереди
+            fut.set_result(fn(*args))
+        futures.append(fut)
+        return fut
+
+    builder = DocumentBuilder(PassConfig(), submit=submit)
+    builder.WINDOW = 4
+    rows = _rows(6)
+    cards = builder._cards(rows, None)
+
+    row, front, back = next(cards)
+    cards.close()                   # сборка прервана
+
+    assert row is rows[0]
+    expected = builder.renderer.back(rows[0].fio, rows[0].date_start)
+    assert back.tobytes() == expected.tobytes()
+    assert len(futures) == 5     # окно дополнено до WINDOW перед выдачей
+    assert all(f.cancelled() for f in futures[1:])
+
+
+def test_pdf_pages_are_written_once_without_resampling_cards(tmp_path, monkeypatch):
+    from PIL import PdfParser
+
+    from pdf_builder import PdfBuilder
+
+    resized = []
+    real = Image.Image.resize
+    monkeypatch.setattr(Image.Image, "resize",
+                        lambda self, size, *a, **kw: resized.append(size) or real(self, size, *a, **kw))
+    builder = PdfBuilder(PassConfig())
+    out = str(tmp_path / "propuska.pdf")
+
+    count = builder.build_rows(_rows(builder.chunk + 1), None, out)
+    card_px = PassConfig().get_px()
+
+    assert count == builder.chunk + 1
+    assert card_px not in resized
+    pdf = PdfParser.PdfParser(out)
+    assert len(pdf.pages) == 4      # два листа: лицевые и оборотные
+    pdf.close()
+
+
+def test_pdf_without_cards_creates_no_file(tmp_path):
+    from pdf_builder import PdfBuilder
+
+    out = tmp_path / "propuska.pdf"
+    assert PdfBuilder(PassConfig()).build_rows([RosterRow("Без Фото Совсем")], None, str(out)) == 0
+    assert not out.exists()
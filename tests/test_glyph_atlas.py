@@ -0,0 +1,29 @@
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+from config import PassConfig
+from drawing_utils import DrawingUtils as DU
+from glyph_atlas import atlas_for
+
+TEXTS = ["Иванов", "Константинопольская-Мамина", "Ёлкина Юлия", "KЖ AV Ty", "j.«»"]
+
+
+def test_atlas_matches_freetype():
+    for font in DU.get_fonts(PassConfig()).values():
+        atlas = atlas_for(font)
+        for text in TEXTS:
+            ref = Image.new("RGB", (1200, 120), "white")
+            img = ref.copy()
+            ImageDraw.Draw(ref).text((11, 7), text, font=font, fill="#E74C3C")
+            atlas.draw(ImageDraw.Draw(img), (11, 7), text, "#E74C3C")
+
+            assert ImageChops.difference(ref, img).getbbox() is None, (font.path, text)
+            assert atlas.bbox(text) == ImageDraw.Draw(ref).textbbox((0, 0), text, font=font)
+            assert atlas.width(text) == font.getlength(text)
+
+
+def test_atlas_shared_per_font_and_size():
+    font = DU.get_fonts(PassConfig())["value"]
+    same = ImageFont.truetype(font.path, font.size)
+
+    assert atlas_for(font) is atlas_for(same)
+    assert atlas_for(ImageFont.load_default_imagefont()) is None
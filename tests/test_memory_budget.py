@@ -0,0 +1,28 @@
+import tracemalloc
+
+import pytest
+from PIL import Image
+
+from memory_budget import BuildMeter, count_allocations
+
+
+def test_count_allocations_counts_pil_images_and_restores_hook():
+    real_new = Image.Image._new
+    with count_allocations() as st:
+        Image.new("RGB", (10, 20)).convert("L")
+
+    assert st.pil_images == 2 and st.pil_bytes == 10 * 20 * 4 + 10 * 20
+    assert Image.Image._new == real_new
+    assert BuildMeter._users == 0 and not tracemalloc.is_tracing()
+
+
+def test_count_allocations_refuses_during_metered_build():
+    meter = BuildMeter(enabled=True)
+    try:
+        with pytest.raises(RuntimeError):
+            with count_allocations():
+                pass
+        assert BuildMeter._users == 1 and tracemalloc.is_tracing()
+    finally:
+        meter.finish()
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,53 @@
+import io
+import os
+
+from PIL import Image, ImageChops
+
+from config import PassConfig
+from document_builder import DocumentBuilder
+from photo_store import PhotoStore
+from preflight import photo_frame_px
+from roster import RosterRow
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _photo(color) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 400), color).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def test_store_renders_same_card(tmp_path):
+    cfg = PassConfig()
+    path = os.path.join(ROOT, "image", sorted(
+        n for n in os.listdir(os.path.join(ROOT, "image"))
+        if n.endswith((".jpg", ".png")) and n != cfg.default_logo
+    )[0])
+    row = RosterRow("Иванов Иван Иванович", photo_path=path)
+    store = PhotoStore(str(tmp_path), photo_frame_px(cfg))
+    assert store.update([row]).added == 1
+
+    plain = DocumentBuilder(cfg)._render_row(row, None)[0]
+    stored = DocumentBuilder(cfg, photo_store=store)._render_row(row, None)[0]
+
+    assert ImageChops.difference(plain, stored).getbbox() is None
+
+
+def test_update_is_incremental(tmp_path):
+    size = (120, 160)
+    rows = [RosterRow("Петров", photo_bytes=_photo("red")),
+            RosterRow("Сидоров", photo_bytes=_photo("blue"))]
+    store = PhotoStore(str(tmp_path), size)
+    assert store.update(rows).added == 2
+
+    reopened = PhotoStore(str(tmp_path), size)
+    stats = reopened.update(rows + [RosterRow("Козлов", photo_bytes=_photo("green"))])
+    assert (stats.added, stats.reused) == (1, 2)
+    assert reopened.photo_for(rows[0]).size == size
+
+    stats = reopened.update(rows[:1])
+    assert stats.removed == 2 and len(reopened) == 1
+    assert reopened.photo_for(rows[1]) is None
+
+    assert len(PhotoStore(str(tmp_path), (100, 100))) == 0
@@ -0,0 +1,170 @@
+import io
+import threading
+import time
+
+from PIL import Image
+
+from photo_utils import PhotoUtils
+
+
+def _jpeg(w=300, h=200):
+    buf = io.BytesIO()
+    Image.new("RGB", (w, h), "#808080").save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def test_slow_detection_falls_back_to_center_crop(monkeypatch):
+    release = threading.Event()
+
+    def stuck(gray):
+        release.wait(5)
+        return []
+
+    monkeypatch.setattr(PhotoUtils, "_detect", staticmethod(stuck))
+    start = time.perf_counter()
+
+    img, timing = PhotoUtils.process_timed(_jpeg(), "долго", budget=0.2)
+
+    assert time.perf_counter() - start < 2
+    assert timing.timed_out
+    assert img.size == (150, 200)   # _crop_center: 3:4 по высоте
+    release.set()
+
+
+def test_detection_within_budget_is_not_flagged():
+    img, timing = PhotoUtils.process_timed(_jpeg(), "быстро", budget=5)
+
+    assert not timing.timed_out
+    assert timing.size == (300, 200)
+
+
+def _face(seed, w=400, h=520, fmt="JPEG"):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (8, 6, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(noise).resize((w, h), Image.Resampling.BICUBIC).save(buf, fmt)
+    return buf.getvalue()
+
+
+def test_resaved_photo_is_grouped_with_original():
+    hashes = [PhotoUtils.dhash(_face(1)),
+              PhotoUtils.dhash(_face(2)),
+              PhotoUtils.dhash(_face(1, 200, 260, "PNG")),
+              PhotoUtils.dhash(b"not an image")]
+
+    assert hashes[3] is None
+    assert PhotoUtils.group_duplicates(hashes) == [0, 1, 0, 3]
+
+
+def test_preflight_flags_and_builder_shares_duplicate(monkeypatch):
+    from config import PassConfig
+    from document_builder import DocumentBuilder
+    from preflight import scan
+    from roster import RosterRow
+
+    rows = [RosterRow("Иванов Иван Иванович", photo_bytes=_face(1)),
+            RosterRow("Петров Пётр Петрович", photo_bytes=_face(2)),
+            RosterRow("Сидоров Сидор Сидорович", photo_bytes=_face(1, 300, 390))]
+    report = scan(rows, PassConfig())
+
+    assert [it.index for it in report.duplicates] == [2]
+    assert "строки 1" in report.items[2].warnings[-1]
+
+    calls = []
+    real = PhotoUtils.process_timed
+    monkeypatch.setattr(PhotoUtils, "process_timed", staticmethod(
+        lambda data, name="", budget=None: calls.append(name) or real(data, name, budget)))
+    builder = DocumentBuilder(PassConfig(), photo_groups=report.photo_groups(rows))
+    photos = [builder._photo(row) for row in rows]
+
+    assert calls == [rows[0].fio, rows[1].fio]
+    assert photos[2] is photos[0] and not builder._shared
+
+
+def test_bgr_crop_converts_like_cvtcolor():
+    import cv2
+    import numpy as np
+
+    arr = np.random.default_rng(1).integers(0, 256, (120, 90, 3), dtype=np.uint8)
+    from_bytes = np.frombuffer(arr.tobytes(), np.uint8).reshape(arr.shape)
+    crops = [arr[10:100, 7:70],             # вид с шагом исходного массива
+             arr[10:100, 7:70][5:60, 3:40],  # вид на вид
+             from_bytes[20:50, 10:30],       # база — bytes, не ndarray
+             arr[::-1, 5:50], arr[::2, ::2]]   # обратный и разреженный шаг
+
+    for crop in crops:
+        expected = Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+        assert PhotoUtils._bgr_to_pil(crop).tobytes() == expected.tobytes()
+
+
+def test_fused_photo_matches_layered_path():
+    import numpy as np
+
+    from drawing_utils import DrawingUtils as DU
+
+    rng = np.random.default_rng(2)
+    photo = Image.fromarray(rng.integers(0, 256, (180, 130, 3), dtype=np.uint8))
+    cards = [Image.new("RGB", (400, 300), "#3050A0") for _ in range(2)]
+
+    right = DU.add_photo(cards[0], photo, 30, 20, (150, 200), "#FFFFFF", 6)
+    layered = DU._add_photo_layers(cards[1], photo, 30, 20, (150, 200), "#FFFFFF", 6)
+
+    assert right == layered
+    assert cards[0].tobytes() == cards[1].tobytes()
+
+
+def test_pooled_group_prints_leader_photo_and_frees_it(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from config import PassConfig
+    from document_builder import DocumentBuilder
+    from preflight import scan
+    from roster import RosterRow
+
+    rows = [RosterRow("Иванов Иван Иванович", photo_bytes=_face(1)),
+            RosterRow("Петров Пётр Петрович", photo_bytes=_face(2)),
+            RosterRow("Малов Мал Малович", photo_bytes=_face(1, 350, 455)),
+            RosterRow("Сидоров Сидор Сидорович", photo_bytes=_face(1, 300, 390))]
+    report = scan(rows, PassConfig())
+    assert report.items[2].same_photo == 0
+    report.items[2].errors.append("отклонена")   # строка выпадет при skip
+
+    groups = report.photo_groups(rows, "skip")
+    rows = report.apply(rows, "skip")
+    assert set(groups) == {id(rows[0]), id(rows[2])}
+
+    calls = []
+    real = PhotoUtils.process_timed
+
+    def process(data, name="", budget=None):
+        calls.append(name)
+        if name == rows[0].fio:
+            time.sleep(0.2)         # первая строка группы доходит последней
+        return real(data, name, budget)
+
+    monkeypatch.setattr(PhotoUtils, "process_timed", staticmethod(process))
+    with ThreadPoolExecutor(4) as pool:
+        builder = DocumentBuilder(PassConfig(), photo_groups=groups, submit=pool.submit)
+        cards = list(builder.cards(rows))
+
+    assert len(cards) == 3
+    assert sorted(calls) == sorted([rows[0].fio, rows[1].fio])
+    assert not builder._shared
+
+
+def test_dropped_group_leader_hands_over_to_next_row():
+    from config import PassConfig
+    from preflight import scan
+    from roster import RosterRow
+
+    rows = [RosterRow("Малов Мал Малович", photo_bytes=_face(1, 350, 455)),
+            RosterRow("Иванов Иван Иванович", photo_bytes=_face(1)),
+            RosterRow("Сидоров Сидор Сидорович", photo_bytes=_face(1, 300, 390))]
+    report = scan(rows, PassConfig())
+    report.items[0].errors.append("отклонена")
+
+    groups = report.photo_groups(rows, "skip")
+
+    assert groups == {id(rows[1]): rows[1], id(rows[2]): rows[1]}
+    assert report.photo_groups(rows) == {id(r): rows[0] for r in rows}
@@ -0,0 +1,33 @@
+import os
+
+from PIL import Image, ImageChops
+
+import render_check
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _cases(*names):
+    cases = render_check.corpus(os.path.join(ROOT, "image"))
+    return [c for c in cases if c.name in names]
+
+
+def test_fast_paths_match_reference(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    cases = _cases("фото 1", "длинная организация", "ID-1 на 200 dpi")
+
+    result = render_check.run(cases)
+
+    assert result.ok, "\n".join(result.lines())
+    assert result.compared >= len(cases) * 2 * 2
+
+
+def test_compare_catches_one_pixel_shift():
+    img = Image.new("RGB", (60, 40), "white")
+    img.paste(Image.new("RGB", (20, 10), "#2C3E50"), (10, 10))
+    shifted = ImageChops.offset(img, 1, 0)
+
+    max_diff, share, _ = render_check.compare(img, shifted)
+
+    assert max_diff > 0 and share > 0
+    assert render_check.compare(img, img.copy())[:2] == (0, 0.0)
@@ -0,0 +1,27 @@
+import io
+
+import pytest
+
+from roster import iter_roster
+
+
+@pytest.mark.parametrize("shift", range(4))
+def test_utf8_csv_larger_than_sniff_window(shift):
+    # Граница первых 64 КБ попадает внутрь двухбайтовой кириллической буквы
+    header = "ФИО;Серия;Номер\n" + "x" * shift + ";;\n"
+    body = "".join(f"Иванов Иван Иванович {i};АБ;{i}\n" for i in range(3000))
+    data = (header + body).encode("utf-8")
+    assert len(data) > 64 * 1024
+
+    rows = list(iter_roster(io.BytesIO(data)))
+
+    assert rows[-1].fio == "Иванов Иван Иванович 2999"
+    assert rows[-1].series == "АБ"
+
+
+def test_cp1251_csv():
+    data = "ФИО;Серия\nПетров Пётр Петрович;ВГ\n".encode("cp1251")
+
+    rows = list(iter_roster(io.BytesIO(data)))
+
+    assert [(r.fio, r.series) for r in rows] == [("Петров Пётр Петрович", "ВГ")]
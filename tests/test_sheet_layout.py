@@ -0,0 +1,46 @@
+from dataclasses import replace
+
+import pytest
+
+from config import PassConfig
+from sheet_layout import PAPER_MM, pack
+
+
+def test_default_card_keeps_four_by_two_on_a4():
+    layout = pack(PassConfig())
+
+    assert layout.capacity == 8
+    assert not layout.landscape
+    assert [(b.rows, b.cols, b.rotated) for b in layout.bands] == [(4, 2, False)]
+    assert layout.sheets(17) == 3 and layout.pages(17) == 6
+
+
+@pytest.mark.parametrize("paper", sorted(PAPER_MM))
+@pytest.mark.parametrize("size", [(9.5, 6.5), (8.56, 5.4), (5.0, 3.0), (12.0, 8.0)])
+def test_slots_fit_the_sheet_and_backs_mirror_fronts(paper, size):
+    cfg = replace(PassConfig(), paper=paper, card_w=size[0], card_h=size[1])
+    layout = pack(cfg)
+    fronts, backs = layout.slots(), layout.slots(back=True)
+
+    assert len(fronts) == len(backs) == layout.capacity
+    for f, b in zip(fronts, backs):
+        w, h = (cfg.card_h, cfg.card_w) if f.rotated else (cfg.card_w, cfg.card_h)
+        assert layout.margin - 1e-6 <= f.x and f.x + w <= layout.page_w - layout.margin + 1e-6
+        assert layout.margin - 1e-6 <= f.y and f.y + h <= layout.page_h - layout.margin + 1e-6
+        # Оборот — зеркально по вертикальной оси листа
+        assert f.x + b.x + w == pytest.approx(layout.page_w)
+        assert f.y == b.y
+
+
+def test_rotation_and_larger_paper_add_cards():
+    small = replace(PassConfig(), card_w=5.0, card_h=3.0)
+
+    assert pack(small).capacity > 8 * 3
+    assert pack(replace(PassConfig(), paper="SRA3")).capacity > pack(PassConfig()).capacity
+
+
+def test_card_larger_than_sheet_is_rejected():
+    with pytest.raises(ValueError):
+        pack(replace(PassConfig(), card_w=30.0, card_h=30.0))
+    with pytest.raises(ValueError):
+        PassConfig.from_dict({"card_w": 30, "card_h": 30})
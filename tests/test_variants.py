@@ -0,0 +1,79 @@
+import io
+import threading
+import time
+from dataclasses import replace
+
+from PIL import Image, ImageChops
+
+from config import PassConfig
+from document_builder import DocumentBuilder
+from photo_utils import PhotoUtils
+from roster import RosterRow
+from variants import SharedPhotos, build_variants
+
+
+def _rows(n=3):
+    rows = []
+    for i in range(n):
+        buf = io.BytesIO()
+        Image.new("RGB", (300, 400), (40 * i, 90, 160)).save(buf, "JPEG")
+        rows.append(RosterRow(f"Сотрудник Номер {i}", photo_bytes=buf.getvalue()))
+    return rows
+
+
+def test_each_photo_processed_once(monkeypatch):
+    calls = []
+    real = PhotoUtils.process_timed
+    monkeypatch.setattr(PhotoUtils, "process_timed", staticmethod(
+        lambda data, name="", budget=None: calls.append(name) or real(data, name, budget)))
+    base = PassConfig()
+    cfgs = [base, replace(base, header_text="ВАХТЁР"), replace(base, card_w=8.56, card_h=5.4)]
+    outs = [io.BytesIO() for _ in cfgs]
+
+    counts = build_variants(_rows(), cfgs, None, outs)
+
+    assert counts == [3, 3, 3]
+    assert sorted(calls) == sorted(r.fio for r in _rows())
+    assert all(out.getvalue()[:2] == b"PK" for out in outs)
+
+
+def test_shared_photo_renders_same_card():
+    row = _rows(1)[0]
+    cfg = replace(PassConfig(), header_text="ВАХТЁР")
+    shared = SharedPhotos([row], 2)
+    a = DocumentBuilder(PassConfig(), shared_photos=shared)._render_row(row, None)[0]
+    b = DocumentBuilder(cfg, shared_photos=shared)._render_row(row, None)[0]
+
+    assert len(shared) == 0
+    assert ImageChops.difference(b, DocumentBuilder(cfg)._render_row(row, None)[0]).getbbox() is None
+    assert ImageChops.difference(a, b).getbbox() is not None
+
+
+def test_fast_variant_waits_for_slow_one():
+    rows = _rows(12)
+    shared = SharedPhotos(rows, 2, lead=3)
+    held = []
+
+    def variant(user, delay):
+        for row in shared.rows_for(user):
+            shared.get(row, lambda r: r.fio)
+            held.append(len(shared))
+            time.sleep(delay)
+
+    threads = [threading.Thread(target=variant, args=(0, 0)),
+               threading.Thread(target=variant, args=(1, 0.01))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+    assert len(shared) == 0
+    assert max(held) <= 3 + 1
+
+
+def test_finished_variant_does_not_block_others():
+    rows = _rows(5)
+    shared = SharedPhotos(rows, 2, lead=1)
+    shared.finish(0)   # вариант упал, не начав строки
+
+    assert list(shared.rows_for(1)) == rows
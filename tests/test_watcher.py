@@ -0,0 +1,48 @@
+import io
+import os
+
+from PIL import Image
+
+import watcher
+from config import PassConfig
+from watcher import FolderWatcher, IncrementalBuild
+
+
+def _photo(path, color=(90, 120, 160)):
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 400), color).save(buf, "JPEG")
+    with open(path, "wb") as f:
+        f.write(buf.getvalue())
+
+
+def test_vanished_and_locked_files_do_not_stop_the_build(tmp_path, monkeypatch):
+    folder = tmp_path / "image"
+    folder.mkdir()
+    _photo(folder / "Иванов Иван Иванович.jpg")
+    _photo(folder / "Петров Пётр Петрович.jpg")
+    build = IncrementalBuild(str(folder), str(tmp_path / "out.docx"), PassConfig())
+    snap = FolderWatcher(str(folder)).snapshot()
+    assert build.update(snap).rendered == 2
+
+    # Петров удалён после снимка, Сидоров ещё копируется (заблокирован)
+    os.remove(folder / "Петров Пётр Петрович.jpg")
+    _photo(folder / "Сидоров Сидор Сидорович.jpg")
+    snap["Петров Пётр Петрович.jpg"] = (1, 1)
+    snap["Сидоров Сидор Сидорович.jpg"] = (1, 1)
+    real = watcher._sha1
+
+    def locked(path):
+        if "Сидоров" in path:
+            raise PermissionError(13, "занят другим процессом")
+        return real(path)
+
+    monkeypatch.setattr(watcher, "_sha1", locked)
+    stats = build.update(snap)
+
+    assert stats.removed == 1 and stats.pending == ["Сидоров Сидор Сидорович.jpg"]
+    assert set(build.entries) == {"Иванов Иван Иванович.jpg"}
+
+    monkeypatch.setattr(watcher, "_sha1", real)
+    stats = build.update(FolderWatcher(str(folder)).snapshot())
+
+    assert stats.rendered == 1 and not stats.pending and stats.cards == 2
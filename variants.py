@@ -0,0 +1,161 @@
+"""
+Несколько вариантов пропуска за одну сборку — одни и те же сотрудники,
+разные заголовки, цвета или сроки (разные посты).
+
+Фото каждой строки декодируется и обрезается по лицу один раз
+(SharedPhotos), варианты собираются параллельно, каждый — своим
+DocumentBuilder в свой документ. Обрезка от настроек не зависит:
+рамка и размер карточки у вариантов могут быть разными. Быстрый вариант
+уходит вперёд не больше чем на SharedPhotos.LEAD строк — иначе он
+копил бы обрезки для отстающего почти на весь реестр.
+
+    counts = build_variants(rows, [cfg_a, cfg_b], logo_bytes, ["a.docx", "b.docx"])
+
+Варианты из JSON (CLI --variants) — список словарей с полями PassConfig
+поверх базовых настроек и необязательным "name" для имени файла:
+
+    [{"name": "охрана"}, {"name": "вахта", "header_text": "ВАХТЁР",
+      "accent_color": "#27AE60"}]
+"""
+
+import json
+import math
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import BinaryIO
+
+from config import PassConfig
+from roster import RosterRow
+
+
+class SharedPhotos:
+    """
+    Обработанные фото строк для нескольких сборок: первая сборка,
+    дошедшая до строки, обрабатывает фото, остальные ждут и берут готовое.
+    Фото отпускается, когда его взяли все users сборок.
+
+    Слоты — по номеру строки в rows (список держится здесь же, так что
+    строки живы и их id не переиспользуются). Сборка читает строки через
+    rows_for(v): вариант, ушедший на LEAD строк вперёд самого медленного,
+    ждёт — в памяти не больше LEAD обработанных фото (плюс окна сборок).
+    """
+
+    LEAD = 32
+
+    def __init__(self, rows: list[RosterRow], users: int, lead: int | None = None):
+        self.rows = list(rows)
+        self.users = users
+        self.lead = self.LEAD if lead is None else lead
+        self._index: dict[int, int] = {}
+        for i, row in enumerate(self.rows):
+            self._index.setdefault(id(row), i)
+        # Одна и та же строка в списке дважды — и берут её вдвое чаще
+        self._takes = Counter(self._index[id(row)] for row in self.rows)
+        self._lock = threading.Lock()
+        self._slots: dict[int, list] = {}   # номер строки → [lock, фото, осталось]
+        self._cv = threading.Condition()
+        self._pos = [0] * users             # где читает строки каждая сборка
+        # Группы похожих фото (DocumentBuilder.photo_groups) — одни на все сборки
+        self.groups: dict[int, list] = {}
+        self.groups_lock = threading.Lock()
+
+    def rows_for(self, user: int):
+        """Строки для сборки user; впереди самой медленной — не дальше lead"""
+        try:
+            for i, row in enumerate(self.rows):
+                with self._cv:
+                    self._pos[user] = i
+                    self._cv.notify_all()
+                    self._cv.wait_for(lambda: i - min(self._pos) <= self.lead)
+                yield row
+        finally:
+            self.finish(user)
+
+    def finish(self, user: int):
+        """Сборка кончилась (или упала, даже не начав строки) — остальных не держит"""
+        with self._cv:
+            self._pos[user] = math.inf
+            self._cv.notify_all()
+
+    def get(self, row: RosterRow, process):
+        key = self._index.get(id(row))
+        if key is None or self.rows[key] is not row:
+            return process(row)   # строка не из этого набора — без обмена
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = [threading.Lock(), None,
+                                           self.users * self._takes[key]]
+        try:
+            with slot[0]:
+                if slot[1] is None:
+                    slot[1] = process(row)
+                return slot[1]
+        finally:
+            # И при ошибке: следующая сборка попробует сама и тоже отметится
+            with self._lock:
+                slot[2] -= 1
+                if slot[2] <= 0:
+                    self._slots.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+def build_variants(
+    rows: list[RosterRow],
+    cfgs: list[PassConfig],
+    logo_bytes: bytes | None,
+    outs: list[str | BinaryIO],
+    **builder_kw,
+) -> list[int]:
+    """
+    Собирает документ на каждый вариант настроек; outs — по одному на
+    вариант. builder_kw — остальные параметры DocumentBuilder
+    (memory_budget_mb, detect_budget, photo_store, photo_groups…).
+    Возвращает число пропусков в каждом документе.
+    """
+    from document_builder import DocumentBuilder
+
+    if len(cfgs) != len(outs):
+        raise ValueError(f"вариантов {len(cfgs)}, а файлов {len(outs)}")
+    shared = SharedPhotos(rows, len(cfgs))
+    builders = [DocumentBuilder(cfg, shared_photos=shared, **builder_kw) for cfg in cfgs]
+
+    def build(user, builder, out):
+        try:
+            return builder.build_rows(shared.rows_for(user), logo_bytes, out)
+        finally:
+            shared.finish(user)
+
+    # Варианты идут в ногу (rows_for) — каждому нужен свой поток
+    with ThreadPoolExecutor(len(cfgs), thread_name_prefix="variant") as pool:
+        futures = [pool.submit(build, i, b, out)
+                   for i, (b, out) in enumerate(zip(builders, outs))]
+        return [f.result() for f in futures]
+
+
+def load_variants(path: str, base: PassConfig) -> list[tuple[str, PassConfig]]:
+    """(имя, настройки) из JSON; поля варианта — поверх base"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list) or not data:
+        raise ValueError("ожидается непустой список вариантов")
+
+    out = []
+    for i, item in enumerate(data, 1):
+        item = dict(item)
+        name = str(item.pop("name", "") or i)
+        out.append((name, PassConfig.from_dict({**asdict(base), **item})))
+    return out
+
+
+def variant_path(output: str, name: str) -> str:
+    """propuska.docx + «вахта» → propuska_вахта.docx"""
+    from card_export import card_file_base
+
+    stem, ext = os.path.splitext(output)
+    return f"{stem}_{card_file_base(name)}{ext or '.docx'}"
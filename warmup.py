@@ -0,0 +1,56 @@
+"""
+Прогрев генератора — заранее загружает тяжёлые модули, шрифты,
+каскад Хаара и шаблоны, чтобы первая сессия не платила за холодный старт.
+
+Замер старта:  python warmup.py
+"""
+
+import time
+
+from config import PassConfig
+
+
+def warm_up(cfg: PassConfig | None = None) -> dict[str, float]:
+    """Прогревает ресурсы, возвращает время каждого этапа (сек)"""
+    cfg = cfg or PassConfig()
+    timings = {}
+
+    def stage(name, fn):
+        t = time.perf_counter()
+        fn()
+        timings[name] = time.perf_counter() - t
+
+    def imports():
+        import cv2  # noqa: F401
+        import numpy  # noqa: F401
+        import docx  # noqa: F401
+        import document_builder  # noqa: F401
+
+    def fonts():
+        from drawing_utils import DrawingUtils
+        DrawingUtils.get_fonts(cfg)
+
+    def cascade():
+        from photo_utils import PhotoUtils
+        PhotoUtils.warm_up()
+
+    def templates():
+        from PIL import Image
+        from card_renderer import CardRenderer
+        renderer = CardRenderer(cfg)
+        # Пробный рендер заполняет кэши градиента и подобранных шрифтов
+        renderer.front(Image.new("RGB", (300, 400), "white"))
+        renderer.back("Иванов Иван Иванович")
+
+    stage("imports", imports)
+    stage("fonts", fonts)
+    stage("cascade", cascade)
+    stage("templates", templates)
+    return timings
+
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    for name, sec in warm_up().items():
+        print(f"  {name:<10} {sec * 1000:8.1f} мс")
+    print(f"  {'итого':<10} {(time.perf_counter() - t0) * 1000:8.1f} мс")
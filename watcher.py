@@ -0,0 +1,321 @@
+"""
+Режим наблюдения за папкой фото — пропуска пересобираются сами.
+
+    python main.py --watch                  # папка image/, имя файла = ФИО
+
+Папка опрашивается раз в interval секунд (mtime и размер). После первого
+изменения сборка ждёт, пока папка quiet секунд не меняется: копирование
+200 файлов даёт одну сборку, а не 200. Изменение подтверждается хэшем
+содержимого — «потроганный» файл не перерисовывается.
+
+Рядом с документом лежит папка карточек (<документ>_cards/): PNG лицевой
+и оборотной стороны каждого сотрудника и manifest.json. Перерисовываются
+только добавленные и изменённые фото; документ собирается из готовых PNG.
+Смена настроек или логотипа (при следующем запуске) сбрасывает все
+карточки.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from config import PassConfig
+from document_builder import DocumentBuilder
+from roster import PHOTO_EXT, RosterRow
+
+MANIFEST = "manifest.json"
+
+
+@dataclass
+class WatchStats:
+    rendered: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    failed: list[str] = field(default_factory=list)
+    pending: list[str] = field(default_factory=list)   # заняты — повтор при следующем опросе
+    cards: int = 0
+    seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.rendered or self.removed or self.failed)
+
+
+# ═══════════════════════════════════════════════════
+#  ОПРОС ПАПКИ
+# ═══════════════════════════════════════════════════
+
+class FolderWatcher:
+    """Снимки папки {имя файла: (mtime_ns, размер)} с антидребезгом"""
+
+    def __init__(self, folder: str, exclude: Iterable[str] = (),
+                 interval: float = 2.0, quiet: float = 3.0):
+        self.folder = folder
+        self.skip = {name.lower() for name in exclude}
+        self.interval = interval
+        self.quiet = quiet
+
+    def snapshot(self) -> dict[str, tuple[int, int]]:
+        snap = {}
+        for entry in os.scandir(self.folder):
+            name = entry.name
+            if (not entry.is_file() or name.startswith(".")
+                    or name.lower() in self.skip
+                    or os.path.splitext(name)[1].lower() not in PHOTO_EXT):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            snap[name] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def wait_change(self, last: dict) -> dict[str, tuple[int, int]]:
+        """
+        Блокирует, пока папка не отличится от last, затем ждёт затишья
+        quiet секунд (файлы докопированы) и возвращает итоговый снимок.
+        """
+        while True:
+            time.sleep(self.interval)
+            snap = self.snapshot()
+            if snap != last:
+                break
+
+        settled_at = time.monotonic()
+        while time.monotonic() - settled_at < self.quiet:
+            time.sleep(self.interval)
+            newer = self.snapshot()
+            if newer != snap:
+                snap, settled_at = newer, time.monotonic()
+        return snap
+
+
+# ═══════════════════════════════════════════════════
+#  ИНКРЕМЕНТАЛЬНАЯ СБОРКА
+# ═══════════════════════════════════════════════════
+
+class IncrementalBuild:
+    """Кэш карточек по файлам фото + сборка документа из готовых PNG"""
+
+    def __init__(self, folder: str, output: str, cfg: PassConfig,
+                 logo_bytes: bytes | None = None, cards_dir: str | None = None):
+        self.folder = folder
+        self.output = output
+        self.cfg = cfg
+        self.logo_bytes = logo_bytes
+        self.cards_dir = cards_dir or os.path.splitext(output)[0] + "_cards"
+        os.makedirs(self.cards_dir, exist_ok=True)
+        self.builder = DocumentBuilder(cfg)
+        self.entries: dict[str, dict] = {}
+        self._load()
+
+    def update(self, snap: dict[str, tuple[int, int]]) -> WatchStats:
+        """Приводит карточки и документ в соответствие со снимком папки"""
+        start = time.perf_counter()
+        stats = WatchStats()
+
+        for name in sorted(set(self.entries) - set(snap)):
+            self._drop(name)
+            stats.removed += 1
+
+        todo = []
+        for name, (mtime, size) in sorted(snap.items()):
+            entry = self.entries.get(name)
+            if entry and [mtime, size] == entry["stat"]:
+                stats.unchanged += 1
+                continue
+            try:
+                digest = _sha1(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                # Удалён между снимком и чтением — как если бы его не было
+                if entry:
+                    self._drop(name)
+                    stats.removed += 1
+                continue
+            except OSError:
+                # Ещё копируется или заблокирован (Windows, SMB) — старая
+                # карточка остаётся, файл проверится при следующем опросе
+                stats.pending.append(name)
+                continue
+            if entry and digest == entry["sha1"]:
+                entry["stat"] = [mtime, size]   # тронут, но не изменён
+                stats.unchanged += 1
+                continue
+            todo.append((name, [mtime, size], digest))
+
+        if todo:
+            self._render(todo, stats)
+
+        if stats.changed or not os.path.exists(self.output):
+            stats.cards = self._write_document()
+        else:
+            stats.cards = sum(1 for e in self.entries.values() if e.get("front"))
+        self._save()
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    # ── Приватные ──────────────────────────────────
+
+    def _render(self, todo, stats: WatchStats):
+        meta = {name: (st, digest) for name, st, digest in todo}
+        rows = [
+            RosterRow(os.path.splitext(name)[0], photo_path=os.path.join(self.folder, name))
+            for name, _, _ in todo
+        ]
+        done = set()
+        for row, front, back in self.builder.cards(rows, self.logo_bytes):
+            name = os.path.basename(row.photo_path)
+            self._drop(name)
+            base = self._card_base(name)
+            entry = {"stat": meta[name][0], "sha1": meta[name][1], "fio": row.fio,
+                     "front": base + "_front.png", "back": base + "_back.png"}
+            front.save(os.path.join(self.cards_dir, entry["front"]), "PNG")
+            back.save(os.path.join(self.cards_dir, entry["back"]), "PNG")
+            self.entries[name] = entry
+            done.add(name)
+            stats.rendered += 1
+
+        # Фото не читается — запоминаем, чтобы не пробовать до изменения файла
+        for name, st, digest in todo:
+            if name not in done:
+                self._drop(name)
+                self.entries[name] = {"stat": st, "sha1": digest,
+                                      "fio": os.path.splitext(name)[0]}
+                stats.failed.append(name)
+
+    def _card_base(self, name: str) -> str:
+        stem = os.path.splitext(name)[0]
+        taken = {e.get("front") for e in self.entries.values()}
+        base, n = stem, 1
+        while base + "_front.png" in taken:
+            n += 1
+            base = f"{stem} ({n})"
+        return base
+
+    def _drop(self, name: str):
+        entry = self.entries.pop(name, None) or {}
+        for key in ("front", "back"):
+            if entry.get(key):
+                try:
+                    os.remove(os.path.join(self.cards_dir, entry[key]))
+                except FileNotFoundError:
+                    pass
+
+    def _write_document(self) -> int:
+        ready = [(name, e) for name, e in sorted(self.entries.items()) if e.get("front")]
+        builder = _CardFilesBuilder(self.cfg, self.cards_dir,
+                                    {name: e for name, e in ready})
+        rows = [RosterRow(e["fio"], photo_path=name) for name, e in ready]
+
+        tmp = self.output + ".part"
+        count = builder.build_rows(rows, None, tmp)
+        try:
+            os.replace(tmp, self.output)
+        except PermissionError:
+            # Документ открыт в Word (Windows не даёт заменить файл)
+            alt = os.path.splitext(self.output)[0] + ".new.docx"
+            os.replace(tmp, alt)
+            print(f"  ⚠️ {self.output} занят — сохранён как {alt}")
+        return count
+
+    def _fingerprint(self) -> str:
+        logo = hashlib.sha1(self.logo_bytes or b"").hexdigest()
+        return f"{self.cfg.fingerprint()}:{logo}"
+
+    def _load(self):
+        path = os.path.join(self.cards_dir, MANIFEST)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.entries = data.get("entries", {})
+        if data.get("fingerprint") != self._fingerprint():
+            print("  ♻️ Настройки или логотип изменились — карточки будут перерисованы")
+            for name in list(self.entries):
+                self._drop(name)
+
+    def _save(self):
+        path = os.path.join(self.cards_dir, MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self._fingerprint(), "entries": self.entries},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(path + ".tmp", path)
+
+
+class _CardFilesBuilder(DocumentBuilder):
+    """Документ из готовых PNG карточек — без обработки фото и рендера"""
+
+    def __init__(self, cfg: PassConfig, cards_dir: str, entries: dict[str, dict]):
+        super().__init__(cfg)
+        self.cards_dir = cards_dir
+        self.entries = entries
+
+    def _cards(self, rows, logo_pil):
+        for row in rows:
+            yield row, self._read(row, "front"), None
+
+    def _back(self, row):
+        return self._read(row, "back")
+
+    def _read(self, row, side) -> bytes:
+        with open(os.path.join(self.cards_dir, self.entries[row.photo_path][side]), "rb") as f:
+            return f.read()
+
+
+# ═══════════════════════════════════════════════════
+#  ЦИКЛ
+# ═══════════════════════════════════════════════════
+
+def watch(
+    folder: str,
+    output: str,
+    cfg: PassConfig,
+    logo_bytes: bytes | None = None,
+    exclude: Iterable[str] = (),
+    interval: float = 2.0,
+    quiet: float = 3.0,
+    once: bool = False,
+):
+    """Первая сборка сразу, дальше — по изменениям папки (Ctrl+C — выход)"""
+    watcher = FolderWatcher(folder, exclude, interval, quiet)
+    build = IncrementalBuild(folder, output, cfg, logo_bytes)
+
+    snap = watcher.snapshot()
+    print(f"👀 Наблюдение за {folder} → {output} (карточки: {build.cards_dir})")
+    try:
+        while True:
+            stats = build.update(snap)
+            _print_stats(stats, output)
+            if once:
+                return stats
+            # Занятые файлы — как ещё не виденные: опрос их сразу подхватит
+            last = {k: v for k, v in snap.items() if k not in stats.pending}
+            snap = watcher.wait_change(last)
+    except KeyboardInterrupt:
+        print("\n⏹️ Наблюдение остановлено")
+
+
+def _print_stats(stats: WatchStats, output: str):
+    stamp = time.strftime("%H:%M:%S")
+    for name in stats.pending:
+        print(f"  [{stamp}] ⏳ {name}: файл занят — повтор при следующем опросе")
+    if not stats.changed:
+        print(f"  [{stamp}] без изменений ({stats.cards} пропусков)")
+        return
+    print(f"  [{stamp}] перерисовано {stats.rendered}, удалено {stats.removed}, "
+          f"без изменений {stats.unchanged} → {output}: {stats.cards} пропусков "
+          f"за {stats.seconds:.1f} с")
+    for name in stats.failed:
+        print(f"     ❌ {name}: фото не читается")
+
+
+def _sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()